@@ -1,635 +1,273 @@
 import streamlit as st
-import openai
-from datetime import datetime, timedelta
 import os
+import time
+from itertools import islice
+
+from config import (
+    STREAM_RENDER_INTERVAL,
+    RESPONSE_CACHE_ENABLED,
+    CHAT_HISTORY_WINDOW,
+    CHAT_HISTORY_PAGE,
+    ADMIN_VIEW_ENABLED,
+    ADMIN_SLOW_TURNS,
+)
+from catalog_store import get_catalog
+from engine import Session, stream_turn
+from llm_client import prewarm
+from metrics import METRICS, start_exporters
+from profiler import get_profiler, record_span
+from response_cache import get_response_cache
+from session_store import get_session_store
+
+def render_streamed_response(deltas):
+    """Render streamed deltas incrementally and return the assembled text"""
+    placeholder = st.empty()
+    parts = []
+    last_render = 0.0
+    render_time = 0.0
+    for delta in deltas:
+        parts.append(delta)
+        # Throttle redraws so long answers don't flood the websocket
+        now = time.monotonic()
+        if now - last_render >= STREAM_RENDER_INTERVAL:
+            placeholder.markdown("".join(parts) + "▌")
+            last_render = time.monotonic()
+            render_time += last_render - now
+            # Drawn while the turn waits for the next delta, so it lands in the turn's profile
+            record_span("render", last_render - now)
+    response = "".join(parts)
+    start = time.monotonic()
+    placeholder.markdown(response)
+    # Only time spent drawing counts as rendering, not waiting on the model
+    render_time += time.monotonic() - start
+    METRICS.observe("stage", render_time, stage="render")
+    return response
 
-# Initialize session state variables
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-
-if "failed_attempts" not in st.session_state:
-    st.session_state.failed_attempts = 0
-
-# Mock order database (keeping original functionality)
-ORDERS = {
-    "123": {"status": "shipped", "eta": (datetime.now() + timedelta(days=3)).strftime("%B %d"), "items": ["Wireless Earbuds", "Phone Case"]},
-    "456": {"status": "delivered", "delivery_date": "September 15", "items": ["Smart Watch", "Charging Cable"]},
-    "789": {"status": "processing", "ship_date": (datetime.now() + timedelta(days=2)).strftime("%B %d"), "items": ["Bluetooth Speaker"]}
-}
-
-# Escalation triggers
-ESCALATION_KEYWORDS = ["fraud", "dispute", "human", "agent", "supervisor", "manager", "speak to someone", "real person"]
-
-# Product data in JSON format
-PRODUCT_DATA = """
-{
-  "products": [
-    {
-      "product_name": "pTron Wired Earphones - Blue Edition",
-      "discounted_price": "594",
-      "actual_price": "661",
-      "discount_percentage": "10",
-      "rating": "4.8",
-      "rating_count": "464",
-      "about_product": "pTron Wired Earphones in Blue. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Premium feel, sturdy build quality and excellent noise cancellation. | Crystal clear audio, good for calls and music both. | Very comfortable for long use and the battery life is great. | Battery drains too quickly, very disappointing. | Uncomfortable to wear for long periods of time."
-    },
-    {
-      "product_name": "pTron Wireless Headphones - Grey Edition",
-      "discounted_price": "15948",
-      "actual_price": "19935",
-      "discount_percentage": "20",
-      "rating": "2.6",
-      "rating_count": "4096",
-      "about_product": "pTron Wireless Headphones in Grey. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Premium feel, sturdy build quality and excellent noise cancellation. | Amazing sound quality with deep bass, totally worth the money. | Very comfortable for long use and the battery life is great. | Sound is flat, not worth the price. | Poor build quality, broke within a month."
-    },
-    {
-      "product_name": "Sony In-Ear Earphones - Blue Edition",
-      "discounted_price": "7242",
-      "actual_price": "8047",
-      "discount_percentage": "10",
-      "rating": "2.9",
-      "rating_count": "4993",
-      "about_product": "Sony In-Ear Earphones in Blue. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Very comfortable for long use and the battery life is great. | Premium feel, sturdy build quality and excellent noise cancellation. | Crystal clear audio, good for calls and music both. | Battery drains too quickly, very disappointing. | Connection keeps dropping, very frustrating."
-    },
-    {
-      "product_name": "OnePlus Over-Ear Headphones - White Edition",
-      "discounted_price": "4213",
-      "actual_price": "7023",
-      "discount_percentage": "40",
-      "rating": "4.7",
-      "rating_count": "999",
-      "about_product": "OnePlus Over-Ear Headphones in White. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Very comfortable for long use and the battery life is great. | Crystal clear audio, good for calls and music both. | Premium feel, sturdy build quality and excellent noise cancellation. | Sound is flat, not worth the price. | Battery drains too quickly, very disappointing."
-    },
-    {
-      "product_name": "Sony In-Ear Earphones - Blue Edition",
-      "discounted_price": "14672",
-      "actual_price": "18341",
-      "discount_percentage": "20",
-      "rating": "4.3",
-      "rating_count": "1773",
-      "about_product": "Sony In-Ear Earphones in Blue. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Very comfortable for long use and the battery life is great. | Premium feel, sturdy build quality and excellent noise cancellation. | Crystal clear audio, good for calls and music both. | Poor build quality, broke within a month. | Sound is flat, not worth the price."
-    },
-    {
-      "product_name": "JBL Wireless Headphones - Red Edition",
-      "discounted_price": "6711",
-      "actual_price": "13423",
-      "discount_percentage": "50",
-      "rating": "2.5",
-      "rating_count": "4897",
-      "about_product": "JBL Wireless Headphones in Red. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Crystal clear audio, good for calls and music both. | Premium feel, sturdy build quality and excellent noise cancellation. | Amazing sound quality with deep bass, totally worth the money. | Battery drains too quickly, very disappointing. | Uncomfortable to wear for long periods of time."
-    },
-    {
-      "product_name": "Skullcandy Truly Wireless Earbuds - Blue Edition",
-      "discounted_price": "13405",
-      "actual_price": "19151",
-      "discount_percentage": "30",
-      "rating": "4.6",
-      "rating_count": "4603",
-      "about_product": "Skullcandy Truly Wireless Earbuds in Blue. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Amazing sound quality with deep bass, totally worth the money. | Crystal clear audio, good for calls and music both. | Very comfortable for long use and the battery life is great. | Sound is flat, not worth the price. | Uncomfortable to wear for long periods of time."
-    },
-    {
-      "product_name": "JBL In-Ear Earphones - White Edition",
-      "discounted_price": "4083",
-      "actual_price": "5833",
-      "discount_percentage": "30",
-      "rating": "3.5",
-      "rating_count": "2195",
-      "about_product": "JBL In-Ear Earphones in White. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Amazing sound quality with deep bass, totally worth the money. | Very comfortable for long use and the battery life is great. | Crystal clear audio, good for calls and music both. | Sound is flat, not worth the price. | Poor build quality, broke within a month."
-    },
-    {
-      "product_name": "Boult Wireless Headphones - Green Edition",
-      "discounted_price": "4763",
-      "actual_price": "7939",
-      "discount_percentage": "40",
-      "rating": "2.8",
-      "rating_count": "1472",
-      "about_product": "Boult Wireless Headphones in Green. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Very comfortable for long use and the battery life is great. | Premium feel, sturdy build quality and excellent noise cancellation. | Amazing sound quality with deep bass, totally worth the money. | Battery drains too quickly, very disappointing. | Sound is flat, not worth the price."
-    },
-    {
-      "product_name": "pTron Wired Earphones - Red Edition",
-      "discounted_price": "676",
-      "actual_price": "902",
-      "discount_percentage": "25",
-      "rating": "4.4",
-      "rating_count": "2327",
-      "about_product": "pTron Wired Earphones in Red. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Crystal clear audio, good for calls and music both. | Very comfortable for long use and the battery life is great. | Premium feel, sturdy build quality and excellent noise cancellation. | Uncomfortable to wear for long periods of time. | Battery drains too quickly, very disappointing."
-    },
-    {
-      "product_name": "Noise Truly Wireless Earbuds - Grey Edition",
-      "discounted_price": "7204",
-      "actual_price": "8476",
-      "discount_percentage": "15",
-      "rating": "3.9",
-      "rating_count": "226",
-      "about_product": "Noise Truly Wireless Earbuds in Grey. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Very comfortable for long use and the battery life is great. | Crystal clear audio, good for calls and music both. | Premium feel, sturdy build quality and excellent noise cancellation. | Connection keeps dropping, very frustrating. | Uncomfortable to wear for long periods of time."
-    },
-    {
-      "product_name": "JBL Wired Earphones - Black Edition",
-      "discounted_price": "8238",
-      "actual_price": "10298",
-      "discount_percentage": "20",
-      "rating": "3.1",
-      "rating_count": "1982",
-      "about_product": "JBL Wired Earphones in Black. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Premium feel, sturdy build quality and excellent noise cancellation. | Crystal clear audio, good for calls and music both. | Very comfortable for long use and the battery life is great. | Battery drains too quickly, very disappointing. | Poor build quality, broke within a month."
-    },
-    {
-      "product_name": "Sennheiser Wireless Headphones - Black Edition",
-      "discounted_price": "6570",
-      "actual_price": "6916",
-      "discount_percentage": "5",
-      "rating": "4.2",
-      "rating_count": "1893",
-      "about_product": "Sennheiser Wireless Headphones in Black. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Amazing sound quality with deep bass, totally worth the money. | Crystal clear audio, good for calls and music both. | Very comfortable for long use and the battery life is great. | Sound is flat, not worth the price. | Poor build quality, broke within a month."
-    },
-    {
-      "product_name": "Skullcandy Over-Ear Headphones - Grey Edition",
-      "discounted_price": "16614",
-      "actual_price": "17489",
-      "discount_percentage": "5",
-      "rating": "2.9",
-      "rating_count": "2806",
-      "about_product": "Skullcandy Over-Ear Headphones in Grey. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Premium feel, sturdy build quality and excellent noise cancellation. | Very comfortable for long use and the battery life is great. | Amazing sound quality with deep bass, totally worth the money. | Uncomfortable to wear for long periods of time. | Sound is flat, not worth the price."
-    },
-    {
-      "product_name": "Sony Over-Ear Headphones - White Edition",
-      "discounted_price": "5937",
-      "actual_price": "11875",
-      "discount_percentage": "50",
-      "rating": "4.4",
-      "rating_count": "725",
-      "about_product": "Sony Over-Ear Headphones in White. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Crystal clear audio, good for calls and music both. | Amazing sound quality with deep bass, totally worth the money. | Very comfortable for long use and the battery life is great. | Uncomfortable to wear for long periods of time. | Connection keeps dropping, very frustrating."
-    },
-    {
-      "product_name": "pTron In-Ear Earphones - Green Edition",
-      "discounted_price": "5187",
-      "actual_price": "6916",
-      "discount_percentage": "25",
-      "rating": "2.9",
-      "rating_count": "714",
-      "about_product": "pTron In-Ear Earphones in Green. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Premium feel, sturdy build quality and excellent noise cancellation. | Amazing sound quality with deep bass, totally worth the money. | Crystal clear audio, good for calls and music both. | Sound is flat, not worth the price. | Battery drains too quickly, very disappointing."
-    },
-    {
-      "product_name": "Boult Truly Wireless Earbuds - Green Edition",
-      "discounted_price": "4993",
-      "actual_price": "5875",
-      "discount_percentage": "15",
-      "rating": "4",
-      "rating_count": "998",
-      "about_product": "Boult Truly Wireless Earbuds in Green. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Crystal clear audio, good for calls and music both. | Very comfortable for long use and the battery life is great. | Premium feel, sturdy build quality and excellent noise cancellation. | Uncomfortable to wear for long periods of time. | Connection keeps dropping, very frustrating."
-    },
-    {
-      "product_name": "Sony Wired Earphones - Blue Edition",
-      "discounted_price": "3297",
-      "actual_price": "5496",
-      "discount_percentage": "40",
-      "rating": "3.8",
-      "rating_count": "3154",
-      "about_product": "Sony Wired Earphones in Blue. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Crystal clear audio, good for calls and music both. | Very comfortable for long use and the battery life is great. | Premium feel, sturdy build quality and excellent noise cancellation. | Uncomfortable to wear for long periods of time. | Poor build quality, broke within a month."
-    },
-    {
-      "product_name": "Noise Over-Ear Headphones - Black Edition",
-      "discounted_price": "12545",
-      "actual_price": "13206",
-      "discount_percentage": "5",
-      "rating": "4",
-      "rating_count": "2057",
-      "about_product": "Noise Over-Ear Headphones in Black. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Crystal clear audio, good for calls and music both. | Very comfortable for long use and the battery life is great. | Premium feel, sturdy build quality and excellent noise cancellation. | Uncomfortable to wear for long periods of time. | Sound is flat, not worth the price."
-    },
-    {
-      "product_name": "OnePlus Wired Earphones - Grey Edition",
-      "discounted_price": "144",
-      "actual_price": "241",
-      "discount_percentage": "40",
-      "rating": "4.4",
-      "rating_count": "3669",
-      "about_product": "OnePlus Wired Earphones in Grey. Great for music lovers, stylish and durable with high performance.",
-      "reviews": "Very comfortable for long use and the battery life is great. | Premium feel, sturdy build quality and excellent noise cancellation. | Crystal clear audio, good for calls and music both. | Sound is flat, not worth the price. | Poor build quality, broke within a month."
-    }
-  ]
-}
-
-"""
-
-# Create the system prompt with the product data formatted in
-FORMATTED_SYSTEM_PROMPT = """
-You are an E-commerce Customer Support Virtual Agent for a headphones marketplace.  
-You help customers with queries about headphones, using the provided PRODUCT_DATA JSON as your source of data.  
-You are expected to answer all the queries of the user regarding the products, and if you don't know something, you politely hand over to a Live Agent.  
-
-Context: {0}
-
-You have access to a structured JSON object stored in a variable called PRODUCT_DATA.  
-This JSON contains an array of products with the following fields:  
-
-- product_name → The brand and model name of the headphone.  
-- discounted_price → Final selling price after applying deals/offers (in INR).  
-- actual_price → Original listed price (in INR).  
-- discount_percentage → Percentage discount from actual price to discounted price.  
-- rating → Average customer rating (1–5).  
-- rating_count → Number of customers who rated the product.  
-- about_product → A short 3–4 line description of the product (features, type, color, etc.).  
-- reviews → Detailed customer reviews with a mix of positive and negative experiences.  
-
-Agent Behavior Guidelines  
-
-Tone & Style  
-- Be polite, concise, and helpful.  
-- Use natural conversational flow like a customer service agent.
-- Try and ask preferences, do not mechanically display the entire data in front of the user
-
-Query Handling  
-Query Handling – Conversational & Consultative Style
-
-The virtual agent should act like a knowledgeable sales assistant, not just a database. It must:
-
-Engage Naturally
-
-Use a friendly, conversational tone.
-
-Ask clarifying questions instead of dumping results immediately.
-
-Example: If a user says “Show me blue headphones”, reply:
-
-“Got it! Do you have a brand in mind, or should I show you all options in blue?”
-
-Guide Through Options
-
-Narrow choices step by step by asking about:
-
-Brand preference
-
-Budget / Price range
-
-Use case (gaming, travel, office, workout, etc.)
-
-Features (noise cancellation, wireless, battery life, etc.)
-
-Provide Results with Context
-
-When showing filtered/sorted products, frame it helpfully:
-
-“Here are a few blue wireless headphones under ₹3,000 that customers love for travel. Would you like me to compare their features side by side?”
-
-Offer Value Beyond Results
-
-Highlight deals (discounted price, savings).
-
-Summarize reviews in plain language (“Most people liked the comfort, but a few mentioned the battery drains quickly”).
-
-Suggest similar or better alternatives if relevant.
-
-Be Consultative, Not Mechanical
-
-The goal is to assist the customer in choosing, not just list products.
-
-Always check if the customer wants to see more options, comparisons, or recommendations.
-
-Handle Ambiguity Gracefully
-
-If user request is vague, guide with questions:
-
-“Sure! When you say ‘best headphones,’ are you looking for best in terms of sound quality, comfort, or budget?”
-
-Orders/Returns or any other FAQs (like tracking, returns, complaints):  
-- Provide a simulated conversational flow and answer the user using the information given below:
-KNOWLEDGEBASE:
-``
-1. Company Overview
-
-ABC Technologies is an e-commerce platform specializing in headphones across categories such as:
-
-Wired headphones
-
-Wireless headphones
-
-Gaming headsets
-
-Sports/fitness headphones
-
-Premium studio headphones
-
-Noise-cancelling headphones
-
-2. Order & Shipping Policies
-
-Order Confirmation: Customers receive an email & SMS with order ID and estimated delivery date after successful payment.
-
-Processing Time: Orders are usually dispatched within 24–48 hours of confirmation.
-
-Delivery Time: 2–7 business days depending on location.
-
-Shipping Fees:
-
-Free shipping on orders above ₹1,000.
-
-Flat ₹49 for orders below ₹1,000.
-
-Tracking: A real-time tracking link is shared post-dispatch.
-
-3. Returns, Replacements & Refunds
-
-Return Window: 10 days from delivery for eligible headphones.
-
-Eligibility:
-
-Item damaged in transit.
-
-Item defective (e.g., no sound, poor mic).
-
-Wrong model/color received.
-
-Replacement Policy:
-
-Free replacement offered if stock is available.
-
-If not available, full refund processed.
-
-Refund Timeline: 5–10 business days (depends on payment method).
-
-Non-returnable Items:
-
-In-ear headphones if the seal is broken (hygiene reasons).
-
-Items damaged due to misuse or unauthorized repairs.
-
-4. Cancellation Policy
-
-Before Dispatch: Free cancellation via website/app.
-
-After Dispatch: Customers must use the return process.
-
-Refund on Cancellation: Initiated immediately and credited in 3–7 business days.
-
-5. Warranty & Repairs
-
-Standard Warranty: 1 year manufacturer warranty on all headphones.
-
-Warranty Covers: Manufacturing defects (speaker, mic, connectivity).
-
-Warranty Excludes: Accidental damage, water damage, wear & tear.
-
-Service Process: Customers may be directed to brand-authorized service centers.
-
-6. Payment & Security
-
-Accepted Modes: Credit/Debit Cards, UPI, Net Banking, Wallets, COD.
-
-COD (Cash on Delivery): Available for orders below ₹5,000.
-
-Refund Mode: Same as original payment method.
-
-Security: PCI-DSS compliant payment gateway with fraud detection checks.
-
-7. Customer Support & Escalation Flow
-
-Self-service: Order tracking, FAQ chatbot.
-
-Agent Support: Phone/email/chat support available 9 AM–9 PM IST.
-
-Escalation:
-
-Customer Support Agent →
-
-Escalation Desk →
-
-Supervisor/Operations Manager.
-
-8. FAQs
-Orders & Delivery
-
-Q: How can I track my order?
-A: Use the "Track My Order" link in your confirmation email or account dashboard.
-
-Q: What if my package is delayed?
-A: If delivery exceeds the estimated date, contact support for a reshipment or refund.
+# (histogram, labels, title) rows of the sidebar performance panel
+METRICS_PANEL_ROWS = [
+    ("turn", {}, "Whole turn"),
+    ("stage", {"stage": "escalation_check"}, "Escalation check"),
+    ("stage", {"stage": "order_lookup"}, "Order lookup"),
+    ("stage", {"stage": "structured_query"}, "Structured query"),
+    ("stage", {"stage": "cache_lookup"}, "Cache lookup"),
+    ("stage", {"stage": "prompt_assembly"}, "Prompt assembly"),
+    ("llm_ttft", {}, "LLM first token"),
+    ("llm_total", {}, "LLM total"),
+    ("stage", {"stage": "render"}, "Rendering"),
+    ("stage", {"stage": "history_render"}, "Chat history"),
+]
 
-Returns & Refunds
+# Static sidebar content
+EXAMPLE_QUERIES = """
 
-Q: Can I return my headphones if I don’t like them?
-A: Returns are allowed only for defective, damaged, or wrong items. For hygiene reasons, in-ear headphones are not eligible once opened.
 
-Q: How long will it take to get my refund?
-A: Refunds are processed within 5–10 business days after the returned product passes inspection.
+### Product Related:
+- What are the best headphones under ₹5000?
+- Compare Sony and JBL earphones
+- Show me wireless earbuds with good battery life
+- Which headphones have the highest rating?
+- Tell me about pTron earphones reviews
+- What's the most discounted headphone available?
+- I need headphones for gaming
 
-Product Issues
+### Order Related:
+-I didn’t get my order confirmation SMS. What should I do?
+- What happens if my headphones arrive broken?
+- How long will my refund take?
+- My payment failed but money was deducted. What happens now?
+"""
 
-Q: My headphones are not working properly. What should I do?
-A: If within 10 days of purchase → request a replacement/refund. If after 10 days → claim warranty service.
+ABOUT_TEXT = "This bot can answer all your queries related to headphones and earphones from top brands like Sony, JBL, Skullcandy, Sennheiser, OnePlus, pTron, Boult, and Noise. You can ask about product details such as type, color, and features; check prices, discounts, and savings; explore customer ratings and reviews; or even compare products to find the best option. In addition to product information, the bot can also help with customer support FAQs such as shipping policies, returns, refunds, warranty, and other service-related questions—making it your one-stop assistant for both shopping guidance and support."
 
-Q: Do you offer international shipping?
-A: Currently, we deliver only within India.
+def show_earlier_messages():
+    """Load-earlier button callback: widen the history window by one page"""
+    st.session_state.history_pages = st.session_state.get("history_pages", 0) + 1
 
-Payments
+def render_chat_history(session):
+    """
+    Draw the most recent CHAT_HISTORY_WINDOW messages, with older ones behind
+    a "load earlier" button, so a rerun's render time and websocket payload
+    stay flat however long the conversation gets.
+
+    Message texts are cached in st.session_state by session and absolute
+    position (positions survive the ring buffer dropping old messages), so
+    compressed older records are inflated once rather than on every rerun.
+    Streamlit turns the markdown into HTML in the browser; the cache only
+    holds what the server would otherwise rebuild.
+    """
+    messages = session.messages
+    total = len(messages)
+    if CHAT_HISTORY_WINDOW > 0:
+        shown = CHAT_HISTORY_WINDOW + st.session_state.get("history_pages", 0) * CHAT_HISTORY_PAGE
+        start = max(total - shown, 0)
+    else:
+        start = 0
+    if start:
+        st.button(
+            f"Load earlier messages ({start} more)",
+            on_click=show_earlier_messages,
+            key="load_earlier",
+        )
+
+    offset = messages.dropped + start
+    cached = st.session_state.get("rendered_messages", {})
+    rendered = {}
+    for position, message in enumerate(islice(messages, start, None), offset):
+        key = (session.session_id, position)
+        text = cached.get(key)
+        if text is None:
+            text = message["content"]
+        rendered[key] = text
+        with st.chat_message(message["role"]):
+            st.markdown(text)
+    # Only the visible window is kept, so the cache is bounded like the page
+    st.session_state.rendered_messages = rendered
+
+def render_metrics_panel():
+    """Sidebar panel with per-stage latency percentiles and token counters"""
+    st.sidebar.title("Performance")
+    rows = []
+    for name, labels, title in METRICS_PANEL_ROWS:
+        summary = METRICS.histogram(name, **labels)
+        if summary:
+            rows.append(f"| {title} | {summary['count']} | {summary['p50'] * 1000:.1f} | {summary['p95'] * 1000:.1f} |")
+    if not rows:
+        st.sidebar.write("No turns yet")
+        return
+    st.sidebar.markdown("| Stage | Count | p50 ms | p95 ms |\n|---|---|---|---|\n" + "\n".join(rows))
+    tokens = {
+        kind: METRICS.counter("llm_tokens", kind=kind, source="api") + METRICS.counter("llm_tokens", kind=kind, source="estimate")
+        for kind in ("prompt", "completion")
+    }
+    st.sidebar.write(f"LLM tokens: {tokens['prompt']:,} prompt, {tokens['completion']:,} completion")
+
+def render_profiling_panel(session, store):
+    """Admin sidebar: profiling switch for this session and the slowest recent turns"""
+    st.sidebar.title("Profiling")
+    profiling = st.sidebar.checkbox("Profile this session's turns", value=session.profiling)
+    if profiling != session.profiling:
+        session.profiling = profiling
+        store.save(session)
+    turns = get_profiler().slowest(ADMIN_SLOW_TURNS)
+    if not turns:
+        st.sidebar.write("No turns yet")
+        return
+    rows = []
+    for record, _ in turns:
+        spans = record["spans"]
+        prompt_tokens = record["prompt"]["prompt_tokens"] if record["prompt"] else "-"
+        rows.append(
+            f"| {time.strftime('%H:%M:%S', time.localtime(record['time']))} | {record['session_id'][:8]} "
+            f"| {record['wall_s'] * 1000:.0f} | {record['cpu_s'] * 1000:.0f} "
+            f"| {spans.get('llm', 0.0) * 1000:.0f} | {spans.get('render', 0.0) * 1000:.0f} "
+            f"| {prompt_tokens} | {record['completion_tokens']} | {record['artifact'] or '-'} |"
+        )
+    st.sidebar.markdown(
+        "| Time | Session | Wall ms | CPU ms | LLM ms | Render ms | Prompt tok | Reply tok | Artifact |\n"
+        "|---|---|---|---|---|---|---|---|---|\n" + "\n".join(rows)
+    )
+    # Collapsed stacks of the slowest sampled turn, for flamegraph.pl or speedscope
+    for record, folded in turns:
+        if folded:
+            st.sidebar.download_button(
+                f"Stacks of the slowest profiled turn ({record['wall_s'] * 1000:.0f} ms)",
+                folded,
+                file_name=f"{record['artifact'] or record['session_id'][:8]}.folded",
+            )
+            break
 
-Q: What if my payment failed but money was deducted?
-A: The amount will be auto-refunded by your bank within 5–7 working days.
+def export_api_key():
+    """Make the OpenAI key from Streamlit secrets visible to the engine"""
+    if "OPENAI_API_KEY" not in os.environ:
+        try:
+            os.environ["OPENAI_API_KEY"] = st.secrets["OPENAI_API_KEY"]
+        except Exception:
+            pass
 
-Q: Can I pay on delivery?
-A: Yes, COD is available for orders under ₹5,000.
-``  
+def load_session(store):
+    """
+    This browser tab's conversation from the shared session store.
 
-Live Agent Handover  
-- If a query cannot be resolved using PRODUCT_DATA or KNOWLEDGEBASE (e.g., real-time delivery status, warranty claims, refund escalation), respond:  
-  "I'll connect you with a live agent who can help further with this request."  
+    Only the session ID lives in st.session_state; it is mirrored in the
+    ?session= URL parameter so a reloaded page resumes the conversation.
+    """
+    session_id = st.session_state.get("session_id") or st.query_params.get("session")
+    session = store.load(session_id) if session_id else None
+    if session is None:
+        session = Session()
+        store.save(session)
+    st.session_state.session_id = session.session_id
+    if st.query_params.get("session") != session.session_id:
+        st.query_params["session"] = session.session_id
+    return session
+
+def main():
+    """Streamlit app layout - a thin client of the engine, runs on every script rerun"""
+    export_api_key()
+    store = get_session_store()
+    session = load_session(store)
+    start_exporters()
+    
+    st.title("Headphones Marketplace Support")
+    st.markdown("Welcome to our headphone marketplace support! How can I help you today?")
 
-Boundaries  
-- Do not make up new product data outside PRODUCT_DATA.  
-- Always base your answers only on PRODUCT_DATA, but you can be consultative like a sales executive.  
-""".format(PRODUCT_DATA)
+    # Display chat history
+    with METRICS.timer("stage", stage="history_render"):
+        render_chat_history(session)
 
-def check_for_escalation(user_message):
-    """Check if the message should trigger escalation to a human agent"""
-    # Check for explicit escalation keywords
-    if any(keyword in user_message.lower() for keyword in ESCALATION_KEYWORDS):
-        return True
-    
-    # Check for failed attempts threshold
-    if st.session_state.failed_attempts >= 2:
-        st.session_state.failed_attempts = 0  # Reset counter after escalation
-        return True
-    
-    return False
-
-def extract_order_number(message):
-    """Try to extract an order number from the message"""
-    words = message.split()
-    for word in words:
-        # Clean up the word to check if it's an order number
-        cleaned = word.strip("#.,?!").strip()
-        if cleaned in ORDERS:
-            return cleaned
-    return None
-
-def handle_order_status(order_number):
-    """Generate a response for order status inquiries"""
-    if order_number in ORDERS:
-        order = ORDERS[order_number]
-        if order["status"] == "shipped":
-            return f"Your order #{order_number} has been shipped and is scheduled to arrive by {order['eta']}. It contains: {', '.join(order['items'])}."
-        elif order["status"] == "delivered":
-            return f"Your order #{order_number} was delivered on {order['delivery_date']}. It contained: {', '.join(order['items'])}."
-        elif order["status"] == "processing":
-            return f"Your order #{order_number} is currently processing and will ship on {order['ship_date']}. It contains: {', '.join(order['items'])}."
-    return None
-
-def handle_return_refund(order_number):
-    """Generate a response for return/refund initiation"""
-    if order_number in ORDERS:
-        return f"I've initiated a return for order #{order_number}. You'll receive a return shipping label via email shortly. Once we receive the returned items, your refund will be processed within 5-7 business days."
-    return None
-
-def get_llm_response(messages, provider="openai"):
-    """
-    Get response from a language model
-    """
-    if provider == "openai":
-        try:
-            # Try to get from Streamlit secrets
-            api_key = st.secrets["OPENAI_API_KEY"]
-        except:
-            # Fallback - hardcoded key for testing
-            api_key = "no key"
-        
-        try:
-            # Initialize OpenAI client
-            client = openai.OpenAI(api_key=api_key)
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.3,
-                max_tokens=800
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error communicating with OpenAI: {str(e)}"
+    # Handle user input
+    if prompt := st.chat_input("Type your question here..."):
+        # Display user message
+        with st.chat_message("user"):
+            st.markdown(prompt)
 
-def process_message(user_message):
-    """Process the user message and determine an appropriate response"""
-    
-    # Check for escalation triggers
-    if check_for_escalation(user_message):
-        return "I'll connect you with a human support agent who can better assist you with this. Please hold while I transfer your chat."
-    
-    # Try to extract order number
-    order_number = extract_order_number(user_message)
-    
-    # Check if this is an order status query
-    if order_number and ("status" in user_message.lower() or "where" in user_message.lower() or "track" in user_message.lower()):
-        response = handle_order_status(order_number)
-        if response:
-            return response
-    
-    # Check if this is a return/refund request
-    if order_number and ("return" in user_message.lower() or "refund" in user_message.lower()):
-        response = handle_return_refund(order_number)
-        if response:
-            return response
-    
-    # Initialize messages list with system prompt that already includes the product data
-    messages = [
-        {"role": "system", "content": FORMATTED_SYSTEM_PROMPT}
-    ]
-    
-    # Add conversation history
-    for message in st.session_state.messages:
-        messages.append({"role": message["role"], "content": message["content"]})
-    
-    # Add the current message
-    messages.append({"role": "user", "content": user_message})
-    
-    # Get response from LLM
-    response = get_llm_response(messages)
-    
-    # If the response seems generic or confused, increment the failed attempts counter
-    generic_responses = [
-        "I'm not sure I understand",
-        "I don't have that information",
-        "I'm unable to assist with that",
-        "I'm not sure what you're asking",
-        "Could you please clarify"
-    ]
-    
-    if any(generic in response for generic in generic_responses):
-        st.session_state.failed_attempts += 1
-    else:
-        st.session_state.failed_attempts = 0  # Reset on successful response
-        
-    return response
+        # Run the turn and display the assistant response as it arrives;
+        # stream_turn adds both messages to the chat history
+        with st.chat_message("assistant"):
+            render_streamed_response(stream_turn(prompt, session))
 
-# Streamlit app layout
-st.title("Headphones Marketplace Support")
-st.markdown("Welcome to our headphone marketplace support! How can I help you today?")
+        # Saved again so the store re-measures the session against its memory ceiling
+        store.save(session)
 
-# Display chat history
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+    # Update sidebar with more product-specific examples
+    st.sidebar.title("Example Queries")
+    st.sidebar.markdown(EXAMPLE_QUERIES)
 
-# Handle user input
-if prompt := st.chat_input("Type your question here..."):
-    # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    
-    # Display user message
-    with st.chat_message("user"):
-        st.markdown(prompt)
-    
-    # Generate and display assistant response
-    with st.chat_message("assistant"):
-        response = process_message(prompt)
-        st.markdown(response)
-    
-    # Add assistant response to chat history
-    st.session_state.messages.append({"role": "assistant", "content": response})
+    # About section
+    st.sidebar.title("About")
+    st.sidebar.info(ABOUT_TEXT)
 
-# Update sidebar with more product-specific examples
-st.sidebar.title("Example Queries")
-st.sidebar.markdown("""
+    # Display product count in sidebar
+    st.sidebar.title("Database Stats")
+    catalog = get_catalog()
+    st.sidebar.write(f"Products: {len(catalog)}, FAQ Knowledge Base linked")
 
+    st.sidebar.write("Brands: " + ", ".join(catalog.brands))
 
-### Product Related:
-- What are the best headphones under ₹5000?
-- Compare Sony and JBL earphones
-- Show me wireless earbuds with good battery life
-- Which headphones have the highest rating?
-- Tell me about pTron earphones reviews
-- What's the most discounted headphone available?
-- I need headphones for gaming
+    if RESPONSE_CACHE_ENABLED:
+        cache_stats = get_response_cache().stats()
+        st.sidebar.write(f"Response cache: {cache_stats['entries']} entries, {cache_stats['hits']} hits, {cache_stats['misses']} misses")
 
-### Order Related:
--I didn’t get my order confirmation SMS. What should I do?
-- What happens if my headphones arrive broken?
-- How long will my refund take?
-- My payment failed but money was deducted. What happens now?
-""")
+    # Prompt size of the last LLM turn, against sending the full history
+    prompt_metrics = session.history.last_metrics
+    if prompt_metrics:
+        st.sidebar.title("Prompt Size")
+        st.sidebar.write(f"Last prompt: ~{prompt_metrics['prompt_tokens']} tokens (system {prompt_metrics['system_tokens']}, history {prompt_metrics['history_tokens']})")
+        st.sidebar.write(f"History: {prompt_metrics['verbatim_messages']} messages verbatim, {prompt_metrics['summarized_messages']} summarized, ~{prompt_metrics['saved_tokens']} tokens saved")
 
-# About section
-st.sidebar.title("About")
-st.sidebar.info("This bot can answer all your queries related to headphones and earphones from top brands like Sony, JBL, Skullcandy, Sennheiser, OnePlus, pTron, Boult, and Noise. You can ask about product details such as type, color, and features; check prices, discounts, and savings; explore customer ratings and reviews; or even compare products to find the best option. In addition to product information, the bot can also help with customer support FAQs such as shipping policies, returns, refunds, warranty, and other service-related questions—making it your one-stop assistant for both shopping guidance and support.")
+    if hasattr(store, "stats"):
+        session_stats = store.stats()
+        st.sidebar.write(f"Sessions in memory: {session_stats['sessions']}, ~{session_stats['bytes_per_session'] / 1024:.1f} KB each, {session_stats['evictions']} evicted")
 
-# Display product count in sidebar
-st.sidebar.title("Database Stats")
-st.sidebar.write("Products: 20, FAQ Knowledge Base linked")
+    render_metrics_panel()
 
-st.sidebar.write("Brands: pTron, Sony, OnePlus, JBL, Skullcandy, Boult")
+    if ADMIN_VIEW_ENABLED:
+        render_profiling_panel(session, store)
 
+    # The page is on screen - load the LLM libraries before the first question
+    prewarm()
 
+# Streamlit executes this script as __main__; the chat logic itself lives
+# in engine.py
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Run a backlog of conversations through the bot offline.
+
+    python batch.py tickets.jsonl drafts.jsonl --concurrency 16
+
+Each input line is {"id": ..., "turns": ["first user message", ...]} or
+{"id": ..., "messages": [{"role": "user", "content": ...}, ...]}. Every
+conversation runs in a fresh session and one result line is appended to the
+output as soon as it finishes:
+
+    {"id": ..., "index": <input line>, "turns": [{"user": ..., "assistant": ...}],
+     "error": false, "elapsed_s": ..., "duplicate_of": <id, only for duplicates>}
+
+The output file doubles as the checkpoint: rerunning the same command skips
+conversations that already have a result, so an interrupted run resumes where
+it stopped (--retry-errors also reruns the ones that failed). Conversations
+with identical turns are answered once and the result is reused.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import BATCH_CONCURRENCY
+
+# Unique conversations remembered for deduplication
+DEDUPE_WINDOW = 10000
+
+# Seconds between progress lines on stderr
+PROGRESS_INTERVAL = 10.0
+
+
+def read_conversations(path):
+    """Stream (index, id, [user messages]) from a JSONL file"""
+    with open(path, encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            turns = record.get("turns")
+            if turns is None:
+                turns = [m["content"] for m in record.get("messages", []) if m.get("role") == "user"]
+            yield index, str(record.get("id", index)), turns
+
+
+def read_checkpoint(path, retry_errors=False):
+    """
+    IDs that already have a result in the output file.
+
+    A line cut short by an interrupted run is removed so appending resumes
+    on a clean line boundary.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        valid_end = 0
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_end += len(line)
+            if retry_errors and record.get("error"):
+                done.discard(record["id"])
+            else:
+                done.add(record["id"])
+        f.truncate(valid_end)
+    return done
+
+
+def conversation_key(turns):
+    return hashlib.sha1(json.dumps(turns, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def run_conversation(engine, turns):
+    """Play the turns through a fresh session and return the result fields"""
+    start = time.perf_counter()
+    session = engine.Session()
+    results = []
+    error = False
+    try:
+        for message in turns:
+            response = engine.run_turn(message, session)
+            results.append({"user": message, "assistant": response})
+            error = error or engine.is_degraded_response(response)
+    except Exception as e:
+        results.append({"user": turns[len(results)], "exception": f"{type(e).__name__}: {e}"})
+        error = True
+    return {"turns": results, "error": error, "elapsed_s": round(time.perf_counter() - start, 3)}
+
+
+class BatchRunner:
+    """Bounded fan-out over a worker pool with deduplication and incremental output"""
+
+    def __init__(self, engine, output, concurrency, dedupe_window=DEDUPE_WINDOW):
+        self.engine = engine
+        self.output = output
+        self.concurrency = concurrency
+        self.dedupe_window = dedupe_window
+        self._seen = OrderedDict()  # conversation key -> (first id, future)
+        self._write_lock = threading.Lock()
+        self.stats = {"conversations": 0, "turns": 0, "llm_conversations": 0, "duplicates": 0, "errors": 0, "skipped": 0}
+
+    def _write(self, index, conversation_id, result, duplicate_of=None):
+        record = {"id": conversation_id, "index": index, **result}
+        if duplicate_of is not None:
+            record["duplicate_of"] = duplicate_of
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._write_lock:
+            self.output.write(line)
+            self.output.flush()
+            self.stats["conversations"] += 1
+            self.stats["turns"] += len(result["turns"])
+            self.stats["errors"] += result["error"]
+
+    def _process(self, index, conversation_id, turns):
+        result = run_conversation(self.engine, turns)
+        self._write(index, conversation_id, result)
+        return result
+
+    def run(self, conversations, done=(), progress=None):
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch")
+        pending = set()
+        try:
+            for index, conversation_id, turns in conversations:
+                if conversation_id in done:
+                    self.stats["skipped"] += 1
+                    continue
+                # Keep at most a couple of conversations queued per worker so the
+                # input is streamed rather than read up front
+                while len(pending) >= 2 * self.concurrency:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        future.result()
+                    if progress:
+                        progress()
+                key = conversation_key(turns)
+                original = self._seen.get(key)
+                if original is not None:
+                    # Reuse the first result without taking a worker slot
+                    self.stats["duplicates"] += 1
+                    self._seen.move_to_end(key)
+                    first_id, future = original
+                    future.add_done_callback(
+                        lambda f, i=index, c=conversation_id, d=first_id: self._write(i, c, f.result(), duplicate_of=d)
+                    )
+                    continue
+                self.stats["llm_conversations"] += 1
+                future = pool.submit(self._process, index, conversation_id, turns)
+                self._seen[key] = (conversation_id, future)
+                if len(self._seen) > self.dedupe_window:
+                    self._seen.popitem(last=False)
+                pending.add(future)
+            for future in pending:
+                future.result()
+        finally:
+            # Also waits for duplicate results written from completion callbacks
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL backlog of conversations through the bot")
+    parser.add_argument("input", help="JSONL conversations")
+    parser.add_argument("output", help="JSONL results, appended to and used as the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="conversations in flight")
+    parser.add_argument("--retry-errors", action="store_true", help="rerun conversations whose result was an error")
+    parser.add_argument("--dedupe-window", type=int, default=DEDUPE_WINDOW,
+                        help="unique conversations remembered for deduplication")
+    args = parser.parse_args()
+
+    done = read_checkpoint(args.output, args.retry_errors)
+    import engine  # loads the catalog and indexes
+
+    start = time.perf_counter()
+    last_report = [start]
+
+    def report(final=False):
+        now = time.perf_counter()
+        if not final and now - last_report[0] < PROGRESS_INTERVAL:
+            return
+        last_report[0] = now
+        elapsed = now - start
+        stats = dict(runner.stats, elapsed_s=round(elapsed, 1))
+        stats["conversations_per_s"] = round(stats["conversations"] / elapsed, 2) if elapsed else 0.0
+        stats["turns_per_s"] = round(stats["turns"] / elapsed, 2) if elapsed else 0.0
+        print(json.dumps(stats), file=sys.stderr)
+
+    with open(args.output, "a", encoding="utf-8") as output:
+        runner = BatchRunner(engine, output, args.concurrency, args.dedupe_window)
+        try:
+            runner.run(read_conversations(args.input), done, report)
+        except KeyboardInterrupt:
+            print("Interrupted - rerun the same command to resume", file=sys.stderr)
+        finally:
+            report(final=True)
+
+
+if __name__ == "__main__":
+    main()
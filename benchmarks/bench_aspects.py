@@ -0,0 +1,90 @@
+"""
+Review-aspect index at catalog scale.
+
+Builds synthetic catalogs by resampling the real products' reviews (with a
+share of unique review wording, so the snippet cache doesn't see only
+repeats) and reports the startup aspect pass, the memory of the aspect
+columns and the latency of answering aspect questions locally.
+
+    python benchmarks/bench_aspects.py [--sizes 1000 10000 100000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import load_products, product_snippets  # noqa: E402
+from product_query import answer_product_query  # noqa: E402
+from product_table import ProductTable  # noqa: E402
+from review_aspects import ASPECTS, classify_snippet  # noqa: E402
+
+QUESTIONS = [
+    "Show me wireless earbuds with good battery life",
+    "I need something comfortable for long use",
+    "best noise cancelling headphones under 10000",
+    "which sony headphones have the best bass",
+    "durable wired earphones under 2000",
+    "earbuds with stable connection rated 4 stars and above",
+]
+
+EXTRA_WORDS = ["really", "honestly", "overall", "for me", "after a week", "so far", "in my experience"]
+
+
+def synthetic_products(base, count, unique_share, rng):
+    """count products resampled from base, with some reviews reworded to be unique"""
+    reviews = [review for product in base for review in product_snippets(product)[1]]
+    products = []
+    for product_id in range(count):
+        template = rng.choice(base)
+        picked = rng.sample(reviews, 5)
+        picked = [
+            f"{review} {rng.choice(EXTRA_WORDS)} {product_id}" if rng.random() < unique_share else review
+            for review in picked
+        ]
+        products.append(dict(template, product_id=product_id, reviews=" | ".join(picked)))
+    return products
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the review-aspect index")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--unique-share", type=float, default=0.1, help="fraction of reviews with unique wording")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base = load_products()
+    report = []
+    for size in args.sizes:
+        products = synthetic_products(base, size, args.unique_share, rng)
+        classify_snippet.cache_clear()
+        start = time.perf_counter()
+        table = ProductTable(products)
+        build = time.perf_counter() - start
+        aspect_bytes = sum(
+            table.columns[f"{aspect}_{kind}"].nbytes for aspect in ASPECTS for kind in ("score", "mentions")
+        )
+        latencies = []
+        for _ in range(5):
+            for question in QUESTIONS:
+                start = time.perf_counter()
+                answer_product_query(question, table)
+                latencies.append(time.perf_counter() - start)
+        report.append({
+            "products": size,
+            "table_build_ms": round(build * 1000, 1),
+            "aspect_columns_kb": round(aspect_bytes / 1024, 1),
+            "unique_snippets": classify_snippet.cache_info().currsize,
+            "answer_p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "answer_max_ms": round(max(latencies) * 1000, 3),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Streamlit rerun time against conversation length.
+
+Seeds sessions of 10, 100 and 1,000 turns (the questions of the replay
+conversations, answered with catalog product lists like the local answer
+paths produce), then reruns app.py through AppTest with the whole history
+drawn, as the app used to, and with only the recent window drawn. Reported
+per length and mode: rerun latency, chat messages drawn, and the bytes of
+the markdown elements sent to the browser.
+
+    python benchmarks/bench_chat_render.py [--turns 10 100 1000] [--reruns 10]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep every seeded message and leave the catalog watcher off
+os.environ.update(SESSION_MAX_MESSAGES="0", CATALOG_POLL_INTERVAL="0")
+
+import config  # noqa: E402
+from catalog_store import get_catalog  # noqa: E402
+from engine import Session  # noqa: E402
+from product_query import format_product_line  # noqa: E402
+from session_store import get_session_store  # noqa: E402
+
+
+def seeded_session(turns, rng):
+    """A session with turns question/answer pairs"""
+    with open(os.path.join(ROOT, "benchmarks", "conversations.jsonl"), encoding="utf-8") as f:
+        questions = [turn for line in f for turn in json.loads(line)["turns"]]
+    products = get_catalog().products
+    session = Session()
+    for _ in range(turns):
+        session.messages.append({"role": "user", "content": rng.choice(questions)})
+        picks = rng.sample(products, rng.randint(3, 6))
+        lines = [f"Here are {len(picks)} options that fit:", ""]
+        lines.extend(format_product_line(position, product) for position, product in enumerate(picks, 1))
+        session.messages.append({"role": "assistant", "content": "\n".join(lines)})
+    get_session_store().save(session)
+    return session
+
+
+def measure(session, window, reruns):
+    from streamlit.testing.v1 import AppTest
+
+    config.CHAT_HISTORY_WINDOW = window  # app.py reads it on every run
+    app_test = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    app_test.session_state["session_id"] = session.session_id
+    app_test.run()
+    samples = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app_test.run()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "rerun_ms": {
+            "p50": round(statistics.median(samples) * 1000, 1),
+            "p95": round(samples[int(0.95 * (len(samples) - 1))] * 1000, 1),
+        },
+        "messages_drawn": len(app_test.chat_message),
+        "markdown_kb": round(sum(element.proto.ByteSize() for element in app_test.markdown) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Streamlit rerun time as the chat history grows")
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    window = config.CHAT_HISTORY_WINDOW or 20
+    report = []
+    for turns in args.turns:
+        session = seeded_session(turns, rng)
+        report.append({
+            "turns": turns,
+            "full_history": measure(session, 0, args.reruns),
+            f"window_{window}": measure(session, window, args.reruns),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
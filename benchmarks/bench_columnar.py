@@ -0,0 +1,145 @@
+"""
+Columnar catalog against the CSV path at catalog scale.
+
+Writes synthetic catalog CSVs (the real rows resampled, prices jittered
+and a share of reviews reworded so the text and the term vocabulary grow
+with the catalog), compiles each into a columnar file, and opens both in
+fresh worker processes. Reported per size: compile time and file size,
+then for each format the time to open the catalog and the process memory
+after opening and after a workload of prompt building, filter queries and
+sidebar stats. RSS is split into anonymous (private to the worker) and
+file-backed pages (the shared mapping of the columnar file).
+
+    python benchmarks/bench_columnar.py [--sizes 10000 100000] [--workers 4]
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from catalog import CSV_COLUMNS, read_rows  # noqa: E402
+from columnar_catalog import build_columnar  # noqa: E402
+from config import CATALOG_PATH  # noqa: E402
+
+EXTRA_WORDS = ["really", "honestly", "overall", "for me", "after a week", "so far", "in my experience"]
+
+WORKER_SNIPPET = """
+import json
+import time
+start = time.perf_counter()
+
+def memory():
+    fields = {{}}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("VmRSS", "RssAnon", "RssFile"):
+                fields[name] = round(int(value.split()[0]) / 1024, 1)
+    return fields
+
+from catalog import format_compact_context
+from catalog_store import open_snapshot
+from facets import answer_comparison
+from product_query import answer_product_query
+from retrieval import retrieve_products
+imported = time.perf_counter()
+snapshot = open_snapshot({path!r})
+opened = time.perf_counter()
+after_open = memory()
+
+questions = {questions!r}
+for question in questions:
+    products = retrieve_products(snapshot.index, snapshot.by_id, question, 6)
+    format_compact_context(products, snapshot.legend, snapshot.rows)
+    answer_comparison(question, snapshot.facets) or answer_product_query(question, snapshot.table)
+sidebar = (len(snapshot), ", ".join(snapshot.brands))
+done = time.perf_counter()
+print(json.dumps({{
+    "import_ms": round((imported - start) * 1000, 1),
+    "open_ms": round((opened - imported) * 1000, 1),
+    "workload_ms": round((done - opened) * 1000, 1),
+    "memory_after_open_mb": after_open,
+    "memory_after_workload_mb": memory(),
+}}))
+"""
+
+QUESTIONS = [
+    "wireless headphones with good bass",
+    "Show me wireless earbuds with good battery life",
+    "best noise cancelling headphones under 10000",
+    "cheapest sony earphones",
+    "compare sony vs boat earphones",
+    "which headphones have the highest rating?",
+    "durable wired earphones under 2000",
+    "black over ear headphones with good comfort",
+]
+
+
+def write_synthetic_csv(path, base_rows, count, unique_share, rng):
+    """count rows resampled from base_rows with jittered numbers and partly unique reviews"""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for i in range(count):
+            row = dict(rng.choice(base_rows))
+            price = int(float(row["Discounted Price"] or 0) * rng.uniform(0.8, 1.2))
+            row["Discounted Price"] = str(max(1, price))
+            row["Rating Count"] = str(rng.randint(0, 50000))
+            row["Reviews"] = " | ".join(
+                f"{review.strip()} {rng.choice(EXTRA_WORDS)} {i}" if rng.random() < unique_share else review.strip()
+                for review in row["Reviews"].split("|")
+            )
+            writer.writerow({column: row.get(column, "") for column in CSV_COLUMNS})
+
+
+def run_worker(path):
+    code = WORKER_SNIPPET.format(path=path, questions=QUESTIONS)
+    env = dict(os.environ, CATALOG_POLL_INTERVAL="0")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare startup time and memory of the CSV and columnar catalogs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--workers", type=int, default=4, help="columnar workers opened one after another per size")
+    parser.add_argument("--unique-share", type=float, default=0.1, help="fraction of reviews with unique wording")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base_rows = list(read_rows(CATALOG_PATH))
+    report = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            csv_path = os.path.join(directory, f"catalog-{size}.csv")
+            columnar_path = os.path.join(directory, f"catalog-{size}.bin")
+            write_synthetic_csv(csv_path, base_rows, size, args.unique_share, rng)
+            start = time.perf_counter()
+            build_columnar(csv_path, columnar_path)
+            compile_s = time.perf_counter() - start
+
+            columnar = [run_worker(columnar_path) for _ in range(args.workers)]
+            report.append({
+                "products": size,
+                "csv_mb": round(os.path.getsize(csv_path) / 1e6, 1),
+                "columnar_mb": round(os.path.getsize(columnar_path) / 1e6, 1),
+                "compile_s": round(compile_s, 2),
+                "csv": run_worker(csv_path),
+                "columnar": columnar[0],
+                # Later workers find the file's pages already in the page cache
+                "columnar_warm_open_ms": [worker["open_ms"] for worker in columnar[1:]],
+            })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Facet aggregates at catalog scale.
+
+Builds synthetic catalogs by resampling the real products, then reports the
+facet index build time, the latency of answering comparison questions from
+it against a full scan of the product table, and the cost of applying a
+small catalog change incrementally versus rebuilding the index.
+
+    python benchmarks/bench_facets.py [--sizes 1000 10000 100000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import load_products  # noqa: E402
+from facets import FACETS, FacetIndex, answer_comparison, parse_comparison  # noqa: E402
+from product_table import ProductTable  # noqa: E402
+
+QUESTIONS = [
+    "Compare Sony and JBL earphones",
+    "Is Sony or JBL better?",
+    "compare wired and wireless earphones",
+    "difference between in-ear and over-ear headphones",
+    "compare black and white Sony headphones",
+    "Boult vs pTron vs Noise truly wireless earbuds",
+]
+
+
+def synthetic_products(base, count, rng):
+    """count products resampled from base with jittered prices and ratings"""
+    products = []
+    for product_id in range(count):
+        template = rng.choice(base)
+        products.append(dict(
+            template,
+            product_id=product_id,
+            discounted_price=max(1, int(template["discounted_price"] * rng.uniform(0.8, 1.2))),
+            rating=round(min(5.0, max(1.0, template["rating"] + rng.uniform(-0.5, 0.5))), 1),
+        ))
+    return products
+
+
+def scan_comparison(message, index, table):
+    """The same comparison computed by masking and reducing the table columns"""
+    facet, options, filters = parse_comparison(message, {f: index.values(f) for f in FACETS})
+    results = []
+    for _, accepted in options:
+        mask = table.all_rows()
+        for name, values in dict(filters, **{facet: accepted}).items():
+            mask = table.one_of(mask, name, values)
+        prices = table.columns["discounted_price"][mask]
+        results.append(None if not prices.size else (
+            prices.min(), prices.max(), prices.mean(), table.columns["rating"][mask].mean(),
+            table.columns["rating_count"][mask].sum(), table.columns["discount_percentage"][mask].max(),
+        ))
+    return results
+
+
+def timed(function, repeat=5):
+    latencies = []
+    for _ in range(repeat):
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            function(question)
+            latencies.append(time.perf_counter() - start)
+    return round(statistics.median(latencies) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the facet aggregate index")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--changed", type=int, default=20, help="products replaced in the incremental update")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base = load_products()
+    report = []
+    for size in args.sizes:
+        products = synthetic_products(base, size, rng)
+        start = time.perf_counter()
+        index = FacetIndex(products)
+        build = time.perf_counter() - start
+        table = ProductTable(products)
+
+        removed = rng.sample(products, args.changed)
+        added = synthetic_products(base, args.changed, rng)
+        start = time.perf_counter()
+        index.updated(added, removed)
+        incremental = time.perf_counter() - start
+
+        report.append({
+            "products": size,
+            "groups": len(index.groups),
+            "index_build_ms": round(build * 1000, 1),
+            "incremental_update_ms": round(incremental * 1000, 3),
+            "answer_p50_ms": timed(lambda q: answer_comparison(q, index)),
+            "table_scan_p50_ms": timed(lambda q: scan_comparison(q, index, table)),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
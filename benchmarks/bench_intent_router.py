@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: compiled intent router vs the original per-check scans.
+
+The baseline reproduces what process_message used to do for every message:
+lowercase + any(keyword in text) for escalation, repeated .lower() substring
+checks for status/where/track/return/refund, and split/strip for order IDs.
+Both sides are run with keyword lists padded to growing sizes.
+
+    python benchmarks/bench_intent_router.py [--messages 2000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import IntentRouter, FAQ_TOPIC_KEYWORDS, PRODUCT_KEYWORDS  # noqa: E402
+
+ESCALATION_KEYWORDS = ["fraud", "dispute", "human", "agent", "supervisor", "manager", "speak to someone", "real person"]
+ORDERS = {"123", "456", "789"}
+
+SAMPLE_MESSAGES = [
+    "Where is my order #123? It was supposed to arrive yesterday.",
+    "I want to return order 456, the left earbud has no sound.",
+    "What are the best headphones under ₹5000?",
+    "Can I pay on delivery?",
+    "This is ridiculous, let me speak to someone right now!",
+    "Compare Sony and JBL earphones for me please",
+    "How long will my refund take?",
+    "Show me wireless earbuds with good battery life",
+]
+
+
+def random_keywords(count, rng):
+    """Synthetic extra keywords to grow the lists into the hundreds"""
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10))) for _ in range(count)]
+
+
+def baseline(message, escalation_keywords, topic_keywords):
+    """The original chain of independent scans"""
+    escalate = any(keyword in message.lower() for keyword in escalation_keywords)
+    order = None
+    for word in message.split():
+        cleaned = word.strip("#.,?!").strip()
+        if cleaned in ORDERS:
+            order = cleaned
+            break
+    status = "status" in message.lower() or "where" in message.lower() or "track" in message.lower()
+    refund = "return" in message.lower() or "refund" in message.lower()
+    topics = [topic for topic, keywords in topic_keywords.items() if any(k in message.lower() for k in keywords)]
+    return escalate, order, status, refund, topics
+
+
+def timed(fn, messages):
+    start = time.perf_counter()
+    for message in messages:
+        fn(message)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    messages = [rng.choice(SAMPLE_MESSAGES) for _ in range(args.messages)]
+
+    print(f"{'keywords':>9} {'baseline us/msg':>16} {'router us/msg':>14} {'speedup':>8}")
+    for extra in (0, 100, 500, 2000):
+        escalation = ESCALATION_KEYWORDS + random_keywords(extra // 4, rng)
+        topics = {topic: keywords + random_keywords(extra // (4 * len(FAQ_TOPIC_KEYWORDS)), rng)
+                  for topic, keywords in FAQ_TOPIC_KEYWORDS.items()}
+        keyword_sets = {
+            "escalation": escalation,
+            "order_status": ["status", "where", "track"],
+            "return_refund": ["return", "refund"],
+            "product": PRODUCT_KEYWORDS + random_keywords(extra // 2, rng),
+        }
+        keyword_sets.update({"faq:" + topic: keywords for topic, keywords in topics.items()})
+        total = sum(len(k) for k in keyword_sets.values())
+
+        router = IntentRouter(keyword_sets)
+        base_us = timed(lambda m: baseline(m, escalation, topics), messages)
+        router_us = timed(router.route, messages)
+        print(f"{total:>9} {base_us:>16.2f} {router_us:>14.2f} {base_us / router_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Fuzzy product-name resolution at catalog scale.
+
+Builds synthetic catalogs of distinct product names (the real brands plus
+generated ones, model names, the real types and colors), then resolves
+mentions of randomly picked products - "how much is the boult rockerz450
+blue", with a typo in one word for a share of them - and reports the index
+build time, the time to patch it for a reload replacing 1% of the names,
+lookup latency percentiles (in-memory and over the flat arrays a columnar
+file maps) and how often the product meant is among the resolved ones.
+
+    python benchmarks/bench_name_resolver.py [--sizes 1000 10000 100000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import load_products  # noqa: E402
+from name_resolver import MappedNameResolver, NameResolver  # noqa: E402
+
+SERIES = ["rockerz", "airdopes", "bass", "tune", "live", "flow", "buds", "crusher", "pulse", "wave", "nova", "echo"]
+SYLLABLES = ["ka", "zo", "ri", "vex", "lo", "mi", "tor", "sa", "qu", "ne", "bri", "dax"]
+TEMPLATES = ["how much is the {mention}", "{mention} price?", "tell me about the {mention}", "is the {mention} any good"]
+
+
+def synthetic_names(base, count, rng):
+    """count distinct "<Brand> <Model> <Type> - <Color> Edition" names and their attributes"""
+    brands = sorted({p["brand"] for p in base})
+    brands += [(rng.choice(SYLLABLES) + rng.choice(SYLLABLES) + rng.choice(SYLLABLES)).title() for _ in range(200)]
+    types = sorted({p["type"] for p in base})
+    colors = sorted({p["color"] for p in base})
+    rows = []
+    seen = set()
+    while len(rows) < count:
+        brand, product_type, color = rng.choice(brands), rng.choice(types), rng.choice(colors)
+        model = f"{rng.choice(SERIES)}{rng.randint(100, 9999)}"
+        name = f"{brand} {model.title()} {product_type} - {color} Edition"
+        if name not in seen:
+            seen.add(name)
+            rows.append((name, brand, model, product_type, color))
+    vocabularies = {
+        "brand": sorted({r[1] for r in rows}),
+        "type": sorted({r[3] for r in rows}),
+        "color": sorted({r[4] for r in rows}),
+    }
+    return rows, vocabularies
+
+
+def misspell(word, rng):
+    """Drop, double or swap one character"""
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(["drop", "double", "swap"])
+    if edit == "drop":
+        return word[:i] + word[i + 1:]
+    if edit == "double":
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return {
+        "p50": round(statistics.median(latencies) * 1000, 3),
+        "p95": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 3),
+        "max": round(latencies[-1] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the trigram product-name resolver")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--typo-share", type=float, default=0.5, help="fraction of mentions with a misspelt word")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base = load_products()
+    report = []
+    for size in args.sizes:
+        rows, vocabularies = synthetic_names(base, size, rng)
+        popularity = np.array([rng.randint(0, 50000) for _ in rows], dtype=np.int64)
+        start = time.perf_counter()
+        resolver = NameResolver(range(size), [r[0] for r in rows], vocabularies, popularity)
+        build = time.perf_counter() - start
+
+        replaced = rng.sample(range(size), max(size // 100, 1))
+        added = [(size + i, f"{rows[row][0]} Pro", popularity[row]) for i, row in enumerate(replaced)]
+        start = time.perf_counter()
+        resolver.updated(added, replaced, vocabularies)
+        update = time.perf_counter() - start
+
+        exported = resolver.export()
+        mapped = MappedNameResolver(**exported, vocabularies=vocabularies, popularity=popularity)
+
+        latencies = []
+        mapped_latencies = []
+        hits = 0
+        top1 = 0
+        for _ in range(args.queries):
+            target = rng.randrange(size)
+            _, brand, model, product_type, color = rows[target]
+            words = [brand.lower(), model, color.lower()]
+            if rng.random() < args.typo_share:
+                typo = rng.randrange(len(words))
+                words[typo] = misspell(words[typo], rng)
+            message = rng.choice(TEMPLATES).format(mention=" ".join(words))
+            start = time.perf_counter()
+            resolved = resolver.resolve(message, 6)
+            latencies.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            mapped.resolve(message, 6)
+            mapped_latencies.append(time.perf_counter() - start)
+            hits += target in resolved
+            top1 += bool(resolved) and resolved[0] == target
+
+        report.append({
+            "names": size,
+            "vocabulary_words": len(resolver.words),
+            "build_s": round(build, 3),
+            "update_1pct_s": round(update, 4),
+            "lookup_ms": percentiles(latencies),
+            "mapped_lookup_ms": percentiles(mapped_latencies),
+            "recall_at_6": round(hits / args.queries, 3),
+            "top1": round(top1 / args.queries, 3),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
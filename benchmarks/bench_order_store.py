@@ -0,0 +1,86 @@
+"""
+Order store benchmark: bulk load N synthetic orders into SQLite, then measure
+lookup latency by order ID (cold and LRU-warm) and by customer.
+
+    python benchmarks/bench_order_store.py [--rows 1000000] [--lookups 20000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_store import SQLiteOrderStore, bulk_load  # noqa: E402
+
+STATUSES = ["shipped", "delivered", "processing"]
+ITEMS = ["Wireless Earbuds", "Phone Case", "Smart Watch", "Charging Cable", "Bluetooth Speaker"]
+
+
+def synthetic_orders(count, customers):
+    rng = random.Random(42)
+    for i in range(count):
+        status = STATUSES[i % 3]
+        order = {
+            "customer_id": f"C{rng.randrange(customers):07d}",
+            "status": status,
+            "items": rng.sample(ITEMS, rng.randint(1, 3)),
+        }
+        order[{"shipped": "eta", "delivered": "delivery_date", "processing": "ship_date"}[status]] = "October 21"
+        yield str(100000 + i), order
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return f"p50 {pick(0.50):7.1f}us  p95 {pick(0.95):7.1f}us  p99 {pick(0.99):7.1f}us  mean {statistics.fmean(samples):7.1f}us"
+
+
+def measure(fn, keys):
+    samples = []
+    for key in keys:
+        start = time.perf_counter_ns()
+        fn(key)
+        samples.append((time.perf_counter_ns() - start) / 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite order store benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    customers = max(1, args.rows // 5)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "orders.db")
+        start = time.perf_counter()
+        count = bulk_load(path, synthetic_orders(args.rows, customers))
+        load_seconds = time.perf_counter() - start
+        print(f"bulk load: {count:,} rows in {load_seconds:.1f}s ({count / load_seconds:,.0f} rows/s), "
+              f"{os.path.getsize(path) / 1e6:.0f} MB")
+
+        rng = random.Random(1)
+        ids = [str(100000 + rng.randrange(args.rows)) for _ in range(args.lookups)]
+        misses = [str(rng.randrange(10 ** 9, 10 ** 10)) for _ in range(args.lookups)]
+        hot = ids[:100]
+
+        cold = SQLiteOrderStore(path, cache_size=0)
+        cold.get(ids[0])  # open the connection outside the timings
+        print(f"by id (no cache):  {percentiles(measure(cold.get, ids))}")
+        print(f"missing id:        {percentiles(measure(cold.get, misses))}")
+
+        warm = SQLiteOrderStore(path)
+        for order_id in hot:
+            warm.get(order_id)
+        print(f"by id (LRU hot):   {percentiles(measure(warm.get, [rng.choice(hot) for _ in range(args.lookups)]))}")
+
+        customer_ids = [f"C{rng.randrange(customers):07d}" for _ in range(args.lookups // 4)]
+        print(f"by customer:       {percentiles(measure(cold.find_by_customer, customer_ids))}")
+
+
+if __name__ == "__main__":
+    main()
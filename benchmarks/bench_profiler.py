@@ -0,0 +1,82 @@
+"""
+Overhead of the turn profiler.
+
+Replays the conversations through engine.run_turn against the local mock
+LLM server three times: with the profiler off (the per-turn timings only),
+with every turn sampled for call stacks, and sampled again with a tenth of
+the interval. Reported per mode: turn latency percentiles, process CPU time
+per turn and stack samples per turn.
+
+    python benchmarks/bench_profiler.py [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import start_server  # noqa: E402
+from replay import DEFAULT_CONVERSATIONS, load_conversations  # noqa: E402
+
+
+def run(conversations, repeat, profiling):
+    import engine
+    from profiler import get_profiler
+
+    profiler = get_profiler()
+    latencies = []
+    samples = 0
+    cpu_start = time.process_time()
+    for _ in range(repeat):
+        for _, turns in conversations:
+            session = engine.Session(profiling=profiling)
+            for message in turns:
+                start = time.perf_counter()
+                engine.run_turn(message, session)
+                latencies.append(time.perf_counter() - start)
+                samples += profiler.recent[-1][0]["samples"]
+    cpu = time.process_time() - cpu_start
+    latencies.sort()
+    return {
+        "turns": len(latencies),
+        "turn_ms": {
+            "p50": round(statistics.median(latencies) * 1000, 2),
+            "p95": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2),
+            "mean": round(statistics.fmean(latencies) * 1000, 2),
+        },
+        "cpu_ms_per_turn": round(cpu / len(latencies) * 1000, 2),
+        "samples_per_turn": round(samples / len(latencies), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the overhead of sampling turn profiles")
+    parser.add_argument("--conversations", default=DEFAULT_CONVERSATIONS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock LLM time to first token (seconds)")
+    args = parser.parse_args()
+
+    server = start_server(latency=args.latency, tokens_per_second=2000)
+    # Every repeat goes to the model, not the response cache; nothing is
+    # written as a slow-turn artifact
+    os.environ.update(LLM_BASE_URL=server.url, CATALOG_POLL_INTERVAL="0", RESPONSE_CACHE_ENABLED="0", PROFILE_DIR="")
+    os.environ.setdefault("LLM_MAX_RETRIES", "0")
+    from profiler import get_profiler
+
+    conversations = load_conversations(args.conversations)
+    run(conversations, 1, False)  # warm up imports, indexes and connections
+    report = {"off": run(conversations, args.repeat, False), "sampled": run(conversations, args.repeat, True)}
+    sampler = get_profiler().sampler
+    sampler.interval /= 10
+    report[f"sampled_{sampler.interval * 1000:g}ms"] = run(conversations, args.repeat, True)
+    server.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+System prompt size: compact catalog table vs the original JSON layout.
+
+The original prompt put the pretty-printed PRODUCT_DATA JSON (every value a
+quoted string) near the top of the system prompt. The compact layout writes
+a table with bare numbers, replaces shared about/review snippets with legend
+codes and appends the rows at the very end. For every user message in the
+sample conversations both prompts are built, and the report compares their
+token counts and how much of the prompt is a byte-identical prefix shared by
+every request (what provider-side prompt caching can reuse).
+
+Tokens are counted with tiktoken when it is installed, otherwise with the
+app's ~4 characters per token estimate.
+
+    python benchmarks/bench_prompt_size.py
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import engine  # noqa: E402
+from catalog import format_compact_context, format_product_context  # noqa: E402
+from history import estimate_tokens  # noqa: E402
+
+DEFAULT_CONVERSATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "conversations.jsonl")
+
+LEGACY_DESCRIPTION = "Context: {0}\n\nYou have access to a structured JSON object stored in a variable called PRODUCT_DATA.  "
+
+
+def token_counter():
+    try:
+        import tiktoken
+    except ImportError:
+        return estimate_tokens, "estimate (4 chars/token)"
+    encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+    return lambda text: len(encoding.encode(text)), "tiktoken gpt-3.5-turbo"
+
+
+def legacy_prompt(products):
+    """The system prompt as it was built before: JSON context near the top"""
+    description = LEGACY_DESCRIPTION.format(format_product_context(products))
+    return engine.SYSTEM_PROMPT_TEMPLATE.format(catalog_description=description, catalog_legend="")
+
+
+def compact_prompt(catalog, products):
+    data = format_compact_context(products, catalog.legend)
+    return f"{engine.catalog_prompt_prefix(catalog)[0]}\nPRODUCT_DATA:\n{data}\n"
+
+
+def common_prefix(texts):
+    return os.path.commonprefix(texts) if texts else ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare system prompt sizes of the catalog formats")
+    parser.add_argument("--conversations", default=DEFAULT_CONVERSATIONS)
+    args = parser.parse_args()
+
+    count_tokens, counter_name = token_counter()
+    messages = []
+    with open(args.conversations, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                messages.extend(record.get("turns") or [m["content"] for m in record["messages"] if m["role"] == "user"])
+
+    catalog = engine.get_catalog()
+    legacy, compact = [], []
+    for message in messages:
+        products = engine.retrieve_products(catalog.index, catalog.by_id, message, engine.RETRIEVAL_TOP_K)
+        legacy.append(legacy_prompt(products))
+        compact.append(compact_prompt(catalog, products))
+
+    def summary(prompts):
+        tokens = [count_tokens(p) for p in prompts]
+        prefix = count_tokens(common_prefix(prompts))
+        return {
+            "mean_tokens": round(sum(tokens) / len(tokens), 1),
+            "max_tokens": max(tokens),
+            "shared_prefix_tokens": prefix,
+            "shared_prefix_fraction": round(prefix * len(tokens) / sum(tokens), 3),
+        }
+
+    full_legacy = count_tokens(format_product_context(catalog.products))
+    full_compact = count_tokens(format_compact_context(catalog.products, catalog.legend) + catalog.legend.format())
+    old, new = summary(legacy), summary(compact)
+    report = {
+        "token_counter": counter_name,
+        "messages": len(messages),
+        "retrieved_products_per_message": engine.RETRIEVAL_TOP_K,
+        "json": old,
+        "compact": new,
+        "prompt_token_reduction": round(1 - new["mean_tokens"] / old["mean_tokens"], 3),
+        "full_catalog": {
+            "products": len(catalog),
+            "json_tokens": full_legacy,
+            "compact_tokens_with_legend": full_compact,
+            "reduction": round(1 - full_compact / full_legacy, 3),
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
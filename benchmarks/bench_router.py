@@ -0,0 +1,122 @@
+"""
+Model router against local stand-in providers.
+
+Starts two mock OpenAI-compatible servers, "primary" and "backup", registers
+them as the router's providers and replays the benchmark questions through
+the engine under a few failure scenarios:
+
+    healthy   both providers fine
+    slow-tail the primary answers a share of requests very late (hedging)
+    outage    the primary fails every request (circuit breaker, fallback)
+    blackout  both fail (local deterministic answers)
+
+and reports latency percentiles, degraded answers, hedges, the tier split,
+requests per provider and the circuit breaker states as JSON.
+
+    python benchmarks/bench_router.py [--turns 120] [--concurrency 8]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from mock_llm_server import start_server  # noqa: E402
+from replay import DEFAULT_CONVERSATIONS, load_conversations, percentiles  # noqa: E402
+
+# name -> (primary server settings, backup server settings)
+SCENARIOS = {
+    "healthy": ({}, {}),
+    "slow-tail": ({"slow_rate": 0.1, "slow_latency": 1.5}, {}),
+    "outage": ({"error_rate": 1.0}, {}),
+    "blackout": ({"error_rate": 1.0}, {"error_rate": 1.0}),
+}
+
+
+def counter_total(metrics, name, **labels):
+    """Sum of a counter over every label set that includes labels"""
+    return sum(
+        c["value"] for c in metrics.snapshot()["counters"]
+        if c["name"] == name and all(c["labels"].get(k) == v for k, v in labels.items())
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the model router against local stand-in providers")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--turns", type=int, default=120, help="questions replayed per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="first-token latency of a healthy provider")
+    parser.add_argument("--tokens-per-second", type=float, default=2000.0)
+    args = parser.parse_args()
+
+    # Every question goes to a model, failures surface at once, and the
+    # breaker and hedge thresholds suit a short run
+    os.environ.update(STRUCTURED_QUERIES_ENABLED="0", RESPONSE_CACHE_ENABLED="0", STREAM_RESPONSES="1")
+    for name, value in (("LLM_MAX_RETRIES", "0"), ("LLM_BREAKER_COOLDOWN", "5"),
+                        ("LLM_HEDGE_MIN_SAMPLES", "10"), ("LLM_HEDGE_DELAY", "0.5")):
+        os.environ.setdefault(name, value)
+    # Failed attempts are counted in the report rather than logged one by one
+    logging.getLogger("chatbot.llm").setLevel(logging.ERROR)
+    import engine  # noqa: E402
+    from model_router import ModelRouter, Provider, set_router  # noqa: E402
+
+    questions = [turn for _, turns in load_conversations(DEFAULT_CONVERSATIONS) for turn in turns]
+    questions = (questions * (args.turns // len(questions) + 1))[:args.turns]
+    report = []
+    for scenario in args.scenarios:
+        primary_settings, backup_settings = SCENARIOS[scenario]
+        servers = {
+            name: start_server(**dict({"latency": args.latency, "tokens_per_second": args.tokens_per_second, "seed": 7}, **settings))
+            for name, settings in (("primary", primary_settings), ("backup", backup_settings))
+        }
+        # Scenario-specific names keep each run's latency samples apart
+        router = ModelRouter([
+            Provider(f"{name}-{scenario}", server.url, api_key="bench") for name, server in servers.items()
+        ])
+        set_router(router)
+
+        latencies = []
+        degraded = []
+        lock = threading.Lock()
+
+        def ask(question):
+            session = engine.Session()
+            start = time.perf_counter()
+            response = engine.run_turn(question, session)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                degraded.append(engine.is_degraded_response(response))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(ask, questions))
+        elapsed = time.perf_counter() - start
+        report.append({
+            "scenario": scenario,
+            "turns": len(latencies),
+            "elapsed_s": round(elapsed, 2),
+            "latency_ms": percentiles(latencies),
+            "degraded": sum(degraded),
+            "hedges": sum(counter_total(engine.METRICS, "llm_hedges", provider=p) for p in router.providers),
+            "tiers": {
+                tier: sum(counter_total(engine.METRICS, "llm_calls", provider=p, tier=tier) for p in router.providers)
+                for tier in ("small", "large")
+            },
+            "requests": {name: server.stats()["requests"] for name, server in servers.items()},
+            "providers": router.stats(),
+        })
+        for server in servers.values():
+            server.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
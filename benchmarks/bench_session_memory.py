@@ -0,0 +1,117 @@
+"""
+Memory held per chat session.
+
+Fills sessions with synthetic conversations (questions from the replay set,
+answers computed locally from the catalog) and reports the bytes per session
+measured with tracemalloc for the previous representation - a plain list of
+message dicts - against the compact MessageLog, plus what the session
+store's own accounting reports and how it evicts under a memory ceiling.
+
+    python benchmarks/bench_session_memory.py [--sessions 500] [--turns 10 50 200]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from mock_llm_server import REPLY_WORDS  # noqa: E402
+from replay import DEFAULT_CONVERSATIONS, load_conversations  # noqa: E402
+
+
+def conversation_texts(engine, count, rng):
+    """count (question, answer) pairs, answers from the local structured paths where possible"""
+    questions = [turn for _, turns in load_conversations(DEFAULT_CONVERSATIONS) for turn in turns]
+    catalog = engine.get_catalog()
+    reply = " ".join(REPLY_WORDS)
+    pairs = []
+    for _ in range(count):
+        question = rng.choice(questions)
+        answer = (
+            engine.answer_comparison(question, catalog.facets)
+            or engine.answer_product_query(question, catalog.table)
+            or reply
+        )
+        pairs.append((question, answer))
+    return pairs
+
+
+def fresh(text):
+    """A new string object, as a message arriving in its own request would be"""
+    return text.encode("utf-8").decode("utf-8")
+
+
+def measure(build):
+    """Bytes allocated by build() and still alive afterwards"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bytes held per chat session")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--ceiling-mb", type=float, default=4.0, help="memory ceiling for the eviction run")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    import engine
+    from config import SESSION_COMPRESS_MIN_CHARS, SESSION_MAX_MESSAGES, SESSION_PLAIN_MESSAGES
+    from session_store import MemorySessionStore
+
+    rng = random.Random(args.seed)
+    report = {"config": {
+        "sessions": args.sessions,
+        "max_messages": SESSION_MAX_MESSAGES,
+        "plain_messages": SESSION_PLAIN_MESSAGES,
+        "compress_min_chars": SESSION_COMPRESS_MIN_CHARS,
+    }, "runs": []}
+    for turns in args.turns:
+        conversations = [conversation_texts(engine, turns, rng) for _ in range(args.sessions)]
+
+        def as_dicts():
+            return [
+                [{"role": role, "content": fresh(text)} for pair in pairs for role, text in zip(("user", "assistant"), pair)]
+                for pairs in conversations
+            ]
+
+        def as_sessions():
+            sessions = []
+            for pairs in conversations:
+                session = engine.Session()
+                for question, answer in pairs:
+                    session.messages.append({"role": "user", "content": fresh(question)})
+                    session.messages.append({"role": "assistant", "content": fresh(answer)})
+                sessions.append(session)
+            return sessions
+
+        before, _ = measure(as_dicts)
+        after, sessions = measure(as_sessions)
+        store = MemorySessionStore(max_bytes=int(args.ceiling_mb * 1024 * 1024))
+        for session in sessions:
+            store.save(session)
+        report["runs"].append({
+            "turns": turns,
+            "messages_held": len(sessions[0].messages),
+            "dict_list_bytes_per_session": round(before / args.sessions),
+            "message_log_bytes_per_session": round(after / args.sessions),
+            "store_estimate_bytes_per_session": round(sum(s.size() for s in sessions) / args.sessions),
+            "ceiling_run": store.stats(),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Cold start and Streamlit rerun timings.
+
+Cold start: fresh interpreters importing the engine (catalog, indexes,
+prompt), with the HTTP/OpenAI libraries loaded lazily as they are now, and
+with them imported up front as the app used to. Reported alongside is the
+first turn that needs the model in a fresh process, where the lazy import is
+paid unless prewarm() already ran.
+
+Rerun: the Streamlit script is run through AppTest and rerun repeatedly. The
+process-level work a rerun no longer repeats (loading the catalog, building
+the indexes and formatting the prompt prefix) is timed separately to show
+what each rerun saves.
+
+    python benchmarks/bench_startup.py [--runs 5] [--reruns 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import start_server  # noqa: E402
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+{preload}
+import engine
+print(time.perf_counter() - start)
+"""
+
+FIRST_TURN_SNIPPET = """
+import time
+import engine
+import llm_client
+if {prewarm}:
+    llm_client.prewarm()
+    time.sleep(1.0)  # the page rendering that prewarm overlaps with
+session = engine.Session()
+start = time.perf_counter()
+engine.run_turn("What do customers say about the sound of wireless headphones?", session)
+print(time.perf_counter() - start)
+"""
+
+
+def run_python(code, env=None):
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def median_ms(samples):
+    return round(statistics.median(samples) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start and Streamlit rerun times")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per cold start measurement")
+    parser.add_argument("--reruns", type=int, default=20, help="Streamlit reruns to time")
+    args = parser.parse_args()
+
+    server = start_server(latency=0.05, tokens_per_second=2000)
+    env = dict(os.environ, LLM_BASE_URL=server.url, LLM_MAX_RETRIES="0", CATALOG_POLL_INTERVAL="0")
+    os.environ.update(CATALOG_POLL_INTERVAL="0", LLM_BASE_URL=server.url)
+
+    report = {"cold_start_ms": {
+        "import_engine_lazy": median_ms([run_python(IMPORT_SNIPPET.format(preload=""), env) for _ in range(args.runs)]),
+        "import_engine_eager": median_ms([run_python(IMPORT_SNIPPET.format(preload="import httpx, openai"), env)
+                                          for _ in range(args.runs)]),
+        "first_llm_turn": median_ms([run_python(FIRST_TURN_SNIPPET.format(prewarm=False), env) for _ in range(args.runs)]),
+        "first_llm_turn_prewarmed": median_ms([run_python(FIRST_TURN_SNIPPET.format(prewarm=True), env)
+                                               for _ in range(args.runs)]),
+    }}
+
+    from streamlit.testing.v1 import AppTest
+
+    app_test = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    start = time.perf_counter()
+    app_test.run()
+    first = time.perf_counter() - start
+    reruns = []
+    for _ in range(args.reruns):
+        start = time.perf_counter()
+        app_test.run()
+        reruns.append(time.perf_counter() - start)
+
+    import engine
+    from catalog_store import build_snapshot
+    from config import CATALOG_PATH
+
+    rebuild = []
+    for _ in range(args.reruns):
+        start = time.perf_counter()
+        catalog = build_snapshot(CATALOG_PATH)
+        engine.system_prompt_prefix.__wrapped__(catalog.legend.format())
+        rebuild.append(time.perf_counter() - start)
+
+    report["rerun_ms"] = {
+        "first_run": round(first * 1000, 1),
+        "rerun_median": median_ms(reruns),
+        "rerun_p95": round(sorted(reruns)[int(0.95 * (len(reruns) - 1))] * 1000, 1),
+        "per_rerun_rebuild_avoided": median_ms(rebuild),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
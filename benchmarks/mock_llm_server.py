@@ -0,0 +1,194 @@
+"""
+Local OpenAI-compatible mock server for offline benchmarks.
+
+Serves POST /v1/chat/completions (streaming and non-streaming) with a
+configurable time to first token, token rate, slow-request and error
+injection, and
+GET /stats with request and token counters.
+
+    python benchmarks/mock_llm_server.py --port 8808 --latency 0.4 --tokens-per-second 80
+    LLM_BASE_URL=http://127.0.0.1:8808/v1 streamlit run app.py
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY_WORDS = (
+    "Great question! Based on what customers say, these headphones offer a comfortable fit, "
+    "balanced sound with punchy bass and dependable battery life for daily use. They are a "
+    "strong value at the current discounted price. Would you like me to compare them with a "
+    "couple of similar options in your budget, or check which colors are available?"
+).split()
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / 4) if text else 0
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """HTTP server holding the latency/error settings and counters"""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.3, tokens_per_second=60.0, completion_tokens=60,
+                 error_rate=0.0, error_status=500, slow_rate=0.0, slow_latency=0.0, seed=None):
+        super().__init__(address, MockHandler)
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "errors": 0, "streamed": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def count(self, **increments):
+        with self.lock:
+            for name, value in increments.items():
+                self.counters[name] += value
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def should_fail(self):
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def first_token_delay(self):
+        """Base latency, plus slow_latency for a slow_rate share of requests (the tail)"""
+        with self.lock:
+            slow = self.random.random() < self.slow_rate
+        return self.latency + (self.slow_latency if slow else 0.0)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.server.stats())
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        server = self.server
+        prompt_tokens = sum(estimate_tokens(m.get("content") or "") + 4 for m in body.get("messages", []))
+        server.count(requests=1, prompt_tokens=prompt_tokens)
+
+        time.sleep(server.first_token_delay())
+        if server.should_fail():
+            server.count(errors=1)
+            self._send_json(server.error_status, {"error": {"message": "injected failure", "type": "server_error"}})
+            return
+
+        tokens = min(server.completion_tokens, body.get("max_tokens") or server.completion_tokens)
+        words = [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(tokens)]
+        server.count(completion_tokens=tokens)
+        delay = 1.0 / server.tokens_per_second if server.tokens_per_second > 0 else 0.0
+        created = int(time.time())
+        model = body.get("model", "mock")
+
+        if not body.get("stream"):
+            time.sleep(delay * tokens)
+            self._send_json(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": " ".join(words)}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": tokens,
+                          "total_tokens": prompt_tokens + tokens},
+            })
+            return
+
+        server.count(streamed=1)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, word in enumerate(words):
+            chunk = {
+                "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {"content": (" " if i else "") + word}, "finish_reason": None}],
+            }
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            time.sleep(delay)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_server(port=0, **settings):
+    """Start a mock server on a background thread; port 0 picks a free port"""
+    server = MockLLMServer(("127.0.0.1", port), **settings)
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server
+
+
+def add_server_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--completion-tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected failures")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that are slow")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="extra seconds before a slow request's first token")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def server_settings(args):
+    return {
+        "latency": args.latency,
+        "tokens_per_second": args.tokens_per_second,
+        "completion_tokens": args.completion_tokens,
+        "error_rate": args.error_rate,
+        "error_status": args.error_status,
+        "slow_rate": args.slow_rate,
+        "slow_latency": args.slow_latency,
+        "seed": args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server")
+    parser.add_argument("--port", type=int, default=8808)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    server = MockLLMServer(("127.0.0.1", args.port), **server_settings(args))
+    print(f"Mock LLM server on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Offline replay benchmark.
+
+Replays conversations from a JSONL file through engine.process_message
+against the local mock LLM server and prints a JSON report: end-to-end and
+time-to-first-token percentiles, per-stage latency from the engine's metrics,
+prompt/completion tokens per turn, response cache and gateway counters, and
+throughput at the chosen concurrency.
+
+Each line of the conversations file is either
+    {"id": "c1", "turns": ["first user message", "follow-up", ...]}
+or  {"id": "c1", "messages": [{"role": "user", "content": "..."}, ...]}
+
+    python benchmarks/replay.py --concurrency 8 --repeat 5 --output run.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import add_server_arguments, server_settings, start_server  # noqa: E402
+
+DEFAULT_CONVERSATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "conversations.jsonl")
+
+
+def load_conversations(path):
+    """Read conversations as (id, [user messages]) pairs"""
+    conversations = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            turns = record.get("turns")
+            if turns is None:
+                turns = [m["content"] for m in record.get("messages", []) if m.get("role") == "user"]
+            if turns:
+                conversations.append((str(record.get("id", number)), turns))
+    return conversations
+
+
+def percentiles(samples):
+    """p50/p95/p99/mean/max in milliseconds"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "p50": round(pick(0.50) * 1000, 2),
+        "p95": round(pick(0.95) * 1000, 2),
+        "p99": round(pick(0.99) * 1000, 2),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+def replay_conversation(engine, turns, results, lock):
+    """Run one conversation in a fresh session, recording per-turn timings"""
+    session = engine.Session()
+    for message in turns:
+        session.messages.append({"role": "user", "content": message})
+        start = time.perf_counter()
+        first = None
+        response = engine.process_message(message, session)
+        if isinstance(response, str):
+            first = time.perf_counter()
+        else:
+            parts = []
+            for delta in response:
+                if first is None:
+                    first = time.perf_counter()
+                parts.append(delta)
+            response = "".join(parts)
+        end = time.perf_counter()
+        session.messages.append({"role": "assistant", "content": response})
+        with lock:
+            results.append({
+                "latency": end - start,
+                "ttft": (first or end) - start,
+                "error": engine.is_degraded_response(response),
+            })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay conversations against a mock LLM and report latency")
+    parser.add_argument("--conversations", default=DEFAULT_CONVERSATIONS)
+    parser.add_argument("--concurrency", type=int, default=4, help="conversations replayed in parallel")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the whole file this many times")
+    parser.add_argument("--stream", choices=["on", "off"], default="on")
+    parser.add_argument("--warm-cache", action="store_true", help="keep response cache entries between runs")
+    parser.add_argument("--base-url", help="use an already running OpenAI-compatible server instead")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    if args.base_url:
+        os.environ["LLM_BASE_URL"] = args.base_url
+    else:
+        server = start_server(**server_settings(args))
+        os.environ["LLM_BASE_URL"] = server.url
+    os.environ["STREAM_RESPONSES"] = "1" if args.stream == "on" else "0"
+    os.environ.setdefault("LLM_MAX_RETRIES", "0")
+
+    # Configuration is read at import time, so the engine is imported only now
+    import engine  # noqa: E402
+    from config import GATEWAY_ENABLED  # noqa: E402
+    from llm_gateway import get_gateway  # noqa: E402
+    from model_router import get_router  # noqa: E402
+
+    cache = engine.get_response_cache()
+    if not args.warm_cache:
+        cache.clear()
+    cache_before = cache.stats()
+    server_before = server.stats() if server else {}
+
+    conversations = load_conversations(args.conversations) * args.repeat
+    results = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(replay_conversation, engine, turns, results, lock) for _, turns in conversations]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    turns = len(results)
+    cache_after = cache.stats()
+    hits = cache_after["hits"] - cache_before["hits"]
+    misses = cache_after["misses"] - cache_before["misses"]
+    report = {
+        "config": {
+            "conversations": len(conversations),
+            "concurrency": args.concurrency,
+            "stream": args.stream == "on",
+            "latency": args.latency,
+            "tokens_per_second": args.tokens_per_second,
+            "error_rate": args.error_rate,
+        },
+        "turns": turns,
+        "errors": sum(r["error"] for r in results),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_turns_per_s": round(turns / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles([r["latency"] for r in results]),
+        "ttft_ms": percentiles([r["ttft"] for r in results]),
+        "response_cache": {"hits": hits, "misses": misses,
+                           "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0},
+    }
+    report["stages_ms"] = {
+        (labels.get("stage") or name): {"count": h["count"], "p50": round(h["p50"] * 1000, 2), "p95": round(h["p95"] * 1000, 2)}
+        for h in engine.METRICS.snapshot()["histograms"]
+        for name, labels in [(h["name"], h["labels"])]
+        if name in ("stage", "llm_ttft", "llm_total")
+    }
+    if GATEWAY_ENABLED:
+        report["gateway"] = get_gateway().stats()
+    report["providers"] = get_router().stats()
+    report["hedges"] = sum(c["value"] for c in engine.METRICS.snapshot()["counters"] if c["name"] == "llm_hedges")
+    if server:
+        stats = server.stats()
+        delta = {name: stats[name] - server_before.get(name, 0) for name in stats}
+        report["llm"] = dict(delta)
+        report["llm"]["prompt_tokens_per_turn"] = round(delta["prompt_tokens"] / turns, 1) if turns else 0.0
+        report["llm"]["completion_tokens_per_turn"] = round(delta["completion_tokens"] / turns, 1) if turns else 0.0
+        report["llm"]["llm_calls_per_turn"] = round(delta["requests"] / turns, 3) if turns else 0.0
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
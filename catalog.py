@@ -0,0 +1,193 @@
+import csv
+import hashlib
+import json
+import re
+from collections import Counter
+
+from config import CATALOG_PATH
+
+# Product names follow the pattern "<Brand> <Type> - <Color> Edition"
+NAME_PATTERN = re.compile(r"^\s*(?P<brand>\S+)\s+(?P<type>.+?)\s+-\s+(?P<color>.+?)\s+Edition\s*$")
+
+# Fields exposed to the model, in the order the system prompt documents them
+PROMPT_FIELDS = [
+    "product_name",
+    "discounted_price",
+    "actual_price",
+    "discount_percentage",
+    "rating",
+    "rating_count",
+    "about_product",
+    "reviews",
+]
+
+# Columns of the catalog CSV
+CSV_COLUMNS = [
+    "Product Name",
+    "Discounted Price",
+    "Actual Price",
+    "Discount Percentage",
+    "Rating",
+    "Rating Count",
+    "About Product",
+    "Reviews",
+]
+
+# Reviews are stored in one cell, separated by " | "
+REVIEW_SEPARATOR = "|"
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Column separator of the compact table; stripped from cell text
+CELL_SEPARATOR = " | "
+
+
+def parse_product_name(name):
+    """Split a product name into its brand, type and color parts"""
+    match = NAME_PATTERN.match(name)
+    if match:
+        return match.group("brand"), match.group("type"), match.group("color")
+    # Unknown naming scheme - treat the first word as the brand
+    parts = name.split(None, 1)
+    return (parts[0] if parts else ""), (parts[1] if len(parts) > 1 else ""), ""
+
+
+def _to_number(value, cast):
+    """Convert a CSV cell to a number, tolerating thousands separators"""
+    try:
+        return cast(str(value).replace(",", "").strip())
+    except ValueError:
+        return cast(0)
+
+
+def read_rows(path=CATALOG_PATH):
+    """Stream the raw rows of the catalog CSV as dicts"""
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def row_key(row):
+    """Content hash of a raw row - equal rows are the same product version"""
+    return hashlib.sha1("\x1f".join(row.get(column) or "" for column in CSV_COLUMNS).encode("utf-8")).hexdigest()
+
+
+def product_from_row(row, product_id):
+    """Convert a raw CSV row into a product dict"""
+    name = row["Product Name"].strip()
+    brand, product_type, color = parse_product_name(name)
+    return {
+        "product_id": product_id,
+        "product_name": name,
+        "brand": brand,
+        "type": product_type,
+        "color": color,
+        "discounted_price": _to_number(row["Discounted Price"], int),
+        "actual_price": _to_number(row["Actual Price"], int),
+        "discount_percentage": _to_number(row["Discount Percentage"], int),
+        "rating": _to_number(row["Rating"], float),
+        "rating_count": _to_number(row["Rating Count"], int),
+        "about_product": row["About Product"].strip(),
+        "reviews": row["Reviews"].strip(),
+    }
+
+
+def load_products(path=CATALOG_PATH):
+    """Read the product catalog CSV into a list of product dicts"""
+    return [product_from_row(row, product_id) for product_id, row in enumerate(read_rows(path))]
+
+
+def catalog_version(path=CATALOG_PATH):
+    """Short content hash of the catalog file, used to key caches"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def format_product_context(products):
+    """Render products as the PRODUCT_DATA JSON block used in the system prompt"""
+    payload = {"products": [{field: str(p[field]) for field in PROMPT_FIELDS} for p in products]}
+    return json.dumps(payload, indent=2, ensure_ascii=False)
+
+
+def _clean_snippet(text):
+    return " ".join(text.split()).rstrip(".").replace("|", "/")
+
+
+def product_snippets(product):
+    """
+    The about_product sentences and individual reviews of a product.
+
+    The about sentence that only restates the name ("<Brand> <Type> in
+    <Color>") is left out - the name column already carries it.
+    """
+    restated = _clean_snippet(f"{product['brand']} {product['type']} in {product['color']}").lower()
+    about = [
+        _clean_snippet(sentence) for sentence in SENTENCE_END.split(product["about_product"])
+        if sentence.strip() and _clean_snippet(sentence).lower() != restated
+    ]
+    reviews = [_clean_snippet(review) for review in product["reviews"].split(REVIEW_SEPARATOR) if review.strip()]
+    return about, reviews
+
+
+def snippet_counts(products):
+    """Number of products each about/review snippet appears in"""
+    counts = Counter()
+    for product in products:
+        about, reviews = product_snippets(product)
+        counts.update(set(about + reviews))
+    return counts
+
+
+class SnippetLegend:
+    """
+    Catalog-wide legend of the about/review snippets shared by several products.
+
+    Each shared snippet gets a short code (S1, S2, ...) by descending
+    frequency, then text, so the legend is byte-identical for the same
+    catalog no matter which products a prompt includes.
+    """
+
+    def __init__(self, products=(), min_count=2, counts=None):
+        # counts: snippet -> number of products using it, when already known
+        if counts is None:
+            counts = snippet_counts(products)
+        shared = sorted((text for text, count in counts.items() if count >= min_count), key=lambda t: (-counts[t], t))
+        self.codes = {text: f"S{i}" for i, text in enumerate(shared, 1)}
+
+    def encode(self, snippets):
+        return "; ".join(self.codes.get(text, text) for text in snippets)
+
+    def format(self):
+        return "\n".join(f"{code}: {text}." for text, code in self.codes.items())
+
+
+def format_compact_row(product, legend):
+    """One PRODUCT_DATA table row"""
+    about, reviews = product_snippets(product)
+    cells = [product["product_name"].replace("|", "/")]
+    cells.extend(str(product[field]) for field in PROMPT_FIELDS[1:-2])
+    cells.append(legend.encode(about))
+    cells.append(legend.encode(reviews))
+    return CELL_SEPARATOR.join(cells)
+
+
+def format_compact_context(products, legend, rows=None):
+    """
+    Render products as a compact PRODUCT_DATA table.
+
+    One row per product in product id order with bare numbers, and
+    about/review cells written as legend codes where the snippet is shared,
+    so the same set of products always renders to the same bytes. rows is
+    an optional product id -> rendered row cache for this legend.
+    """
+    lines = [CELL_SEPARATOR.join(PROMPT_FIELDS)]
+    for product in sorted(products, key=lambda p: p["product_id"]):
+        line = rows.get(product["product_id"]) if rows is not None else None
+        if line is None:
+            line = format_compact_row(product, legend)
+            if rows is not None:
+                rows[product["product_id"]] = line
+        lines.append(line)
+    return "\n".join(lines)
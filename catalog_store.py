@@ -0,0 +1,232 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from catalog import (
+    SnippetLegend,
+    catalog_version,
+    product_from_row,
+    product_snippets,
+    read_rows,
+    row_key,
+    snippet_counts,
+)
+from columnar_catalog import ColumnarSnapshot, is_columnar
+from config import CATALOG_PATH, CATALOG_POLL_INTERVAL
+from facets import FacetIndex
+from metrics import METRICS
+from name_resolver import NameResolver
+from product_table import CATEGORICAL_COLUMNS, ProductTable
+from retrieval import BM25Index, product_terms
+
+logger = logging.getLogger("chatbot.catalog")
+
+# Above this fraction of changed rows the indexes are rebuilt from scratch
+FULL_REBUILD_FRACTION = 0.5
+
+
+class CatalogSnapshot:
+    """
+    One immutable version of the catalog and everything derived from it.
+
+    A turn reads the current snapshot once and uses it throughout, so a
+    reload in the middle of a chat never mixes two catalog versions.
+    """
+
+    def __init__(self, version, products, keys, index, snippet_counts, facets, rows=None, names=None):
+        self.version = version  # content hash of the source file
+        self.products = products  # live products in file order
+        self.by_id = {p["product_id"]: p for p in products}
+        self.keys = keys  # product id -> row key
+        self.index = index
+        self.facets = facets
+        self.table = ProductTable(products)
+        if names is None:
+            names = NameResolver(
+                [p["product_id"] for p in products], [p["product_name"] for p in products],
+                self.table.vocabularies, self.table.columns["rating_count"],
+            )
+        self.names = names
+        self.snippet_counts = snippet_counts
+        self.legend = SnippetLegend(counts=snippet_counts)
+        self.rows = rows if rows is not None else {}  # product id -> rendered PRODUCT_DATA row
+        self.brands = sorted({p["brand"] for p in products}, key=str.lower)
+        self.next_id = max(self.by_id, default=-1) + 1
+
+    def __len__(self):
+        return len(self.products)
+
+
+def build_snapshot(path):
+    """Load a catalog file from scratch"""
+    version = catalog_version(path)
+    products = []
+    keys = {}
+    for product_id, row in enumerate(read_rows(path)):
+        products.append(product_from_row(row, product_id))
+        keys[product_id] = row_key(row)
+    index = BM25Index({p["product_id"]: product_terms(p) for p in products})
+    return CatalogSnapshot(version, products, keys, index, snippet_counts(products), FacetIndex(products))
+
+
+def open_snapshot(path):
+    """A snapshot of the catalog file: memory-mapped if it is a compiled columnar file, else parsed from CSV"""
+    if is_columnar(path):
+        return ColumnarSnapshot(path)
+    return build_snapshot(path)
+
+
+def diff_snapshot(old, path):
+    """
+    Derive the next snapshot from old by applying row-level changes.
+
+    Rows are matched by content: unchanged rows keep their product id, index
+    postings, name index entries and rendered prompt row; an edited row
+    counts as one removal plus one addition. Returns (snapshot, added,
+    removed), with snapshot None when the rows did not change.
+    """
+    version = catalog_version(path)
+    unmatched = {}
+    for product_id, key in old.keys.items():
+        unmatched.setdefault(key, []).append(product_id)
+    products = []
+    keys = {}
+    added = {}
+    next_id = old.next_id
+    for row in read_rows(path):
+        key = row_key(row)
+        ids = unmatched.get(key)
+        if ids:
+            product = old.by_id[ids.pop(0)]
+        else:
+            product = product_from_row(row, next_id)
+            added[next_id] = product
+            next_id += 1
+        products.append(product)
+        keys[product["product_id"]] = key
+    removed = [product_id for ids in unmatched.values() for product_id in ids]
+
+    if not added and not removed:
+        return None, added, removed
+    if len(added) + len(removed) > FULL_REBUILD_FRACTION * max(len(products), 1):
+        index = BM25Index({p["product_id"]: product_terms(p) for p in products})
+        counts = snippet_counts(products)
+        facets = FacetIndex(products)
+        names = None
+    else:
+        index = old.index.updated({i: product_terms(p) for i, p in added.items()}, removed)
+        counts = Counter(old.snippet_counts)
+        for product_id in removed:
+            about, reviews = product_snippets(old.by_id[product_id])
+            counts.subtract(set(about + reviews))
+        for product in added.values():
+            about, reviews = product_snippets(product)
+            counts.update(set(about + reviews))
+        counts = +counts  # drop snippets no product uses any more
+        facets = old.facets.updated(added.values(), [old.by_id[i] for i in removed])
+        vocabularies = {name: {p[name] for p in products} for name in CATEGORICAL_COLUMNS}
+        names = old.names.updated(
+            [(i, p["product_name"], p["rating_count"]) for i, p in added.items()], removed, vocabularies
+        )
+    snapshot = CatalogSnapshot(version, products, keys, index, counts, facets, names=names)
+    # Rendered rows stay valid as long as the legend codes did not move
+    if snapshot.legend.codes == old.legend.codes:
+        snapshot.rows = {i: line for i, line in old.rows.items() if i in snapshot.by_id}
+    return snapshot, added, removed
+
+
+class CatalogStore:
+    """
+    The current catalog snapshot plus a watcher that hot-reloads the file.
+
+    The watcher polls the file's mtime and size, confirms a change by content
+    hash, builds the next snapshot off to the side and swaps it in with a
+    single reference assignment. Readers never block and never see a
+    half-built catalog; a file that fails to parse is logged and the previous
+    snapshot stays live.
+    """
+
+    def __init__(self, path=CATALOG_PATH, poll_interval=CATALOG_POLL_INTERVAL):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._stat = self._file_stat()
+        self.snapshot = open_snapshot(path)
+        self._reload_lock = threading.Lock()
+        # Its own lock, not _reload_lock: a reload in progress must not hold up
+        # readers, and a child forked mid-reload would never see it released
+        self._watcher_lock = threading.Lock()
+        self._watcher_pid = None
+
+    def _file_stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def current(self):
+        """The live snapshot; starts this process's watcher on first use"""
+        if self.poll_interval > 0 and self._watcher_pid != os.getpid():
+            self._start_watcher()
+        return self.snapshot
+
+    def _start_watcher(self):
+        with self._watcher_lock:
+            # Another reader may have started it while we waited for the lock
+            if self._watcher_pid == os.getpid():
+                return
+            # Threads don't survive fork, so every worker process starts its own
+            self._watcher_pid = os.getpid()
+            threading.Thread(target=self._watch, name="catalog-watcher", daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Catalog reload from %s failed; keeping version %s", self.path, self.snapshot.version)
+
+    def check(self):
+        """Reload if the file changed since the last check; True when a new snapshot went live"""
+        with self._reload_lock:
+            stat = self._file_stat()
+            if stat == self._stat:
+                return False
+            # Recorded first so a broken file is reported once, not on every poll
+            self._stat = stat
+            start = time.perf_counter()
+            old = self.snapshot
+            if isinstance(old, ColumnarSnapshot) or is_columnar(self.path):
+                # A compiled file is replaced whole, so it is simply reopened
+                snapshot = open_snapshot(self.path)
+                if snapshot.version == old.version:
+                    return False
+                message = ("Catalog %s -> %s: reopened with %d rows", old.version, snapshot.version, len(snapshot))
+            else:
+                snapshot, added, removed = diff_snapshot(old, self.path)
+                if snapshot is None:
+                    return False
+                message = ("Catalog %s -> %s: %d rows added, %d removed", old.version, snapshot.version, len(added), len(removed))
+            self.snapshot = snapshot
+            METRICS.observe("catalog_reload", time.perf_counter() - start)
+            METRICS.increment("catalog_reloads")
+            logger.info(*message)
+            return True
+
+
+# One store per catalog file and process, shared across sessions and reruns
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_catalog_store(path=CATALOG_PATH):
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = CatalogStore(path)
+        return store
+
+
+def get_catalog(path=CATALOG_PATH):
+    """The current catalog snapshot"""
+    return get_catalog_store(path).current()
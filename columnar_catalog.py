@@ -0,0 +1,375 @@
+import argparse
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from array import array
+from collections import Counter
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+from catalog import SnippetLegend, catalog_version, product_from_row, product_snippets, read_rows
+from facets import FacetIndex, group_records
+from name_resolver import MappedNameResolver, NameResolver
+from product_table import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, ProductTable
+from retrieval import MappedBM25Index, product_terms
+from review_aspects import ASPECTS, aspect_counts, aspect_scores
+
+MAGIC = b"HPCOLS01"
+# Sections start on cache-line boundaries so every array view is aligned
+ALIGNMENT = 64
+
+# Free-text fields, stored in offset-indexed UTF-8 string heaps
+TEXT_FIELDS = ["product_name", "about_product", "reviews"]
+
+# Field order of a product record, as product_from_row builds it
+PRODUCT_FIELDS = [
+    "product_id", "product_name", "brand", "type", "color", "discounted_price", "actual_price",
+    "discount_percentage", "rating", "rating_count", "about_product", "reviews",
+]
+
+# Rows parsed per batch while building (aspect counting works on batches)
+BUILD_BATCH = 10000
+
+
+def is_columnar(path):
+    """True when path is a compiled columnar catalog rather than a CSV"""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class StringHeap(Sequence):
+    """Strings stored back to back in one buffer; string i is data[offsets[i]:offsets[i + 1]]"""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        # Slicing the memoryview copies nothing; only the decode materializes the string
+        return str(self.data[int(self.offsets[i]):int(self.offsets[i + 1])], "utf-8")
+
+
+class ColumnarCatalog:
+    """
+    A compiled catalog file opened with mmap.
+
+    Columns are numpy views straight onto the mapping, so nothing is parsed
+    or copied at open: pages are read in lazily on first touch and, being a
+    read-only file mapping, shared by every worker process that opens the
+    same file.
+
+    Layout: MAGIC, the header length (uint64 little-endian) and a JSON
+    header, then the sections, each ALIGNMENT-aligned. The header lists
+    every section as name -> [dtype, offset from the data start, length].
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a columnar catalog")
+        (header_length,) = struct.unpack_from("<Q", self._map, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(self._map[start:start + header_length])
+        self._data_start = _aligned(start + header_length)
+        self._buffer = memoryview(self._map)
+        self.version = self.header["version"]
+        self.size = self.header["rows"]
+        self.vocabularies = self.header["vocabularies"]
+        self.columns = {name: self.array(name) for name in self.header["columns"]}
+        self.codes = {name: self.array(f"code:{name}") for name in CATEGORICAL_COLUMNS}
+        self.texts = {field: self.heap(f"text:{field}") for field in TEXT_FIELDS}
+
+    def array(self, name):
+        """Zero-copy numpy view of one section"""
+        dtype, offset, length = self.header["sections"][name]
+        return np.frombuffer(self._map, dtype=np.dtype(dtype), count=length, offset=self._data_start + offset)
+
+    def heap(self, name):
+        """Zero-copy StringHeap over a pair of offsets/data sections"""
+        _, offset, length = self.header["sections"][f"{name}.data"]
+        start = self._data_start + offset
+        return StringHeap(self.array(f"{name}.offsets"), self._buffer[start:start + length])
+
+    def value(self, row, field):
+        """One field of one product, decoded on demand"""
+        if field == "product_id":
+            return row
+        heap = self.texts.get(field)
+        if heap is not None:
+            return heap[row]
+        codes = self.codes.get(field)
+        if codes is not None:
+            return self.vocabularies[field][codes[row]]
+        if field in NUMERIC_COLUMNS:
+            return self.columns[field][row].item()
+        raise KeyError(field)
+
+
+class ProductView(Mapping):
+    """A product dict look-alike reading its fields from a ColumnarCatalog row"""
+
+    __slots__ = ("_catalog", "_row")
+
+    def __init__(self, catalog, row):
+        self._catalog = catalog
+        self._row = row
+
+    def __getitem__(self, field):
+        return self._catalog.value(self._row, field)
+
+    def __iter__(self):
+        return iter(PRODUCT_FIELDS)
+
+    def __len__(self):
+        return len(PRODUCT_FIELDS)
+
+    def __repr__(self):
+        return f"ProductView({dict(self)!r})"
+
+
+class ProductList(Sequence):
+    """The catalog's products as lazily created ProductViews; position == product id"""
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+
+    def __len__(self):
+        return self._catalog.size
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [ProductView(self._catalog, i) for i in range(*row.indices(len(self)))]
+        row = int(row)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return ProductView(self._catalog, row)
+
+
+class ColumnarSnapshot:
+    """
+    A CatalogSnapshot over a columnar catalog file.
+
+    Same attributes the engine reads from a CatalogSnapshot, but products
+    are views decoded on access, the table columns and BM25 postings are
+    memory-mapped arrays, and the facet aggregates, snippet legend and name
+    index come precomputed from the file. A reload reopens the file; the
+    build writes a new file and renames it into place, so mappings held by
+    older snapshots stay valid.
+    """
+
+    def __init__(self, path):
+        catalog = ColumnarCatalog(path)
+        header = catalog.header
+        self.catalog = catalog
+        self.version = catalog.version
+        self.products = ProductList(catalog)
+        self.by_id = self.products  # product ids are row numbers
+        self.table = ProductTable(self.products, dict(catalog.columns), catalog.codes, catalog.vocabularies)
+        self.index = MappedBM25Index(
+            catalog.heap("terms"), catalog.array("postings.offsets"), catalog.array("postings.docs"),
+            catalog.array("postings.freqs"), catalog.array("doc_lengths"), header["total_length"],
+            catalog.columns["rating_count"],
+        )
+        self.facets = FacetIndex.from_records(header["facets"])
+        self.legend = SnippetLegend(counts=header["snippets"])
+        self.rows = {}  # product id -> rendered PRODUCT_DATA row
+        self.brands = sorted(catalog.vocabularies["brand"], key=str.lower)
+        if "names.words.offsets" not in header["sections"]:
+            raise ValueError(f"{path} has no product name index; rebuild it with columnar_catalog.py")
+        self.names = MappedNameResolver(
+            catalog.heap("names.words"), catalog.array("names.word_offsets"), catalog.array("names.word_names"),
+            catalog.heap("names.grams"), catalog.array("names.gram_offsets"), catalog.array("names.gram_words"),
+            catalog.array("names.trigram_counts"), catalog.array("names.name_offsets"),
+            catalog.array("names.name_products"), catalog.vocabularies, catalog.columns["rating_count"],
+        )
+
+    def __len__(self):
+        return self.catalog.size
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class _Heap:
+    """String heap being written: UTF-8 bytes spooled to a temp file plus their offsets"""
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.offsets = array("Q", [0])
+
+    def append(self, text):
+        data = text.encode("utf-8")
+        self.file.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+
+def build_columnar(source, destination):
+    """
+    Compile a catalog CSV into a columnar file at destination.
+
+    Rows are streamed in batches: numeric columns, categorical codes, review
+    aspect counts, the BM25 postings, the facet aggregates, the shared
+    snippet counts and the product name index are all computed here once,
+    so opening the file costs workers no parsing or indexing. The file is
+    written next to destination and renamed into place. Returns the number
+    of products.
+    """
+    numeric = {name: [] for name in NUMERIC_COLUMNS}
+    categorical = {name: [] for name in CATEGORICAL_COLUMNS}
+    heaps = {field: _Heap() for field in TEXT_FIELDS}
+    names = []
+    positive, negative = [], []
+    counts = Counter()
+    postings = {}  # term -> (doc ids, frequencies)
+    doc_lengths = array("i")
+
+    def flush(batch):
+        batch_positive, batch_negative = aspect_counts(batch)
+        positive.append(batch_positive)
+        negative.append(batch_negative)
+        batch.clear()
+
+    batch = []
+    for row_number, row in enumerate(read_rows(source)):
+        product = product_from_row(row, row_number)
+        for name in NUMERIC_COLUMNS:
+            numeric[name].append(product[name])
+        for name in CATEGORICAL_COLUMNS:
+            categorical[name].append(product[name])
+        for field in TEXT_FIELDS:
+            heaps[field].append(product[field])
+        names.append(product["product_name"])
+        about, reviews = product_snippets(product)
+        counts.update(set(about + reviews))
+        terms = product_terms(product)
+        for term, freq in terms.items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array("i"), array("i"))
+            entry[0].append(row_number)
+            entry[1].append(freq)
+        doc_lengths.append(sum(terms.values()))
+        batch.append(product)
+        if len(batch) >= BUILD_BATCH:
+            flush(batch)
+    if batch:
+        flush(batch)
+    size = len(doc_lengths)
+
+    columns = {name: np.array(values, dtype=NUMERIC_COLUMNS[name]) for name, values in numeric.items()}
+    columns["savings"] = columns["actual_price"] - columns["discounted_price"]
+    width = len(ASPECTS)
+    positive = np.concatenate(positive) if positive else np.zeros((0, width), dtype=np.uint16)
+    negative = np.concatenate(negative) if negative else np.zeros((0, width), dtype=np.uint16)
+    scores = aspect_scores(positive, negative)
+    for column, aspect in enumerate(ASPECTS):
+        columns[f"{aspect}_score"] = np.ascontiguousarray(scores[:, column])
+        columns[f"{aspect}_mentions"] = positive[:, column] + negative[:, column]
+    vocabularies = {}
+    codes = {}
+    for name, values in categorical.items():
+        vocabularies[name] = sorted(set(values))
+        lookup = {value: code for code, value in enumerate(vocabularies[name])}
+        codes[name] = np.fromiter((lookup[value] for value in values), dtype=np.int32, count=size)
+    facets = group_records(ProductTable(range(size), columns, codes, vocabularies))
+
+    term_heap = _Heap()
+    posting_offsets = array("Q", [0])
+    docs = array("i")
+    freqs = array("i")
+    for term in sorted(postings):
+        term_heap.append(term)
+        term_docs, term_freqs = postings.pop(term)
+        docs.extend(term_docs)
+        freqs.extend(term_freqs)
+        posting_offsets.append(len(docs))
+
+    # name -> numpy array, or a _Heap expanding to offsets + data sections
+    sections = dict(columns)
+    sections.update({f"code:{name}": values for name, values in codes.items()})
+    sections.update({f"text:{field}": heap for field, heap in heaps.items()})
+    sections["terms"] = term_heap
+    sections["postings.offsets"] = np.frombuffer(posting_offsets, dtype=np.uint64)
+    sections["postings.docs"] = np.frombuffer(docs, dtype=np.int32)
+    sections["postings.freqs"] = np.frombuffer(freqs, dtype=np.int32)
+    sections["doc_lengths"] = np.frombuffer(doc_lengths, dtype=np.int32)
+    resolver = NameResolver(range(size), names, vocabularies, columns["rating_count"])
+    for name, section in resolver.export().items():
+        if isinstance(section, list):
+            heap = _Heap()
+            for text in section:
+                heap.append(text)
+            section = heap
+        sections[f"names.{name}"] = section
+
+    layout = {}
+    offset = 0
+    for name, section in sections.items():
+        if isinstance(section, _Heap):
+            parts = [(f"{name}.offsets", "<u8", len(section.offsets), len(section.offsets) * 8),
+                     (f"{name}.data", "|u1", section.offsets[-1], section.offsets[-1])]
+        else:
+            parts = [(name, section.dtype.str, len(section), section.nbytes)]
+        for part, dtype, length, nbytes in parts:
+            layout[part] = [dtype, offset, length]
+            offset = _aligned(offset + nbytes)
+    header = json.dumps({
+        "version": catalog_version(source),
+        "rows": size,
+        "columns": list(columns),
+        "sections": layout,
+        "vocabularies": vocabularies,
+        "snippets": {text: count for text, count in counts.items() if count >= 2},
+        "facets": facets,
+        "total_length": int(sum(doc_lengths)),
+    }, ensure_ascii=False).encode("utf-8")
+
+    partial = f"{destination}.tmp"
+    with open(partial, "wb") as out:
+        out.write(MAGIC)
+        out.write(struct.pack("<Q", len(header)))
+        out.write(header)
+        data_start = _aligned(out.tell())
+        for name, section in sections.items():
+            if isinstance(section, _Heap):
+                out.seek(data_start + layout[f"{name}.offsets"][1])
+                out.write(section.offsets.tobytes())
+                out.seek(data_start + layout[f"{name}.data"][1])
+                section.file.seek(0)
+                shutil.copyfileobj(section.file, out)
+                section.file.close()
+            else:
+                out.seek(data_start + layout[name][1])
+                out.write(np.ascontiguousarray(section).tobytes())
+        out.truncate(data_start + offset)
+    os.replace(partial, destination)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the catalog CSV into a memory-mappable columnar file")
+    parser.add_argument("source", help="catalog CSV")
+    parser.add_argument("destination", help="columnar file to write; point CATALOG_PATH at it")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = build_columnar(args.source, args.destination)
+    print(f"Compiled {count} products into {args.destination} "
+          f"({os.path.getsize(args.destination) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
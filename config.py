@@ -0,0 +1,195 @@
+import os
+
+# Runtime configuration. Every knob can be overridden with an environment
+# variable of the same name.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _env_int(name, default):
+    """Read an integer setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+
+def _env_float(name, default):
+    """Read a float setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return float(value)
+
+
+def _env_bool(name, default):
+    """Read a boolean setting from the environment"""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Product catalog - the CSV, or a columnar file compiled from it with
+# columnar_catalog.py, which workers memory-map instead of parsing - and how
+# often (seconds) the file is checked for changes to hot-reload; 0 disables
+# the watcher
+CATALOG_PATH = os.environ.get("CATALOG_PATH", os.path.join(BASE_DIR, "amazon_products.csv"))
+CATALOG_POLL_INTERVAL = _env_float("CATALOG_POLL_INTERVAL", 2.0)
+
+# Product retrieval: number of products injected into the prompt per message
+RETRIEVAL_TOP_K = _env_int("RETRIEVAL_TOP_K", 6)
+
+# Catalogs with at most this many products are sent to the model in full
+FULL_CATALOG_THRESHOLD = _env_int("FULL_CATALOG_THRESHOLD", 12)
+
+# PRODUCT_DATA layout in the system prompt: "compact" (table plus shared
+# snippet legend) or "json" (the original pretty-printed JSON)
+PROMPT_CATALOG_FORMAT = os.environ.get("PROMPT_CATALOG_FORMAT", "compact")
+
+# Stream LLM responses into the chat UI as they are generated
+STREAM_RESPONSES = _env_bool("STREAM_RESPONSES", True)
+
+# Minimum seconds between redraws of a streaming response
+STREAM_RENDER_INTERVAL = _env_float("STREAM_RENDER_INTERVAL", 0.05)
+
+# Chat history drawn on each rerun: the most recent CHAT_HISTORY_WINDOW
+# messages (0 draws all of them), with older ones revealed
+# CHAT_HISTORY_PAGE at a time by a "load earlier" button
+CHAT_HISTORY_WINDOW = _env_int("CHAT_HISTORY_WINDOW", 20)
+CHAT_HISTORY_PAGE = _env_int("CHAT_HISTORY_PAGE", 20)
+
+# OpenAI client connection pool, timeouts (seconds) and retry policy
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL", "")
+LLM_POOL_SIZE = _env_int("LLM_POOL_SIZE", 20)
+LLM_KEEPALIVE_EXPIRY = _env_float("LLM_KEEPALIVE_EXPIRY", 60.0)
+LLM_CONNECT_TIMEOUT = _env_float("LLM_CONNECT_TIMEOUT", 5.0)
+LLM_READ_TIMEOUT = _env_float("LLM_READ_TIMEOUT", 30.0)
+LLM_POOL_TIMEOUT = _env_float("LLM_POOL_TIMEOUT", 10.0)
+LLM_MAX_RETRIES = _env_int("LLM_MAX_RETRIES", 2)
+LLM_RETRY_BASE_DELAY = _env_float("LLM_RETRY_BASE_DELAY", 0.5)
+LLM_RETRY_MAX_DELAY = _env_float("LLM_RETRY_MAX_DELAY", 8.0)
+
+# Model providers, tried in order: comma-separated "name=base_url" entries
+# (empty base URL = the provider's default). Each reads its key from
+# <NAME>_API_KEY, e.g. OPENAI_API_KEY.
+LLM_PROVIDERS = os.environ.get("LLM_PROVIDERS", f"openai={LLM_BASE_URL}")
+# Model tiers: small for FAQ/lookup questions, large for open-ended advice.
+# Both default to the model the app has always used; point LLM_SMALL_MODEL
+# at a cheaper model to make the split save cost as well as tokens
+LLM_SMALL_MODEL = os.environ.get("LLM_SMALL_MODEL", "gpt-3.5-turbo")
+LLM_SMALL_MAX_TOKENS = _env_int("LLM_SMALL_MAX_TOKENS", 300)
+LLM_LARGE_MODEL = os.environ.get("LLM_LARGE_MODEL", "gpt-3.5-turbo")
+LLM_LARGE_MAX_TOKENS = _env_int("LLM_LARGE_MAX_TOKENS", 800)
+LLM_TEMPERATURE = _env_float("LLM_TEMPERATURE", 0.3)
+# Circuit breaker per provider: consecutive failures that open it, and
+# seconds before a single probe request is let through again
+LLM_BREAKER_FAILURES = _env_int("LLM_BREAKER_FAILURES", 5)
+LLM_BREAKER_COOLDOWN = _env_float("LLM_BREAKER_COOLDOWN", 30.0)
+# Hedging: a request still waiting for its first token after the provider's
+# p95 first-token latency (a non-streamed one: its p95 time to the whole
+# response) is raced against a second attempt. LLM_HEDGE_DELAY stands in for
+# the p95 until LLM_HEDGE_MIN_SAMPLES responses of that kind were timed.
+LLM_HEDGE_ENABLED = _env_bool("LLM_HEDGE_ENABLED", True)
+LLM_HEDGE_DELAY = _env_float("LLM_HEDGE_DELAY", 3.0)
+LLM_HEDGE_MIN_SAMPLES = _env_int("LLM_HEDGE_MIN_SAMPLES", 20)
+
+# Response cache shared by all sessions in the process
+RESPONSE_CACHE_ENABLED = _env_bool("RESPONSE_CACHE_ENABLED", True)
+RESPONSE_CACHE_SIZE = _env_int("RESPONSE_CACHE_SIZE", 512)
+RESPONSE_CACHE_TTL = _env_float("RESPONSE_CACHE_TTL", 3600.0)
+# Optional JSON file the cache is persisted to and reloaded from
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", "")
+
+# Answer price/rating/discount questions locally instead of via the LLM
+STRUCTURED_QUERIES_ENABLED = _env_bool("STRUCTURED_QUERIES_ENABLED", True)
+
+# FAQ knowledge base: structured policy and Q/A entries. A policy question
+# whose best entry covers at least FAQ_MIN_CONFIDENCE of its (IDF-weighted)
+# terms, and outscores the runner-up entry FAQ_MIN_MARGIN times over, gets
+# that entry's answer without the LLM; otherwise the FAQ_CONTEXT_TOP_K most
+# relevant entries go into the prompt
+KNOWLEDGE_BASE_PATH = os.environ.get("KNOWLEDGE_BASE_PATH", os.path.join(BASE_DIR, "knowledge_base.json"))
+FAQ_FAST_PATH_ENABLED = _env_bool("FAQ_FAST_PATH_ENABLED", True)
+FAQ_MIN_CONFIDENCE = _env_float("FAQ_MIN_CONFIDENCE", 0.75)
+FAQ_MIN_MARGIN = _env_float("FAQ_MIN_MARGIN", 1.1)
+FAQ_CONTEXT_TOP_K = _env_int("FAQ_CONTEXT_TOP_K", 3)
+
+# Optional local sentence-embedding model (a sentence-transformers name or
+# path) matching paraphrased FAQ questions; empty disables it
+FAQ_EMBEDDING_MODEL = os.environ.get("FAQ_EMBEDDING_MODEL", "")
+FAQ_EMBEDDING_MIN_SIMILARITY = _env_float("FAQ_EMBEDDING_MIN_SIMILARITY", 0.8)
+
+# Resolve product mentions ("the grey pTron ones") to products: only those go
+# into the prompt, and price/detail questions about them are answered locally
+NAME_RESOLUTION_ENABLED = _env_bool("NAME_RESOLUTION_ENABLED", True)
+
+# Turn profiling: a sampling profiler catches the call stacks of turns from
+# sessions with profiling switched on, and of a PROFILE_SAMPLE_RATE share of
+# all other turns, every PROFILE_SAMPLE_INTERVAL seconds. Every turn slower
+# than PROFILE_SLOW_TURN_SECONDS is written to PROFILE_DIR (empty keeps them
+# in memory only) as a JSON summary, plus its collapsed stacks if sampled.
+# The last PROFILE_RECENT_TURNS turns are kept for the admin view.
+PROFILE_SAMPLE_RATE = _env_float("PROFILE_SAMPLE_RATE", 0.0)
+PROFILE_SAMPLE_INTERVAL = _env_float("PROFILE_SAMPLE_INTERVAL", 0.005)
+PROFILE_SLOW_TURN_SECONDS = _env_float("PROFILE_SLOW_TURN_SECONDS", 5.0)
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_RECENT_TURNS = _env_int("PROFILE_RECENT_TURNS", 200)
+
+# Admin sidebar: profiling switch for the session and the slowest recent turns
+ADMIN_VIEW_ENABLED = _env_bool("ADMIN_VIEW_ENABLED", False)
+ADMIN_SLOW_TURNS = _env_int("ADMIN_SLOW_TURNS", 10)
+
+# Conversation history sent to the LLM: total token budget for past turns,
+# turns kept verbatim, and the cap on the rolling summary of older turns
+HISTORY_TOKEN_BUDGET = _env_int("HISTORY_TOKEN_BUDGET", 1500)
+HISTORY_KEEP_TURNS = _env_int("HISTORY_KEEP_TURNS", 4)
+HISTORY_SUMMARY_TOKENS = _env_int("HISTORY_SUMMARY_TOKENS", 300)
+
+# Order store: path to an SQLite order database, or empty for the demo orders
+ORDER_STORE_PATH = os.environ.get("ORDER_STORE_PATH", "")
+# Hot-order LRU in front of the SQLite store (entries, seconds)
+ORDER_CACHE_SIZE = _env_int("ORDER_CACHE_SIZE", 1024)
+ORDER_CACHE_TTL = _env_float("ORDER_CACHE_TTL", 30.0)
+
+# Asyncio LLM gateway: upstream concurrency limit for the whole process,
+# maximum queued requests, and seconds a request may wait for a slot
+GATEWAY_ENABLED = _env_bool("GATEWAY_ENABLED", True)
+GATEWAY_MAX_CONCURRENCY = _env_int("GATEWAY_MAX_CONCURRENCY", 16)
+GATEWAY_MAX_QUEUE = _env_int("GATEWAY_MAX_QUEUE", 256)
+GATEWAY_QUEUE_TIMEOUT = _env_float("GATEWAY_QUEUE_TIMEOUT", 20.0)
+
+# Metrics export: Prometheus text endpoint port (0 disables) and/or a
+# rotating JSONL file of periodic snapshots
+METRICS_PORT = _env_int("METRICS_PORT", 0)
+METRICS_JSONL_PATH = os.environ.get("METRICS_JSONL_PATH", "")
+METRICS_JSONL_MAX_BYTES = _env_int("METRICS_JSONL_MAX_BYTES", 10 * 1024 * 1024)
+METRICS_EXPORT_INTERVAL = _env_float("METRICS_EXPORT_INTERVAL", 60.0)
+
+# Session store: SQLite file shared by every worker process, or in-process
+# memory when empty (single worker only)
+SESSION_STORE_PATH = os.environ.get("SESSION_STORE_PATH", "")
+SESSION_TTL = _env_float("SESSION_TTL", 24 * 3600.0)
+SESSION_MEMORY_MAX = _env_int("SESSION_MEMORY_MAX", 10000)
+# Ceiling on the approximate bytes of all in-memory sessions, least recently
+# used evicted first, and the idle time after which a session leaves memory
+SESSION_MEMORY_BYTES = _env_int("SESSION_MEMORY_BYTES", 256 * 1024 * 1024)
+SESSION_IDLE_TTL = _env_float("SESSION_IDLE_TTL", 1800.0)
+# Optional SQLite file evicted in-memory sessions are spilled to, so they
+# can be resumed later
+SESSION_SPILL_PATH = os.environ.get("SESSION_SPILL_PATH", "")
+
+# Per-session message history: ring buffer size, and how many of the most
+# recent messages stay uncompressed
+SESSION_MAX_MESSAGES = _env_int("SESSION_MAX_MESSAGES", 200)
+SESSION_PLAIN_MESSAGES = _env_int("SESSION_PLAIN_MESSAGES", 8)
+SESSION_COMPRESS_MIN_CHARS = _env_int("SESSION_COMPRESS_MIN_CHARS", 256)
+
+# Headless HTTP server
+SERVER_HOST = os.environ.get("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = _env_int("SERVER_PORT", 8000)
+SERVER_WORKERS = _env_int("SERVER_WORKERS", 1)
+SERVER_THREADS = _env_int("SERVER_THREADS", 32)
+
+# Batch CLI: conversations processed in parallel
+BATCH_CONCURRENCY = _env_int("BATCH_CONCURRENCY", 8)
@@ -0,0 +1,588 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+import hashlib
+import sys
+import time
+import uuid
+
+from catalog import format_compact_context, format_product_context
+from catalog_store import get_catalog, get_catalog_store
+from facets import answer_comparison
+from config import (
+    RETRIEVAL_TOP_K,
+    FULL_CATALOG_THRESHOLD,
+    STREAM_RESPONSES,
+    RESPONSE_CACHE_ENABLED,
+    STRUCTURED_QUERIES_ENABLED,
+    FAQ_FAST_PATH_ENABLED,
+    FAQ_CONTEXT_TOP_K,
+    NAME_RESOLUTION_ENABLED,
+    HISTORY_TOKEN_BUDGET,
+    HISTORY_KEEP_TURNS,
+    HISTORY_SUMMARY_TOKENS,
+    PROMPT_CATALOG_FORMAT,
+)
+from history import ConversationHistory, estimate_tokens, message_tokens
+from intent_router import build_intent_router
+from knowledge_base import format_entry, get_knowledge_base
+from message_log import MessageLog
+from model_router import choose_tier, get_router
+from name_resolver import answer_product_details
+from metrics import METRICS
+from order_store import open_order_store
+from product_query import answer_product_query, format_product_line
+from profiler import get_profiler, profiled, timed_items
+from response_cache import get_response_cache, cache_key, references_order
+from retrieval import retrieve_products
+from review_aspects import OWNED_PRODUCT_PATTERN
+
+# Mock order database (keeping original functionality)
+ORDERS = {
+    "123": {"status": "shipped", "eta": (datetime.now() + timedelta(days=3)).strftime("%B %d"), "items": ["Wireless Earbuds", "Phone Case"]},
+    "456": {"status": "delivered", "delivery_date": "September 15", "items": ["Smart Watch", "Charging Cable"]},
+    "789": {"status": "processing", "ship_date": (datetime.now() + timedelta(days=2)).strftime("%B %d"), "items": ["Bluetooth Speaker"]}
+}
+
+# Orders are looked up through the store - SQLite when ORDER_STORE_PATH is set
+ORDER_STORE = open_order_store(ORDERS)
+
+# Escalation triggers
+ESCALATION_KEYWORDS = ["fraud", "dispute", "human", "agent", "supervisor", "manager", "speak to someone", "real person"]
+
+# Compiled single-pass matcher over the escalation, order and FAQ keywords
+INTENT_ROUTER = build_intent_router(ESCALATION_KEYWORDS)
+
+# Product catalog with its search indexes - loaded once per process from
+# amazon_products.csv and hot-reloaded when the file changes
+CATALOG_STORE = get_catalog_store()
+
+# Responses that suggest the bot did not understand the customer
+GENERIC_RESPONSES = [
+    "I'm not sure I understand",
+    "I don't have that information",
+    "I'm unable to assist with that",
+    "I'm not sure what you're asking",
+    "Could you please clarify"
+]
+
+# Opening of the local answers given when no language model is reachable,
+# and the note ending a streamed answer that broke off
+DEGRADED_NOTICE = "I can't reach our assistant right now"
+INTERRUPTED_NOTICE = "\n\n_(The answer was cut off - please ask again.)_"
+
+# Products listed in a degraded answer
+DEGRADED_TOP_K = 3
+
+# System prompt template - the catalog format description and the snippet
+# legend are filled in once, the relevant knowledge base entries and products
+# are appended per message
+SYSTEM_PROMPT_TEMPLATE = """
+You are an E-commerce Customer Support Virtual Agent for a headphones marketplace.  
+You help customers with queries about headphones, using the provided PRODUCT_DATA as your source of data.  
+You are expected to answer all the queries of the user regarding the products, and if you don't know something, you politely hand over to a Live Agent.  
+
+{catalog_description}
+PRODUCT_DATA holds the catalog products most relevant to the customer's latest messages, not necessarily the whole catalog.  
+It is given at the end of these instructions, with the following fields:  
+
+- product_name → The brand and model name of the headphone.  
+- discounted_price → Final selling price after applying deals/offers (in INR).  
+- actual_price → Original listed price (in INR).  
+- discount_percentage → Percentage discount from actual price to discounted price.  
+- rating → Average customer rating (1–5).  
+- rating_count → Number of customers who rated the product.  
+- about_product → A short 3–4 line description of the product (features, type, color, etc.).  
+- reviews → Detailed customer reviews with a mix of positive and negative experiences.  
+
+Agent Behavior Guidelines  
+
+Tone & Style  
+- Be polite, concise, and helpful.  
+- Use natural conversational flow like a customer service agent.
+- Try and ask preferences, do not mechanically display the entire data in front of the user
+
+Query Handling  
+Query Handling – Conversational & Consultative Style
+
+The virtual agent should act like a knowledgeable sales assistant, not just a database. It must:
+
+Engage Naturally
+
+Use a friendly, conversational tone.
+
+Ask clarifying questions instead of dumping results immediately.
+
+Example: If a user says “Show me blue headphones”, reply:
+
+“Got it! Do you have a brand in mind, or should I show you all options in blue?”
+
+Guide Through Options
+
+Narrow choices step by step by asking about:
+
+Brand preference
+
+Budget / Price range
+
+Use case (gaming, travel, office, workout, etc.)
+
+Features (noise cancellation, wireless, battery life, etc.)
+
+Provide Results with Context
+
+When showing filtered/sorted products, frame it helpfully:
+
+“Here are a few blue wireless headphones under ₹3,000 that customers love for travel. Would you like me to compare their features side by side?”
+
+Offer Value Beyond Results
+
+Highlight deals (discounted price, savings).
+
+Summarize reviews in plain language (“Most people liked the comfort, but a few mentioned the battery drains quickly”).
+
+Suggest similar or better alternatives if relevant.
+
+Be Consultative, Not Mechanical
+
+The goal is to assist the customer in choosing, not just list products.
+
+Always check if the customer wants to see more options, comparisons, or recommendations.
+
+Handle Ambiguity Gracefully
+
+If user request is vague, guide with questions:
+
+“Sure! When you say ‘best headphones,’ are you looking for best in terms of sound quality, comfort, or budget?”
+
+Orders/Returns or any other FAQs (like tracking, returns, complaints):  
+- Provide a simulated conversational flow and answer the user using the KNOWLEDGEBASE entries given at the end of these instructions - the store policies and FAQ answers relevant to the customer's latest messages.  
+
+Live Agent Handover  
+- If a query cannot be resolved using PRODUCT_DATA or KNOWLEDGEBASE (e.g., real-time delivery status, warranty claims, refund escalation), respond:  
+  "I'll connect you with a live agent who can help further with this request."  
+
+Boundaries  
+- Do not make up new product data outside PRODUCT_DATA.  
+- Always base your answers only on PRODUCT_DATA, but you can be consultative like a sales executive.  
+{catalog_legend}"""
+
+# How PRODUCT_DATA is laid out in each format
+CATALOG_DESCRIPTIONS = {
+    "compact": (
+        "PRODUCT_DATA is a table with one product per line and columns separated by \" | \". "
+        "The first line names the columns. Prices and counts are plain numbers. "
+        "In about_product and reviews, codes like S3 stand for the snippet of that code in SNIPPETS, "
+        "and several snippets or reviews are separated by \"; \".  "
+    ),
+    "json": "PRODUCT_DATA is a structured JSON object.  ",
+}
+
+@lru_cache(maxsize=4)
+def system_prompt_prefix(legend_text):
+    """
+    The system prompt up to PRODUCT_DATA, and a version hash of it.
+
+    Everything before PRODUCT_DATA is identical for every request of a
+    catalog version, so providers that cache prompt prefixes can reuse it;
+    only the product rows at the very end change from message to message.
+    The version changes with the prompt wording or the snippet legend,
+    invalidating cached responses.
+    """
+    prefix = SYSTEM_PROMPT_TEMPLATE.format(
+        catalog_description=CATALOG_DESCRIPTIONS[PROMPT_CATALOG_FORMAT],
+        catalog_legend=f"\nSNIPPETS:\n{legend_text}\n" if PROMPT_CATALOG_FORMAT == "compact" else "",
+    )
+    return prefix, hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:12]
+
+def catalog_prompt_prefix(catalog):
+    return system_prompt_prefix(catalog.legend.format())
+
+class Session:
+    """
+    Per-conversation state the engine reads and writes.
+
+    The Streamlit UI and the HTTP server load and save them through a session
+    store; to_dict()/from_dict() give the plain JSON form the stores persist.
+    messages is a bounded MessageLog of compact records; profiling samples
+    the call stacks of every turn of the session.
+    """
+
+    def __init__(self, session_id=None, messages=None, failed_attempts=0, history=None, profiling=False):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.messages = messages if isinstance(messages, MessageLog) else MessageLog(messages or ())
+        self.failed_attempts = failed_attempts
+        self.history = history or ConversationHistory(HISTORY_TOKEN_BUDGET, HISTORY_KEEP_TURNS, HISTORY_SUMMARY_TOKENS)
+        self.profiling = profiling
+
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "messages": self.messages.to_list(),
+            "dropped_messages": self.messages.dropped,
+            "failed_attempts": self.failed_attempts,
+            "history": self.history.to_dict(),
+            "profiling": self.profiling,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        history = ConversationHistory(HISTORY_TOKEN_BUDGET, HISTORY_KEEP_TURNS, HISTORY_SUMMARY_TOKENS)
+        history.load_dict(data.get("history") or {})
+        messages = MessageLog(data.get("messages", []), data.get("dropped_messages", 0))
+        return cls(data["session_id"], messages, data.get("failed_attempts", 0), history, data.get("profiling", False))
+
+    def size(self):
+        """Approximate bytes held by the session, for the store's memory ceiling"""
+        summary = sum(sys.getsizeof(line) for line in self.history.summary_lines)
+        return sys.getsizeof(self) + sys.getsizeof(self.session_id) + self.messages.size() + summary
+
+def previous_user_turn(user_message, session):
+    """The customer's message before this one - it backs up the retrieval for follow-up questions"""
+    previous = [
+        m["content"] for m in session.messages
+        if m["role"] == "user" and m["content"] != user_message
+    ]
+    return previous[-1] if previous else None
+
+def retrieval_fallback(user_message, session, catalog, products=None):
+    """
+    The previous user turn when it tops up the knowledge base entries or
+    products build_system_prompt retrieves for this message, else None
+    """
+    fallback_query = previous_user_turn(user_message, session)
+    if fallback_query is None:
+        return None
+    knowledge_base = get_knowledge_base()
+    if (knowledge_base.search(user_message, FAQ_CONTEXT_TOP_K, fallback_query)
+            != knowledge_base.search(user_message, FAQ_CONTEXT_TOP_K)):
+        return fallback_query
+    if not products and len(catalog) > FULL_CATALOG_THRESHOLD:
+        retrieved = retrieve_products(catalog.index, catalog.by_id, user_message, RETRIEVAL_TOP_K)
+        if retrieve_products(
+            catalog.index, catalog.by_id, user_message, RETRIEVAL_TOP_K, fallback_query=fallback_query,
+        ) != retrieved:
+            return fallback_query
+    return None
+
+def build_system_prompt(user_message, session, catalog=None, products=None):
+    """
+    Format the system prompt with the knowledge base entries and products
+    relevant to this message: products when given (the ones the message
+    names), else retrieved
+    """
+    catalog = catalog or get_catalog()
+    fallback_query = previous_user_turn(user_message, session)
+    if products:
+        # Products the message names replace retrieval - nothing else is relevant
+        products = list(products)
+    elif len(catalog) <= FULL_CATALOG_THRESHOLD:
+        # Small catalogs fit comfortably, so the model sees everything
+        products = catalog.products
+    else:
+        products = retrieve_products(
+            catalog.index, catalog.by_id, user_message, RETRIEVAL_TOP_K, fallback_query=fallback_query,
+        )
+    if PROMPT_CATALOG_FORMAT == "compact":
+        data = format_compact_context(products, catalog.legend, catalog.rows)
+    else:
+        data = format_product_context(products)
+    policies = get_knowledge_base().context(user_message, FAQ_CONTEXT_TOP_K, fallback_query)
+    prefix, _ = catalog_prompt_prefix(catalog)
+    policies = f"KNOWLEDGEBASE:\n{policies}\n" if policies else ""
+    return f"{prefix}\n{policies}PRODUCT_DATA:\n{data}\n"
+
+def check_for_escalation(user_message, session, intent=None):
+    """Check if the message should trigger escalation to a human agent"""
+    if intent is None:
+        intent = INTENT_ROUTER.route(user_message)
+    
+    # Check for explicit escalation keywords
+    if intent.escalation:
+        return True
+    
+    # Check for failed attempts threshold
+    if session.failed_attempts >= 2:
+        session.failed_attempts = 0  # Reset counter after escalation
+        return True
+    
+    return False
+
+def extract_order_number(message, intent=None):
+    """Try to extract an order number from the message"""
+    if intent is None:
+        intent = INTENT_ROUTER.route(message)
+    # The router has already pulled out every standalone number
+    for candidate in intent.order_ids:
+        if candidate in ORDER_STORE:
+            return candidate
+    return None
+
+def handle_order_status(order_number):
+    """Generate a response for order status inquiries"""
+    order = ORDER_STORE.get(order_number)
+    if order:
+        if order["status"] == "shipped":
+            return f"Your order #{order_number} has been shipped and is scheduled to arrive by {order['eta']}. It contains: {', '.join(order['items'])}."
+        elif order["status"] == "delivered":
+            return f"Your order #{order_number} was delivered on {order['delivery_date']}. It contained: {', '.join(order['items'])}."
+        elif order["status"] == "processing":
+            return f"Your order #{order_number} is currently processing and will ship on {order['ship_date']}. It contains: {', '.join(order['items'])}."
+    return None
+
+def handle_return_refund(order_number):
+    """Generate a response for return/refund initiation"""
+    if order_number in ORDER_STORE:
+        return f"I've initiated a return for order #{order_number}. You'll receive a return shipping label via email shortly. Once we receive the returned items, your refund will be processed within 5-7 business days."
+    return None
+
+@profiled("llm")
+def get_llm_response(messages, tier="large", provider=None, session_id=None):
+    """
+    Get a response from the model router.
+
+    tier picks the model size; provider pins one registered provider instead
+    of falling back across all of them. Returns None if no provider answered.
+    """
+    try:
+        with METRICS.timer("llm_total"):
+            return get_router().complete(messages, tier, session_id=session_id, provider=provider)
+    except Exception:
+        METRICS.increment("llm_errors")
+        return None
+
+def stream_llm_response(messages, tier="large", provider=None, session_id=None, fallback=None):
+    """
+    Yield the response from the model router as text deltas while it is generated.
+
+    If no provider answers, fallback() supplies a local answer instead; a
+    stream that breaks off midway ends with INTERRUPTED_NOTICE.
+    """
+    started = False
+    try:
+        for delta in get_router().stream(messages, tier, session_id=session_id, provider=provider):
+            started = True
+            yield delta
+    except Exception:
+        METRICS.increment("llm_errors")
+        if started:
+            yield INTERRUPTED_NOTICE
+        else:
+            yield fallback() if fallback else DEGRADED_NOTICE + "."
+
+def degraded_answer(user_message, intent, catalog, resolved=None):
+    """Deterministic answer for when no language model is reachable"""
+    METRICS.increment("llm_degraded")
+    if intent.faq_topics:
+        knowledge_base = get_knowledge_base()
+        entries = knowledge_base.search(user_message, DEGRADED_TOP_K)
+        if entries:
+            lines = [f"{DEGRADED_NOTICE}, but our policies may already answer your question:", ""]
+            lines.extend(format_entry(knowledge_base.entries[i]) for i in entries)
+            lines.append("")
+            lines.append("Type \"agent\" if you'd like to talk to a person.")
+            return "\n".join(lines)
+    products = resolved[:DEGRADED_TOP_K] if resolved else None
+    if not products and intent.product_query:
+        products = retrieve_products(catalog.index, catalog.by_id, user_message, DEGRADED_TOP_K)
+    if products:
+        lines = [f"{DEGRADED_NOTICE}, but these products match your question best:", ""]
+        lines.extend(format_product_line(i, p) for i, p in enumerate(products, 1))
+        lines.append("")
+        lines.append("Ask again in a moment for a detailed recommendation, or type \"agent\" to talk to a person.")
+        return "\n".join(lines)
+    return f"{DEGRADED_NOTICE}. Please try again in a moment, or type \"agent\" to talk to a person."
+
+def is_degraded_response(response):
+    """True for local fallback answers and responses cut off by a failing model"""
+    return response.startswith(DEGRADED_NOTICE) or response.endswith(INTERRUPTED_NOTICE)
+
+def timed_stream(deltas, messages):
+    """Record time to first token, total time and estimated tokens of a streamed response"""
+    start = time.perf_counter()
+    first = None
+    parts = []
+    # The turn's "llm" span is the time spent waiting on deltas
+    for delta in timed_items("llm", deltas):
+        if first is None:
+            first = time.perf_counter()
+            METRICS.observe("llm_ttft", first - start)
+        parts.append(delta)
+        yield delta
+    total = time.perf_counter() - start
+    METRICS.observe("llm_total", total)
+    # Streamed responses carry no usage block, so estimate locally
+    METRICS.increment("llm_tokens", sum(message_tokens(m) for m in messages), kind="prompt", source="estimate")
+    METRICS.increment("llm_tokens", estimate_tokens("".join(parts)), kind="completion", source="estimate")
+
+def is_generic_response(response):
+    """True when the response seems generic or confused"""
+    return any(generic in response for generic in GENERIC_RESPONSES)
+
+def update_failed_attempts(response, session):
+    """Count generic or confused responses towards escalation"""
+    # If the response seems generic or confused, increment the failed attempts counter
+    if is_generic_response(response):
+        session.failed_attempts += 1
+    else:
+        session.failed_attempts = 0  # Reset on successful response
+
+def store_response(cache, key, response):
+    """Cache a finished response unless it is an error or a confused answer"""
+    if cache is None or is_degraded_response(response) or is_generic_response(response):
+        return
+    cache.put(key, response)
+
+def track_streamed_response(deltas, session, cache=None, cache_key=None):
+    """Pass deltas through and handle the full text once the stream has finished"""
+    parts = []
+    for delta in deltas:
+        parts.append(delta)
+        yield delta
+    response = "".join(parts)
+    update_failed_attempts(response, session)
+    store_response(cache, cache_key, response)
+
+@profiled("process_message")
+def process_message(user_message, session):
+    """
+    Process the user message and determine an appropriate response.
+
+    Returns the response text, or a generator of text deltas when streaming.
+    The caller has already appended the user message to session.messages.
+    """
+    # One catalog snapshot for the whole turn, even if a reload lands meanwhile
+    catalog = get_catalog()
+    
+    # One normalization and keyword scan feeds every check below
+    with METRICS.timer("stage", stage="escalation_check"):
+        intent = INTENT_ROUTER.route(user_message)
+        escalate = check_for_escalation(user_message, session, intent)
+    
+    # Check for escalation triggers
+    if escalate:
+        METRICS.increment("turns", route="escalation")
+        return "I'll connect you with a human support agent who can better assist you with this. Please hold while I transfer your chat."
+    
+    with METRICS.timer("stage", stage="order_lookup"):
+        # Try to extract order number
+        order_number = extract_order_number(user_message, intent)
+        
+        # Check if this is an order status query
+        response = None
+        if order_number and intent.order_status:
+            response = handle_order_status(order_number)
+        
+        # Check if this is a return/refund request
+        if not response and order_number and intent.return_refund:
+            response = handle_return_refund(order_number)
+    if response:
+        METRICS.increment("turns", route="order")
+        return response
+    
+    # Policy questions the knowledge base answers outright ("Can I pay on
+    # delivery?") get its canonical answer
+    knowledge_base = get_knowledge_base()
+    if FAQ_FAST_PATH_ENABLED and intent.faq_topics:
+        with METRICS.timer("stage", stage="faq_lookup"):
+            response = knowledge_base.answer(user_message)
+        if response:
+            METRICS.increment("turns", route="faq")
+            update_failed_attempts(response, session)
+            return response
+    
+    # Comparisons and price/rating/discount questions are answered straight
+    # from the catalog - but not policy or return questions, nor ones about a
+    # product the customer already has ("I paid more than 5000 for my ...")
+    shopping = not (intent.faq_topics or intent.return_refund or OWNED_PRODUCT_PATTERN.search(user_message.lower()))
+    if STRUCTURED_QUERIES_ENABLED and shopping:
+        with METRICS.timer("stage", stage="structured_query"):
+            response = answer_comparison(user_message, catalog.facets) or answer_product_query(user_message, catalog.table)
+        if response:
+            METRICS.increment("turns", route="structured_query")
+            update_failed_attempts(response, session)
+            return response
+    
+    # Products the message names ("the grey pTron ones") - price and detail
+    # questions about them are answered directly, anything else gets only
+    # them as PRODUCT_DATA
+    resolved = []
+    if NAME_RESOLUTION_ENABLED:
+        with METRICS.timer("stage", stage="name_resolution"):
+            resolved = [catalog.by_id[i] for i in catalog.names.resolve(user_message, RETRIEVAL_TOP_K)]
+            response = answer_product_details(user_message, resolved)
+        if response:
+            METRICS.increment("turns", route="name_resolution")
+            update_failed_attempts(response, session)
+            return response
+    
+    # Serve repeated questions from the shared response cache - messages
+    # about a specific order always go to the model
+    cache = None
+    key = None
+    if RESPONSE_CACHE_ENABLED and not order_number and not references_order(user_message):
+        with METRICS.timer("stage", stage="cache_lookup"):
+            cache = get_response_cache()
+            prompt_version = f"{catalog_prompt_prefix(catalog)[1]}:{knowledge_base.version}"
+            # A previous turn that fed the retrieval shapes the prompt, so it is part of the key
+            fallback_query = retrieval_fallback(user_message, session, catalog, resolved)
+            key = cache_key(user_message, catalog.version, prompt_version, session.messages, fallback_query)
+            cached = cache.get(key)
+        if cached is not None:
+            METRICS.increment("turns", route="cache")
+            update_failed_attempts(cached, session)
+            return cached
+    
+    with METRICS.timer("stage", stage="prompt_assembly"):
+        # Previous turns - the chat UI has already appended the current message
+        history = session.messages
+        if history and history[-1]["role"] == "user" and history[-1]["content"] == user_message:
+            history = history[:-1]
+        
+        # System prompt with the retrieved products, a summary of older turns,
+        # the most recent turns verbatim and the current message
+        messages = session.history.build(
+            build_system_prompt(user_message, session, catalog, resolved), history, user_message,
+            session.messages.dropped,
+        )
+    METRICS.increment("turns", route="llm")
+    # FAQ and lookup questions go to the small model, open-ended advice to the large one
+    tier = choose_tier(user_message, intent)
+    fallback = lambda: degraded_answer(user_message, intent, catalog, resolved)
+    
+    # Stream the response when enabled - the caller renders it as it arrives
+    if STREAM_RESPONSES:
+        deltas = stream_llm_response(messages, tier, session_id=session.session_id, fallback=fallback)
+        return track_streamed_response(timed_stream(deltas, messages), session, cache, key)
+    
+    # Get response from LLM, or a local answer if no model is reachable
+    response = get_llm_response(messages, tier, session_id=session.session_id) or fallback()
+    update_failed_attempts(response, session)
+    store_response(cache, key, response)
+        
+    return response
+
+def stream_turn(prompt, session):
+    """Run one chat turn, yielding the response text as it is produced"""
+    start = time.perf_counter()
+    profiler = get_profiler()
+    with profiler.turn(session) as profile:
+        session.messages.append({"role": "user", "content": prompt})
+        response = process_message(prompt, session)
+        if isinstance(response, str):
+            parts = [response]
+            with profiler.suspended(profile):
+                yield response
+        else:
+            parts = []
+            for delta in response:
+                parts.append(delta)
+                # The consumer's time between deltas is not the turn's
+                with profiler.suspended(profile):
+                    yield delta
+        profile.response = "".join(parts)
+        session.messages.append({"role": "assistant", "content": profile.response})
+    METRICS.observe("turn", time.perf_counter() - start)
+
+def run_turn(prompt, session):
+    """Run one chat turn and return the full response text"""
+    return "".join(stream_turn(prompt, session))
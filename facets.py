@@ -0,0 +1,406 @@
+import bisect
+import re
+from itertools import combinations
+
+import numpy as np
+
+from product_query import (
+    COLOR_ALIASES,
+    DISCOUNT_PATTERN,
+    MAX_PRICE_PATTERN,
+    MIN_PRICE_PATTERN,
+    PRICE_RANGE_PATTERN,
+    RATING_PATTERNS,
+    TYPE_KEYWORDS,
+    _normalize,
+    _unparsed_words,
+    _words,
+)
+from review_aspects import query_aspects
+
+# Product name parts aggregated by the facet index, in comparison priority
+FACETS = ["brand", "type", "color"]
+
+# Every non-empty combination of facets, e.g. ("brand",) or ("brand", "type")
+FACET_GROUPS = [group for size in range(1, len(FACETS) + 1) for group in combinations(FACETS, size)]
+
+COMPARE_PATTERN = re.compile(
+    r"\bcompar(?:e|ed|ing|ison)\b|\bvs\b|\bversus\b|\bdifference between\b|\bor\b.*\bbetter\b|\bbetter\b.*\bor\b"
+)
+
+# Words of a comparison question besides the options it compares; anything
+# else ("for gaming", "better for calls") is a criterion the aggregates
+# cannot speak to, so the question goes to the model
+COMPARE_WORDS = frozenset("""
+compare compared comparing comparison vs versus difference between better
+brand brands color colors colour colours type types how they against
+""".split())
+
+# Generic form-factor nouns, mapped to the type word they select
+TYPE_NOUNS = [("earphone", "earphones"), ("headphone", "headphones"), ("earbud", "earbuds")]
+
+# Questions with their own numeric or review filters go to the product query path
+FILTER_PATTERNS = [PRICE_RANGE_PATTERN, MAX_PRICE_PATTERN, MIN_PRICE_PATTERN, DISCOUNT_PATTERN] + RATING_PATTERNS
+
+
+class FacetStats:
+    """
+    Aggregates of one facet group, e.g. brand=Sony or brand=Sony + color=Black.
+
+    Prices and discounts are kept sorted so min/max stay exact when products
+    are removed.
+    """
+
+    __slots__ = ("count", "price_sum", "prices", "rating_sum", "rating_count", "discounts")
+
+    def __init__(self):
+        self.count = 0
+        self.price_sum = 0
+        self.prices = []
+        self.rating_sum = 0.0
+        self.rating_count = 0
+        self.discounts = []
+
+    def copy(self):
+        stats = FacetStats()
+        stats.count = self.count
+        stats.price_sum = self.price_sum
+        stats.prices = list(self.prices)
+        stats.rating_sum = self.rating_sum
+        stats.rating_count = self.rating_count
+        stats.discounts = list(self.discounts)
+        return stats
+
+    def add(self, product):
+        self.count += 1
+        self.price_sum += product["discounted_price"]
+        self.rating_sum += product["rating"]
+        self.rating_count += product["rating_count"]
+        bisect.insort(self.prices, product["discounted_price"])
+        bisect.insort(self.discounts, product["discount_percentage"])
+
+    def remove(self, product):
+        self.count -= 1
+        self.price_sum -= product["discounted_price"]
+        self.rating_sum -= product["rating"]
+        self.rating_count -= product["rating_count"]
+        del self.prices[bisect.bisect_left(self.prices, product["discounted_price"])]
+        del self.discounts[bisect.bisect_left(self.discounts, product["discount_percentage"])]
+
+
+def summarize(groups):
+    """Merge several groups' aggregates into one summary dict, or None if they are empty"""
+    groups = [stats for stats in groups if stats.count]
+    count = sum(stats.count for stats in groups)
+    if not count:
+        return None
+    return {
+        "count": count,
+        "min_price": min(stats.prices[0] for stats in groups),
+        "max_price": max(stats.prices[-1] for stats in groups),
+        "avg_price": sum(stats.price_sum for stats in groups) / count,
+        "avg_rating": sum(stats.rating_sum for stats in groups) / count,
+        "rating_count": sum(stats.rating_count for stats in groups),
+        "best_discount": max(stats.discounts[-1] for stats in groups),
+    }
+
+
+def group_keys(product):
+    """The keys of every facet group a product belongs to"""
+    return [tuple((facet, product[facet]) for facet in group) for group in FACET_GROUPS]
+
+
+def group_records(table):
+    """
+    Every facet group's aggregates computed from a ProductTable's columns,
+    as JSON-serializable records for FacetIndex.from_records(). Rows are
+    sorted by group once per facet combination and reduced segment-wise.
+    """
+    prices = table.columns["discounted_price"]
+    discounts = table.columns["discount_percentage"]
+    records = []
+    for group in FACET_GROUPS:
+        key = np.zeros(table.size, dtype=np.int64)
+        for facet in group:
+            key = key * len(table.vocabularies[facet]) + table.codes[facet]
+        order = np.argsort(key, kind="stable")
+        if not order.size:
+            continue
+        ordered = key[order]
+        starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+        counts = np.diff(np.r_[starts, order.size])
+        sums = {
+            name: np.add.reduceat(table.columns[name][order], starts).tolist()
+            for name in ("discounted_price", "rating", "rating_count")
+        }
+        low_price = np.minimum.reduceat(prices[order], starts).tolist()
+        high_price = np.maximum.reduceat(prices[order], starts).tolist()
+        low_discount = np.minimum.reduceat(discounts[order], starts).tolist()
+        high_discount = np.maximum.reduceat(discounts[order], starts).tolist()
+        for i, start in enumerate(starts.tolist()):
+            row = order[start]
+            values = [[facet, table.vocabularies[facet][table.codes[facet][row]]] for facet in group]
+            records.append([
+                values, int(counts[i]), sums["discounted_price"][i], low_price[i], high_price[i],
+                sums["rating"][i], sums["rating_count"][i], low_discount[i], high_discount[i],
+            ])
+    return records
+
+
+class FacetIndex:
+    """
+    Count, price, rating and discount aggregates per brand, type and color
+    and every combination of them, so comparisons read a handful of groups
+    instead of scanning the catalog.
+
+    updated() applies catalog changes copy-on-write: only the groups the
+    changed products belong to are copied, and the previous index stays
+    valid for readers of the old snapshot.
+    """
+
+    def __init__(self, products=()):
+        self.groups = {}  # ((facet, value), ...) -> FacetStats
+        self._values = None
+        for product in products:
+            for key in group_keys(product):
+                stats = self.groups.get(key)
+                if stats is None:
+                    stats = self.groups[key] = FacetStats()
+                # Appended here and sorted once below, cheaper than insort per product
+                stats.count += 1
+                stats.price_sum += product["discounted_price"]
+                stats.rating_sum += product["rating"]
+                stats.rating_count += product["rating_count"]
+                stats.prices.append(product["discounted_price"])
+                stats.discounts.append(product["discount_percentage"])
+        for stats in self.groups.values():
+            stats.prices.sort()
+            stats.discounts.sort()
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Index over precomputed group_records() output. Only each group's
+        extreme prices and discounts are known, so it answers aggregate()
+        but can't be updated().
+        """
+        index = cls()
+        for key, count, price_sum, min_price, max_price, rating_sum, rating_count, min_discount, max_discount in records:
+            stats = FacetStats()
+            stats.count = count
+            stats.price_sum = price_sum
+            stats.prices = [min_price, max_price]
+            stats.rating_sum = rating_sum
+            stats.rating_count = rating_count
+            stats.discounts = [min_discount, max_discount]
+            index.groups[tuple(tuple(pair) for pair in key)] = stats
+        return index
+
+    def updated(self, added=(), removed=()):
+        """A new index with the removed products taken out and the added ones counted"""
+        index = FacetIndex()
+        index.groups = dict(self.groups)
+        copied = set()
+
+        def writable(key):
+            if key not in copied:
+                copied.add(key)
+                stats = index.groups.get(key)
+                index.groups[key] = stats.copy() if stats is not None else FacetStats()
+            return index.groups[key]
+
+        for product in removed:
+            for key in group_keys(product):
+                writable(key).remove(product)
+        for product in added:
+            for key in group_keys(product):
+                writable(key).add(product)
+        for key in copied:
+            if not index.groups[key].count:
+                del index.groups[key]
+        return index
+
+    def values(self, facet):
+        """Values of one facet that have products"""
+        if self._values is None:
+            values = {name: set() for name in FACETS}
+            for key in self.groups:
+                if len(key) == 1:
+                    values[key[0][0]].add(key[0][1])
+            self._values = values
+        return self._values[facet]
+
+    def aggregate(self, **selection):
+        """
+        Summary of the products matching every given facet, each a set of
+        accepted values: aggregate(brand={"Sony"}, type={"Wired Earphones"}).
+        Reads one group per combination of selected values.
+        """
+        facets = tuple(facet for facet in FACETS if selection.get(facet))
+        if not facets:
+            return None
+        keys = [()]
+        for facet in facets:
+            keys = [key + ((facet, value),) for key in keys for value in sorted(selection[facet])]
+        return summarize([self.groups[key] for key in keys if key in self.groups])
+
+
+def _type_label(type_word, matching):
+    """Column label of a form factor: the type name itself when it selects just one"""
+    if len(matching) == 1:
+        return next(iter(matching))
+    return type_word.title()
+
+
+def _type_options(text, types):
+    """
+    The form factors mentioned in text, as (label, set of types) in the order
+    they appear. Specific keywords (wired, over ear, ...) are the options and
+    a generic noun narrows them where it can ("wired earphones"); on their
+    own the nouns are the options ("earphones vs headphones").
+    """
+    padded = " " + " ".join(re.findall(r"[a-z0-9]+", text)) + " "
+    keywords = []
+    for phrase, type_word in TYPE_KEYWORDS:
+        position = padded.find(" " + phrase)
+        if position >= 0:
+            matching = {t for t in types if (" " + type_word) in " " + _normalize(t)}
+            keywords.append((position, type_word, matching))
+            # Blanked so "truly wireless" is not also read as plain "wireless"
+            padded = padded.replace(" " + phrase, " " * (len(phrase) + 1))
+    nouns = []
+    for noun, type_word in TYPE_NOUNS:
+        position = padded.find(" " + noun)
+        if position >= 0:
+            nouns.append((position, type_word, {t for t in types if type_word in _normalize(t)}))
+    if keywords and nouns:
+        narrowing = set.union(*(matching for _, _, matching in nouns))
+        keywords = [
+            (position, type_word, (matching & narrowing) or matching)
+            for position, type_word, matching in keywords
+        ]
+    options = []
+    for _, type_word, matching in sorted(keywords or nouns, key=lambda option: option[0]):
+        if matching and all(matching != seen for _, seen in options):
+            options.append((_type_label(type_word, matching), matching))
+    return options
+
+
+def parse_comparison(message, values):
+    """
+    Parse "compare X and Y" into (facet, [(label, values)], filters).
+
+    values maps each facet to its known values. facet is the first facet with
+    two or more options mentioned; filters narrows the other facets, e.g.
+    "Compare Sony and JBL earphones" compares brands among earphone types.
+    Returns None for anything else, including comparisons by a criterion
+    ("better for calls, Sony or JBL?").
+    """
+    text = _normalize(message)
+    if not COMPARE_PATTERN.search(text):
+        return None
+    if any(pattern.search(text) for pattern in FILTER_PATTERNS) or query_aspects(text):
+        return None
+    if _unparsed_words(text, values) - COMPARE_WORDS:
+        return None
+    words = _words(text)
+    mentioned = {
+        "brand": [(b, {b}) for b in sorted(values["brand"], key=lambda b: text.find(b.lower())) if b.lower() in words],
+        "type": _type_options(text, values["type"]),
+        "color": [
+            (c, {c}) for c in sorted(values["color"], key=lambda c: text.find(c.lower()))
+            if c.lower() in words or any(COLOR_ALIASES.get(w) == c.lower() for w in words)
+        ],
+    }
+    facet = next((f for f in FACETS if len(mentioned[f]) >= 2), None)
+    if facet is None:
+        return None
+    filters = {}
+    for other in FACETS:
+        if other == facet or not mentioned[other]:
+            continue
+        # "wireless earbuds" narrows to the types both words select
+        sets = [accepted for _, accepted in mentioned[other]]
+        filters[other] = set.intersection(*sets) or set.union(*sets)
+    return facet, mentioned[facet], filters
+
+
+def _format_cell(summary, field):
+    if summary is None:
+        return "—"
+    if field == "count":
+        return f"{summary['count']:,}"
+    if field == "price_range":
+        if summary["min_price"] == summary["max_price"]:
+            return f"₹{summary['min_price']:,}"
+        return f"₹{summary['min_price']:,} – ₹{summary['max_price']:,}"
+    if field == "avg_price":
+        return f"₹{summary['avg_price']:,.0f}"
+    if field == "avg_rating":
+        return f"{summary['avg_rating']:.2f}★"
+    if field == "rating_count":
+        return f"{summary['rating_count']:,}"
+    return f"{summary['best_discount']}% off"
+
+
+# Comparison table rows: (summary field, row title)
+COMPARISON_ROWS = [
+    ("count", "Products"),
+    ("price_range", "Price range"),
+    ("avg_price", "Average price"),
+    ("avg_rating", "Average rating"),
+    ("rating_count", "Total ratings"),
+    ("best_discount", "Best discount"),
+]
+
+
+def format_comparison(facet, options, filters, summaries):
+    """Phrase the aggregates as a markdown comparison table"""
+    labels = [label for label, _ in options]
+    scope = []
+    if filters.get("type"):
+        scope.append("among " + " / ".join(sorted(t.lower() for t in filters["type"])))
+    if filters.get("brand"):
+        scope.append("from " + " or ".join(sorted(filters["brand"])))
+    if filters.get("color"):
+        scope.append("in " + "/".join(sorted(filters["color"])))
+    scope = (" " + " ".join(scope)) if scope else ""
+    names = ", ".join(labels[:-1]) + " and " + labels[-1]
+    if all(s is None for s in summaries):
+        return (
+            f"I couldn't find any {' or '.join(labels)} products{scope}. "
+            "Would you like me to compare them across the whole catalog instead?"
+        )
+    lines = [f"Here's how {names} compare{scope}:", ""]
+    lines.append("| | " + " | ".join(labels) + " |")
+    lines.append("|---" * (len(labels) + 1) + "|")
+    for field, title in COMPARISON_ROWS:
+        lines.append(f"| {title} | " + " | ".join(_format_cell(s, field) for s in summaries) + " |")
+
+    present = [(label, s) for label, s in zip(labels, summaries) if s is not None]
+    missing = [label for label, s in zip(labels, summaries) if s is None]
+    lines.append("")
+    if len(present) >= 2:
+        cheapest = min(present, key=lambda option: option[1]["avg_price"])
+        best_rated = max(present, key=lambda option: option[1]["avg_rating"])
+        summary = f"{cheapest[0]} is the more affordable choice on average"
+        if best_rated[0] == cheapest[0]:
+            summary += " and also the best rated." if len(present) > 2 else " and also rated higher."
+        else:
+            summary += f", while {best_rated[0]} is rated higher."
+        lines.append(summary)
+    if missing:
+        lines.append(f"I couldn't find any {' or '.join(missing)} products{scope}.")
+    lines.append("Would you like to see the top picks from each, or compare specific models?")
+    return "\n".join(lines)
+
+
+def answer_comparison(message, facets):
+    """Answer a brand/type/color comparison from the facet index, or return None if it isn't one"""
+    values = {facet: facets.values(facet) for facet in FACETS}
+    comparison = parse_comparison(message, values)
+    if comparison is None:
+        return None
+    facet, options, filters = comparison
+    summaries = [facets.aggregate(**dict(filters, **{facet: accepted})) for _, accepted in options]
+    return format_comparison(facet, options, filters, summaries)
@@ -0,0 +1,158 @@
+import math
+import re
+
+# Rough per-message overhead of the chat format (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Longest excerpt of a single message kept in the rolling summary
+SUMMARY_EXCERPT_CHARS = 160
+
+# Allowance for the summary message's header line
+SUMMARY_HEADER_TOKENS = 12
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text):
+    """Local token estimate (~4 characters per token for English), no network needed"""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def message_tokens(message):
+    """Estimated tokens for one chat message including format overhead"""
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def summarize_message(message):
+    """Compact one-line digest of a message for the rolling summary"""
+    text = " ".join(message["content"].split())
+    # The first sentence usually carries the question or the recommendation
+    first = SENTENCE_END.split(text, 1)[0]
+    if len(first) > SUMMARY_EXCERPT_CHARS:
+        first = first[:SUMMARY_EXCERPT_CHARS].rsplit(" ", 1)[0] + "..."
+    speaker = "Customer" if message["role"] == "user" else "Agent"
+    return f"- {speaker}: {first}"
+
+
+class ConversationHistory:
+    """
+    Token-budgeted view of a conversation for the LLM prompt.
+
+    The last keep_turns turns are sent verbatim (fewer if they would exceed
+    token_budget). Older messages are folded into a rolling summary exactly
+    once, as they fall out of the verbatim window, so each turn only pays for
+    the messages that are new since the previous one.
+    """
+
+    def __init__(self, token_budget, keep_turns, summary_budget):
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.summary_budget = summary_budget
+        self.summary_lines = []
+        self.summary_tokens = 0
+        self.summarized_count = 0  # messages folded into the summary so far
+        self.dropped_lines = 0  # oldest summary lines dropped to respect summary_budget
+        # Running token total of the full history, counted incrementally
+        self._full_tokens = 0
+        self._counted_count = 0
+        # Messages the session's ring buffer has dropped; positions above are
+        # relative to the oldest message still held
+        self._offset = 0
+        self.last_metrics = None
+
+    # Rolling state persisted with a session; the budgets come from config
+    STATE_FIELDS = ("summary_lines", "summary_tokens", "summarized_count", "dropped_lines",
+                    "_full_tokens", "_counted_count", "_offset", "last_metrics")
+
+    def to_dict(self):
+        return {name.lstrip("_"): getattr(self, name) for name in self.STATE_FIELDS}
+
+    def load_dict(self, state):
+        for name in self.STATE_FIELDS:
+            if name.lstrip("_") in state:
+                setattr(self, name, state[name.lstrip("_")])
+
+    def _rebase(self, offset):
+        """Shift positions after the ring buffer dropped its oldest messages"""
+        shift = offset - self._offset
+        if shift <= 0:
+            return
+        if shift > self.summarized_count:
+            # Dropped before they were summarized - they are simply omitted
+            self.dropped_lines += shift - self.summarized_count
+        self.summarized_count = max(0, self.summarized_count - shift)
+        self._counted_count = max(0, self._counted_count - shift)
+        self._offset = offset
+
+    def _fold(self, messages, upto):
+        """Fold messages[summarized_count:upto] into the rolling summary"""
+        for message in messages[self.summarized_count:upto]:
+            line = summarize_message(message)
+            self.summary_lines.append(line)
+            self.summary_tokens += estimate_tokens(line) + 1
+        self.summarized_count = max(self.summarized_count, upto)
+        # Keep the summary itself bounded by dropping its oldest lines
+        while self.summary_tokens > self.summary_budget and len(self.summary_lines) > 1:
+            line = self.summary_lines.pop(0)
+            self.summary_tokens -= estimate_tokens(line) + 1
+            self.dropped_lines += 1
+
+    def summary_cost(self):
+        """Estimated tokens the summary message adds to the prompt"""
+        if not self.summary_lines:
+            return 0
+        return self.summary_tokens + SUMMARY_HEADER_TOKENS + MESSAGE_OVERHEAD_TOKENS
+
+    def summary_message(self):
+        """System message carrying the rolling summary, or None if nothing is summarized"""
+        if not self.summary_lines:
+            return None
+        header = "Summary of the earlier conversation"
+        if self.dropped_lines:
+            header += " (oldest parts omitted)"
+        return {"role": "system", "content": header + ":\n" + "\n".join(self.summary_lines)}
+
+    def build(self, system_prompt, history, user_message, offset=0):
+        """
+        Assemble the prompt messages for a turn.
+
+        history holds the previous messages, oldest first, not including the
+        current user message; offset is the number of older messages the
+        session no longer holds.
+        """
+        self._rebase(offset)
+        for message in history[self._counted_count:]:
+            self._full_tokens += message_tokens(message)
+        self._counted_count = len(history)
+
+        # Verbatim window: the last keep_turns turns, shrunk to fit the budget
+        start = max(self.summarized_count, len(history) - 2 * self.keep_turns)
+        if start > self.summarized_count:
+            self._fold(history, start)
+        window_tokens = sum(message_tokens(m) for m in history[start:])
+        while start < len(history) and window_tokens + self.summary_cost() > self.token_budget:
+            window_tokens -= message_tokens(history[start])
+            start += 1
+            # Budget pressure folds the window's oldest message straight away
+            self._fold(history, start)
+
+        messages = [{"role": "system", "content": system_prompt}]
+        summary = self.summary_message()
+        if summary:
+            messages.append(summary)
+        messages.extend({"role": m["role"], "content": m["content"]} for m in history[start:])
+        messages.append({"role": "user", "content": user_message})
+
+        system_tokens = estimate_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+        history_tokens = window_tokens + (message_tokens(summary) if summary else 0)
+        user_tokens = estimate_tokens(user_message) + MESSAGE_OVERHEAD_TOKENS
+        self.last_metrics = {
+            "system_tokens": system_tokens,
+            "history_tokens": history_tokens,
+            "full_history_tokens": self._full_tokens,
+            "saved_tokens": max(0, self._full_tokens - history_tokens),
+            "verbatim_messages": len(history) - start,
+            "summarized_messages": self.summarized_count,
+            "prompt_tokens": system_tokens + history_tokens + user_tokens,
+        }
+        return messages
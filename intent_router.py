@@ -0,0 +1,141 @@
+import re
+
+# Keyword sets per intent. Keywords match at the start of a word and as a
+# prefix, so "return" also covers "returns" and "returned" (the original
+# checks were plain substring tests).
+ORDER_STATUS_KEYWORDS = ["status", "where", "track"]
+RETURN_REFUND_KEYWORDS = ["return", "refund"]
+
+FAQ_TOPIC_KEYWORDS = {
+    "shipping": ["ship", "deliver", "dispatch", "courier", "international"],
+    "returns": ["return", "refund", "replace", "exchange", "damaged", "defective", "broken"],
+    "cancellation": ["cancel"],
+    "warranty": ["warranty", "guarantee", "repair", "service center", "service centre"],
+    "payment": ["pay", "cod", "cash on delivery", "upi", "card", "wallet", "net banking", "money was deducted"],
+    "order": ["order confirmation", "confirmation", "sms", "email", "track"],
+    "support": ["support", "contact", "complaint", "helpline"],
+}
+
+PRODUCT_KEYWORDS = [
+    "headphone", "earphone", "earbud", "headset", "wireless", "wired", "in-ear", "in ear",
+    "over-ear", "over ear", "bluetooth", "noise cancel", "anc", "bass", "battery", "mic",
+    "price", "cheap", "budget", "discount", "deal", "offer", "rating", "rated", "review",
+    "compare", "recommend", "suggest", "best", "gaming", "sony", "jbl", "boult", "ptron",
+    "oneplus", "noise", "skullcandy", "sennheiser", "zebronics",
+]
+
+# Standalone numbers are order ID candidates; keywords start at a word boundary
+NUMBER_GROUP = r"\b(?P<number>\d+)\b"
+
+
+class IntentResult:
+    """Structured routing result for one message"""
+
+    __slots__ = ("intents", "order_ids", "matches")
+
+    def __init__(self, intents, order_ids, matches):
+        self.intents = intents  # frozenset of intent names
+        self.order_ids = order_ids  # tuple of numeric tokens, in message order
+        self.matches = matches  # tuple of matched keywords, in message order
+
+    @property
+    def escalation(self):
+        return "escalation" in self.intents
+
+    @property
+    def order_status(self):
+        return "order_status" in self.intents
+
+    @property
+    def return_refund(self):
+        return "return_refund" in self.intents
+
+    @property
+    def product_query(self):
+        return "product" in self.intents
+
+    @property
+    def faq_topics(self):
+        """FAQ topic names, e.g. {'payment', 'shipping'}"""
+        return {name[4:] for name in self.intents if name.startswith("faq:")}
+
+    def __repr__(self):
+        return f"IntentResult(intents={sorted(self.intents)}, order_ids={self.order_ids})"
+
+
+def _trie_pattern(words):
+    """
+    Compile words into a regex alternation shaped like a trie.
+
+    Shared prefixes are matched once, so cost grows with the length of the
+    text rather than the number of keywords; longer keywords are preferred.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}  # end-of-word marker
+
+    def build(node):
+        terminal = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        pattern = "(?:" + "|".join(branches) + ")"
+        return pattern + "?" if terminal else pattern
+
+    return build(trie)
+
+
+class IntentRouter:
+    """Single-pass, multi-pattern intent matcher over all keyword sets"""
+
+    def __init__(self, keyword_sets):
+        # keyword_sets: intent name -> iterable of keywords
+        owners = {}
+        for intent, keywords in keyword_sets.items():
+            for keyword in keywords:
+                keyword = " ".join(keyword.lower().split())
+                if keyword:
+                    owners.setdefault(keyword, set()).add(intent)
+        # Prefix semantics: a match on "tracking" also fires every intent
+        # owning "track", since the regex reports only the longest keyword
+        self.intents_by_keyword = {}
+        for keyword, intents in owners.items():
+            combined = set(intents)
+            for other, other_intents in owners.items():
+                if other != keyword and keyword.startswith(other):
+                    combined |= other_intents
+            self.intents_by_keyword[keyword] = frozenset(combined)
+        self.pattern = re.compile(NUMBER_GROUP + r"|\b(?P<keyword>" + _trie_pattern(owners) + ")")
+
+    def route(self, message):
+        """Normalize once and scan once, collecting every intent and order ID"""
+        text = " ".join(message.lower().split())
+        intents = set()
+        order_ids = []
+        matches = []
+        for match in self.pattern.finditer(text):
+            keyword = match.group("keyword")
+            if keyword is None:
+                order_ids.append(match.group("number"))
+            else:
+                matches.append(keyword)
+                intents |= self.intents_by_keyword[keyword]
+        return IntentResult(frozenset(intents), tuple(order_ids), tuple(matches))
+
+
+def build_intent_router(escalation_keywords):
+    """Router over the escalation, order, return, FAQ and product keyword sets"""
+    keyword_sets = {
+        "escalation": escalation_keywords,
+        "order_status": ORDER_STATUS_KEYWORDS,
+        "return_refund": RETURN_REFUND_KEYWORDS,
+        "product": PRODUCT_KEYWORDS,
+    }
+    for topic, keywords in FAQ_TOPIC_KEYWORDS.items():
+        keyword_sets["faq:" + topic] = keywords
+    return IntentRouter(keyword_sets)
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import logging
+import math
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+from config import (
+    FAQ_EMBEDDING_MIN_SIMILARITY,
+    FAQ_EMBEDDING_MODEL,
+    FAQ_MIN_CONFIDENCE,
+    FAQ_MIN_MARGIN,
+    KNOWLEDGE_BASE_PATH,
+)
+from retrieval import BM25Index, tokenize
+
+logger = logging.getLogger("chatbot.faq")
+
+# Term weights per entry field - the questions customers ask and the entry
+# title count more than words from the answer text
+FIELD_WEIGHTS = {"title": 2, "questions": 2, "text": 1}
+
+# Words that say nothing about the topic of a support question, comparisons
+# included ("COD for orders above 5000?" is answered by the COD limit)
+FILLER_WORDS = frozenset(
+    "happen now get got didn don doesn should would could will just also know above below under over than less more".split()
+)
+
+# A direct answer needs at least this many of the question's terms in the entry
+MIN_MATCHED_TERMS = 2
+
+# Questions asking what to do ("... What should I do?", "How do I claim
+# warranty?"); only entries asked that way themselves answer them
+ACTION_PATTERN = re.compile(r"\bwhat (?:should|can|do) i do\b|\bwhat are my options\b|\bhow (?:do|can) i (?!know\b)\w")
+
+# Thousands separators, so "₹5,000" and "5000" are the same term
+AMOUNT_SEPARATOR = re.compile(r"(?<=\d),(?=\d)")
+
+
+def plain_amounts(text):
+    return AMOUNT_SEPARATOR.sub("", text)
+
+
+def question_terms(text):
+    """Topic terms of a customer question"""
+    return [term for term in tokenize(plain_amounts(text)) if term not in FILLER_WORDS]
+
+
+def entry_terms(entry):
+    """Weighted term frequencies of a knowledge base entry"""
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        value = entry.get(field, "")
+        for text in ([value] if isinstance(value, str) else value):
+            for term in tokenize(plain_amounts(text)):
+                terms[term] += weight
+    return terms
+
+
+def answers_actions(entry):
+    """True when the entry is phrased as the answer to what-to-do questions"""
+    return any(ACTION_PATTERN.search(text.lower()) for text in [entry["title"]] + list(entry.get("questions", ())))
+
+
+def format_entry(entry):
+    """One KNOWLEDGEBASE line of the system prompt"""
+    return f"- {entry['title']}: {entry['text']}"
+
+
+def load_entries(path=KNOWLEDGE_BASE_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class EmbeddingIndex:
+    """
+    Sentence embeddings of every entry's title and questions, matched by
+    cosine similarity so paraphrases with no words in common still find
+    their entry. model is anything with a sentence-transformers style
+    encode(texts, normalize_embeddings=True).
+    """
+
+    def __init__(self, model, entries):
+        self.model = model
+        texts = []
+        owners = []
+        for entry_id, entry in enumerate(entries):
+            for text in [entry["title"]] + list(entry.get("questions", ())):
+                texts.append(text)
+                owners.append(entry_id)
+        self.owners = np.array(owners, dtype=np.int64)
+        self.vectors = self._encode(texts)
+
+    def _encode(self, texts):
+        return np.asarray(self.model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+    def search(self, question, k):
+        """Up to k (entry id, similarity) pairs, most similar first"""
+        similarities = self.vectors @ self._encode([question])[0]
+        best = {}
+        for position in np.argsort(-similarities):
+            entry_id = int(self.owners[position])
+            if entry_id not in best:
+                best[entry_id] = float(similarities[position])
+                if len(best) == k:
+                    break
+        return list(best.items())
+
+
+def load_embedding_model(name):
+    """A local sentence-transformers model, or None when the library is not installed"""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        logger.warning("FAQ_EMBEDDING_MODEL is set but sentence-transformers is not installed; using the lexical index only")
+        return None
+    return SentenceTransformer(name)
+
+
+class KnowledgeBase:
+    """
+    The support knowledge base as structured policy and Q/A entries, with a
+    BM25 index (and optionally an EmbeddingIndex) over them.
+
+    answer() returns an entry's canonical text when the question is covered
+    confidently: confidence is the IDF-weighted share of the question's
+    terms found in the best-ranked entry, with terms the knowledge base
+    never uses weighing the most, so "can I pay with bitcoin?" does not
+    borrow the COD answer. The best entry must also clearly outscore the
+    runner-up ("Can I cancel my order?" depends on whether it has shipped)
+    and answer what is asked - a policy statement is no answer to "What
+    should I do?". context() renders the entries most relevant to a
+    question for the system prompt.
+    """
+
+    def __init__(self, entries, embedding_model=None, min_confidence=FAQ_MIN_CONFIDENCE,
+                 min_similarity=FAQ_EMBEDDING_MIN_SIMILARITY, min_margin=FAQ_MIN_MARGIN):
+        self.entries = entries
+        self.index = BM25Index([entry_terms(entry) for entry in entries])
+        self.min_confidence = min_confidence
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.embeddings = EmbeddingIndex(embedding_model, entries) if embedding_model is not None else None
+        # IDF of a term in no entry at all
+        self.unknown_idf = math.log(1 + (len(entries) + 0.5) / 0.5)
+        payload = json.dumps(entries, sort_keys=True, ensure_ascii=False)
+        self.version = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+    def confidence(self, terms, entry_id):
+        """IDF-weighted share of terms that the entry contains"""
+        entry = self.index.doc_terms[entry_id]
+        total = matched = 0.0
+        for term in set(terms):
+            weight = self.index.idf(term) or self.unknown_idf
+            total += weight
+            if term in entry:
+                matched += weight
+        return matched / total if total else 0.0
+
+    def match(self, question):
+        """(entry, confidence) of the best lexical match, or (None, 0.0) when there is no clear one"""
+        hits = self.index.search(plain_amounts(question), 2)
+        if not hits or (len(hits) > 1 and hits[0][1] < self.min_margin * hits[1][1]):
+            return None, 0.0
+        entry_id = hits[0][0]
+        terms = question_terms(question)
+        if len(set(terms) & self.index.doc_terms[entry_id].keys()) < MIN_MATCHED_TERMS:
+            return None, 0.0
+        return self.entries[entry_id], self.confidence(terms, entry_id)
+
+    def answer(self, question):
+        """The canonical answer when one entry answers the question confidently, else None"""
+        action = bool(ACTION_PATTERN.search(question.lower()))
+        entry, confidence = self.match(question)
+        if entry is not None and confidence >= self.min_confidence and (not action or answers_actions(entry)):
+            return entry["text"]
+        if self.embeddings is not None:
+            hits = self.embeddings.search(question, 1)
+            if hits and hits[0][1] >= self.min_similarity:
+                entry = self.entries[hits[0][0]]
+                if not action or answers_actions(entry):
+                    return entry["text"]
+        return None
+
+    def search(self, question, k, fallback_question=None):
+        """
+        Ids of up to k entries relevant to the question, topped up from
+        fallback_question (the previous user turn) for follow-ups
+        """
+        selected = [entry_id for entry_id, _ in self.index.search(plain_amounts(question), k)]
+        if self.embeddings is not None and len(selected) < k:
+            selected.extend(
+                entry_id for entry_id, similarity in self.embeddings.search(question, k)
+                if similarity >= self.min_similarity and entry_id not in selected
+            )
+        if len(selected) < k and fallback_question:
+            selected.extend(
+                entry_id for entry_id, _ in self.index.search(plain_amounts(fallback_question), k)
+                if entry_id not in selected
+            )
+        return selected[:k]
+
+    def context(self, question, k, fallback_question=None):
+        """The relevant entries as KNOWLEDGEBASE lines, in knowledge base order"""
+        return "\n".join(format_entry(self.entries[i]) for i in sorted(self.search(question, k, fallback_question)))
+
+
+# Loaded once per process, shared by every session and rerun
+_knowledge_base = None
+_knowledge_base_lock = threading.Lock()
+
+
+def get_knowledge_base():
+    """The process-wide knowledge base from KNOWLEDGE_BASE_PATH"""
+    global _knowledge_base
+    if _knowledge_base is None:
+        with _knowledge_base_lock:
+            if _knowledge_base is None:
+                model = load_embedding_model(FAQ_EMBEDDING_MODEL) if FAQ_EMBEDDING_MODEL else None
+                _knowledge_base = KnowledgeBase(load_entries(), model)
+    return _knowledge_base
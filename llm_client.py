@@ -0,0 +1,160 @@
+import asyncio
+import random
+import threading
+import time
+
+from config import (
+    LLM_BASE_URL,
+    LLM_POOL_SIZE,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_CONNECT_TIMEOUT,
+    LLM_READ_TIMEOUT,
+    LLM_POOL_TIMEOUT,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+)
+
+# httpx and openai are imported on first use rather than at import time:
+# together they are most of the app's cold-start import cost
+
+# One client per provider (API key and base URL) per process, shared by
+# every Streamlit session and rerun
+_clients = {}  # (api_key, base_url) -> OpenAI client
+_client_lock = threading.Lock()
+_async_clients = {}  # (api_key, base_url) -> AsyncOpenAI client
+_prewarm_started = False
+
+
+def retryable_errors():
+    """
+    Errors worth another attempt - everything else (bad request, auth) fails fast.
+    APITimeoutError is a subclass of APIConnectionError.
+    """
+    import openai
+
+    return (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+def prewarm():
+    """Import the HTTP and OpenAI libraries on a background thread, once per process"""
+    global _prewarm_started
+    if _prewarm_started:
+        return
+    _prewarm_started = True
+    threading.Thread(target=retryable_errors, name="llm-prewarm", daemon=True).start()
+
+
+def build_http_client():
+    """Create the pooled keep-alive HTTP client the OpenAI client runs on"""
+    import httpx
+
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=LLM_POOL_SIZE,
+            max_keepalive_connections=LLM_POOL_SIZE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=build_timeout(),
+    )
+
+
+def build_async_http_client():
+    """Async counterpart of build_http_client for the asyncio gateway"""
+    import httpx
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_POOL_SIZE,
+            max_keepalive_connections=LLM_POOL_SIZE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=build_timeout(),
+    )
+
+
+def build_timeout():
+    """Connect/read/pool timeouts so a stalled upstream can't hang a session"""
+    import httpx
+
+    return httpx.Timeout(
+        LLM_READ_TIMEOUT,
+        connect=LLM_CONNECT_TIMEOUT,
+        pool=LLM_POOL_TIMEOUT,
+    )
+
+
+def get_client(api_key, base_url=LLM_BASE_URL):
+    """Return the process-wide OpenAI client for a provider, creating it on first use"""
+    key = (api_key, base_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _client_lock:
+        # Another thread may have built it while we waited for the lock
+        client = _clients.get(key)
+        if client is None:
+            import openai
+
+            client = _clients[key] = openai.OpenAI(
+                api_key=api_key,
+                base_url=base_url or None,
+                http_client=build_http_client(),
+                timeout=build_timeout(),
+                # Retries are handled by with_retries so the policy is ours
+                max_retries=0,
+            )
+        return client
+
+
+def get_async_client(api_key, base_url=LLM_BASE_URL):
+    """
+    Return the process-wide AsyncOpenAI client for a provider, creating it on first use.
+
+    Async connections are bound to the event loop that opened them, so this
+    must only be called from the gateway's loop.
+    """
+    key = (api_key, base_url)
+    client = _async_clients.get(key)
+    if client is None:
+        import openai
+
+        client = _async_clients[key] = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url or None,
+            http_client=build_async_http_client(),
+            timeout=build_timeout(),
+            max_retries=0,
+        )
+    return client
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given retry attempt (0-based)"""
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def with_retries(call):
+    """Run call(), retrying transient API errors up to LLM_MAX_RETRIES times"""
+    attempt = 0
+    while True:
+        try:
+            return call()
+        except retryable_errors():
+            if attempt >= LLM_MAX_RETRIES:
+                raise
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+
+
+async def with_retries_async(call):
+    """Await call(), retrying transient API errors up to LLM_MAX_RETRIES times"""
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except retryable_errors():
+            if attempt >= LLM_MAX_RETRIES:
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
@@ -0,0 +1,348 @@
+import asyncio
+import hashlib
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+from config import (
+    GATEWAY_MAX_CONCURRENCY,
+    GATEWAY_MAX_QUEUE,
+    GATEWAY_QUEUE_TIMEOUT,
+    LLM_BASE_URL,
+    LLM_READ_TIMEOUT,
+)
+from llm_client import get_async_client, with_retries_async
+from metrics import METRICS
+
+_END = object()
+_LEFT = object()
+
+
+class GatewayOverloaded(Exception):
+    """The request queue is full or the request waited too long for a slot"""
+
+
+class FairLimiter:
+    """
+    Global concurrency limit with a per-session round-robin wait queue.
+
+    A session that fires many requests only ever gets its turn in the
+    rotation, so it can't starve the others, and the total number of waiting
+    requests is bounded so overload turns into fast rejections instead of an
+    ever-growing backlog. Only used from the gateway's event loop.
+    """
+
+    def __init__(self, max_concurrency, max_queue):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.queued = 0
+        self._waiters = OrderedDict()  # session_id -> deque of futures
+
+    async def acquire(self, session_id, timeout):
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            return
+        if self.queued >= self.max_queue:
+            raise GatewayOverloaded("Too many requests are waiting for the language model")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(session_id, deque()).append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # The slot was handed over just as we timed out - keep it
+                return
+            self._remove(session_id, waiter)
+            raise GatewayOverloaded("Timed out waiting for a language model slot")
+        except asyncio.CancelledError:
+            # Nobody wants the call any more: pass on a slot that was just
+            # handed over, or leave the queue
+            if waiter.done():
+                self.release()
+            else:
+                self._remove(session_id, waiter)
+            raise
+
+    def release(self):
+        # Hand the slot straight to the next session in the rotation
+        while self._waiters:
+            session_id, waiters = next(iter(self._waiters.items()))
+            waiter = waiters.popleft()
+            del self._waiters[session_id]
+            if waiters:
+                self._waiters[session_id] = waiters
+            self.queued -= 1
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _remove(self, session_id, waiter):
+        waiters = self._waiters.get(session_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self.queued -= 1
+            if not waiters:
+                del self._waiters[session_id]
+
+
+class _Flight:
+    """One upstream call whose output is fanned out to every subscriber"""
+
+    def __init__(self):
+        self.chunks = []
+        self.subscribers = []
+        self.done = False
+        self.error = None
+        self.task = None
+
+    def subscribe(self, subscriber):
+        # Late joiners first receive everything produced so far
+        for chunk in self.chunks:
+            subscriber.put(chunk)
+        if self.done:
+            subscriber.put(self.error or _END)
+        else:
+            self.subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+    def publish(self, chunk):
+        self.chunks.append(chunk)
+        for subscriber in self.subscribers:
+            subscriber.put(chunk)
+
+    def finish(self, error=None):
+        self.done = True
+        self.error = error
+        for subscriber in self.subscribers:
+            subscriber.put(error or _END)
+        self.subscribers = []
+
+
+class Subscription:
+    """
+    Blocking iterator over one caller's share of an in-flight call.
+
+    cancel() (or close()) from any thread stops the iteration and leaves the
+    call; once its last subscriber has left, the gateway cancels the
+    upstream request and frees its concurrency slot.
+    """
+
+    def __init__(self, gateway, key, wait):
+        self.gateway = gateway
+        self.key = key
+        self.wait = wait
+        self.queue = queue.Queue()
+        self.finished = False
+
+    def __iter__(self):
+        while not self.finished:
+            try:
+                item = self.queue.get(timeout=self.wait)
+            except queue.Empty:
+                self.cancel()
+                raise GatewayOverloaded("Timed out waiting for the language model")
+            if item is _LEFT:
+                return
+            if item is _END:
+                self.finished = True
+                return
+            if isinstance(item, BaseException):
+                self.finished = True
+                raise item
+            yield item
+
+    def cancel(self):
+        if self.finished:
+            return
+        self.finished = True
+        self.queue.put(_LEFT)
+        self.gateway.loop.call_soon_threadsafe(self.gateway._leave, self.key, self.queue)
+
+    close = cancel
+
+
+def request_key(messages, model, temperature, max_tokens, stream, base_url=LLM_BASE_URL, api_key=None, attempt=0):
+    """
+    Identical requests from the same client (endpoint and API key) share a
+    key and therefore one upstream call. A hedged attempt gets its own key so
+    it is not folded into the call it backs up.
+    """
+    # A fingerprint tells the clients apart without keeping the secret around
+    key_id = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16] if api_key else None
+    payload = json.dumps([base_url, key_id, attempt, model, temperature, max_tokens, stream, messages], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMGateway:
+    """
+    Process-wide asyncio gateway that every session's LLM calls go through.
+
+    It runs its own event loop on a daemon thread. Requests are limited by a
+    FairLimiter, identical in-flight requests are coalesced into one upstream
+    call, and complete()/stream() give synchronous callers (Streamlit script
+    threads) a blocking interface.
+    """
+
+    def __init__(self, max_concurrency=GATEWAY_MAX_CONCURRENCY, max_queue=GATEWAY_MAX_QUEUE,
+                 queue_timeout=GATEWAY_QUEUE_TIMEOUT):
+        self.queue_timeout = queue_timeout
+        self.limiter = FairLimiter(max_concurrency, max_queue)
+        self._flights = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.errors = 0
+        self.abandoned = 0
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="llm-gateway", daemon=True)
+        self._thread.start()
+
+    def _join(self, key, session_id, call, subscriber):
+        """Attach a subscriber to the in-flight call for key, starting it if needed (loop thread)"""
+        self.requests += 1
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        else:
+            flight = self._flights[key] = _Flight()
+            flight.task = self.loop.create_task(self._run(key, flight, session_id, call))
+        flight.subscribe(subscriber)
+
+    def _leave(self, key, subscriber):
+        """Detach a subscriber; cancel the upstream call once nobody is left (loop thread)"""
+        flight = self._flights.get(key)
+        if flight is None:
+            return
+        flight.unsubscribe(subscriber)
+        if not flight.subscribers and not flight.done:
+            self.abandoned += 1
+            # New identical requests start afresh instead of joining the cancelled call
+            del self._flights[key]
+            flight.task.cancel()
+
+    def _drop(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def _run(self, key, flight, session_id, call):
+        enqueued = time.monotonic()
+        try:
+            await self.limiter.acquire(session_id, self.queue_timeout)
+        except GatewayOverloaded as e:
+            self.rejected += 1
+            self._drop(key, flight)
+            flight.finish(e)
+            return
+        except asyncio.CancelledError:
+            self._drop(key, flight)
+            flight.finish()
+            raise
+        started = time.monotonic()
+        METRICS.observe("gateway_queue_wait", started - enqueued)
+        try:
+            async for chunk in call():
+                flight.publish(chunk)
+            flight.finish()
+        except asyncio.CancelledError:
+            flight.finish()
+            raise
+        except Exception as e:
+            self.errors += 1
+            flight.finish(e)
+        finally:
+            self.limiter.release()
+            METRICS.observe("gateway_upstream", time.monotonic() - started)
+            # Later identical requests start a fresh call rather than replaying this one
+            self._drop(key, flight)
+
+    def _subscribe(self, key, session_id, call):
+        """Submit from any thread and return the Subscription the output arrives on"""
+        # Bound each wait so a wedged upstream can't block a script thread forever
+        subscription = Subscription(self, key, self.queue_timeout + LLM_READ_TIMEOUT)
+        self.loop.call_soon_threadsafe(self._join, key, session_id, call, subscription.queue)
+        return subscription
+
+    def stream(self, messages, api_key, model, temperature, max_tokens, session_id=None,
+               base_url=LLM_BASE_URL, attempt=0):
+        """Blocking Subscription yielding response deltas"""
+        async def call():
+            client = get_async_client(api_key, base_url)
+            response = await with_retries_async(lambda: client.chat.completions.create(
+                model=model, messages=messages, temperature=temperature,
+                max_tokens=max_tokens, stream=True,
+            ))
+            try:
+                async for chunk in response:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        yield delta
+            finally:
+                # Also on cancellation - don't leave the connection streaming
+                await response.close()
+
+        key = request_key(messages, model, temperature, max_tokens, True, base_url, api_key, attempt)
+        return self._subscribe(key, session_id, call)
+
+    def complete(self, messages, api_key, model, temperature, max_tokens, session_id=None,
+                 base_url=LLM_BASE_URL, attempt=0):
+        """Blocking call returning the full response text"""
+        return "".join(self.submit_complete(
+            messages, api_key, model, temperature, max_tokens, session_id, base_url, attempt,
+        ))
+
+    def submit_complete(self, messages, api_key, model, temperature, max_tokens, session_id=None,
+                        base_url=LLM_BASE_URL, attempt=0):
+        """Subscription yielding the full response text once, so the caller can cancel() while it waits"""
+        async def call():
+            client = get_async_client(api_key, base_url)
+            response = await with_retries_async(lambda: client.chat.completions.create(
+                model=model, messages=messages, temperature=temperature, max_tokens=max_tokens,
+            ))
+            if response.usage is not None:
+                METRICS.increment("llm_tokens", response.usage.prompt_tokens, kind="prompt", source="api")
+                METRICS.increment("llm_tokens", response.usage.completion_tokens, kind="completion", source="api")
+            yield response.choices[0].message.content or ""
+
+        key = request_key(messages, model, temperature, max_tokens, False, base_url, api_key, attempt)
+        return self._subscribe(key, session_id, call)
+
+    def stats(self):
+        """Counters plus queue-wait and upstream latency percentiles (seconds)"""
+        waits = METRICS.histogram("gateway_queue_wait") or {"p50": 0.0, "p95": 0.0}
+        latencies = METRICS.histogram("gateway_upstream") or {"p50": 0.0, "p95": 0.0}
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "abandoned": self.abandoned,
+            "active": self.limiter.active,
+            "queued": self.limiter.queued,
+            "queue_wait_p50": waits["p50"],
+            "queue_wait_p95": waits["p95"],
+            "latency_p50": latencies["p50"],
+            "latency_p95": latencies["p95"],
+        }
+
+
+# One gateway per process, shared by every Streamlit session and rerun
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Return the process-wide gateway, starting its event loop on first use"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
@@ -0,0 +1,109 @@
+import sys
+import zlib
+from collections import deque
+
+from config import SESSION_MAX_MESSAGES, SESSION_PLAIN_MESSAGES, SESSION_COMPRESS_MIN_CHARS
+
+# Roles are interned so every message shares one string per role
+ROLES = {role: sys.intern(role) for role in ("user", "assistant", "system")}
+
+
+class Message:
+    """
+    One chat message in a compact record.
+
+    Reads like a {"role", "content"} dict (message["content"]) so the engine,
+    history and UI code work on it unchanged. Long older messages are kept
+    zlib-compressed and inflated on access.
+    """
+
+    __slots__ = ("role", "_text")
+
+    def __init__(self, role, content):
+        self.role = ROLES.get(role) or sys.intern(role)
+        self._text = content
+
+    @property
+    def content(self):
+        text = self._text
+        return zlib.decompress(text).decode("utf-8") if isinstance(text, bytes) else text
+
+    def __getitem__(self, key):
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def compress(self, min_chars):
+        """Store the text compressed when that makes it smaller"""
+        text = self._text
+        if isinstance(text, str) and len(text) >= min_chars:
+            packed = zlib.compress(text.encode("utf-8"), 6)
+            if len(packed) < len(text):
+                self._text = packed
+
+    def to_dict(self):
+        return {"role": self.role, "content": self.content}
+
+    def size(self):
+        """Approximate bytes held by this record"""
+        return sys.getsizeof(self) + sys.getsizeof(self._text)
+
+
+class MessageLog:
+    """
+    Bounded message history of one session.
+
+    A ring buffer of Message records: beyond max_messages the oldest are
+    dropped (dropped counts them, so absolute positions stay known), and all
+    but the last plain_messages are compressed once they grow past
+    compress_min_chars. Behaves like a list of message dicts for reading and
+    appending.
+    """
+
+    def __init__(self, messages=(), dropped=0, max_messages=SESSION_MAX_MESSAGES,
+                 plain_messages=SESSION_PLAIN_MESSAGES, compress_min_chars=SESSION_COMPRESS_MIN_CHARS):
+        self.records = deque(maxlen=max_messages if max_messages > 0 else None)
+        self.dropped = dropped
+        self.plain_messages = plain_messages
+        self.compress_min_chars = compress_min_chars
+        for message in messages:
+            self.append(message)
+
+    def append(self, message):
+        records = self.records
+        if records.maxlen is not None and len(records) == records.maxlen:
+            self.dropped += 1
+        records.append(Message(message["role"], message["content"]))
+        # The message leaving the plain window is compressed once, here
+        if self.compress_min_chars > 0 and len(records) > self.plain_messages:
+            records[-self.plain_messages - 1].compress(self.compress_min_chars)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self.records)[index]
+        return self.records[index]
+
+    def __bool__(self):
+        return bool(self.records)
+
+    def to_list(self):
+        """Plain message dicts, oldest first"""
+        return [message.to_dict() for message in self.records]
+
+    def size(self):
+        """Approximate bytes held by the log and its messages"""
+        return sys.getsizeof(self) + sys.getsizeof(self.records) + sum(message.size() for message in self.records)
@@ -0,0 +1,205 @@
+import bisect
+import json
+import logging
+import logging.handlers
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import (
+    METRICS_PORT,
+    METRICS_JSONL_PATH,
+    METRICS_JSONL_MAX_BYTES,
+    METRICS_EXPORT_INTERVAL,
+)
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond Python work
+# up to slow LLM generations
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+METRIC_PREFIX = "chatbot_"
+
+
+class Histogram:
+    """Fixed-bucket histogram - O(log buckets) per observation, constant memory"""
+
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def percentile(self, q):
+        """Estimate a percentile by interpolating inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                low = self.bounds[i - 1] if i > 0 else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return low + (high - low) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": (self.total / self.count) if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+
+class MetricsRegistry:
+    """In-process counters and latency histograms, keyed by name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, label key) -> Histogram
+        self._counters = {}  # (name, label key) -> number
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time the enclosed block on the monotonic clock"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def histogram(self, name, **labels):
+        """Summary of one histogram, or None if nothing was observed"""
+        with self._lock:
+            histogram = self._histograms.get((name, _label_key(labels)))
+            return histogram.summary() if histogram else None
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def snapshot(self):
+        """Plain-dict view of every metric, for the sidebar and the JSONL exporter"""
+        with self._lock:
+            return {
+                "histograms": [
+                    dict(name=name, labels=dict(key), **histogram.summary())
+                    for (name, key), histogram in sorted(self._histograms.items())
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(key), "value": value}
+                    for (name, key), value in sorted(self._counters.items())
+                ],
+            }
+
+    def prometheus_text(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, key), value in sorted(self._counters.items()):
+                metric = METRIC_PREFIX + name + "_total"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{metric}{_format_labels(key)} {value}")
+            for (name, key), histogram in sorted(self._histograms.items()):
+                metric = METRIC_PREFIX + name + "_seconds"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} histogram")
+                    typed.add(metric)
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.bounds, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f"{metric}_bucket{_format_labels(key, ('le', bound))} {cumulative}")
+                lines.append(f"{metric}_bucket{_format_labels(key, ('le', '+Inf'))} {histogram.count}")
+                lines.append(f"{metric}_sum{_format_labels(key)} {histogram.total}")
+                lines.append(f"{metric}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# One registry per process, shared by every session
+METRICS = MetricsRegistry()
+
+
+class _PrometheusHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = METRICS.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _export_jsonl(path):
+    """Append a metrics snapshot every METRICS_EXPORT_INTERVAL seconds, rotating the file"""
+    logger = logging.getLogger("chatbot.metrics")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.handlers.RotatingFileHandler(path, maxBytes=METRICS_JSONL_MAX_BYTES, backupCount=3))
+    while True:
+        time.sleep(METRICS_EXPORT_INTERVAL)
+        logger.info(json.dumps({"ts": time.time(), **METRICS.snapshot()}))
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters():
+    """Start the configured exporters once per process (safe to call on every rerun)"""
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+        if METRICS_PORT:
+            server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), _PrometheusHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        if METRICS_JSONL_PATH:
+            threading.Thread(target=_export_jsonl, args=(METRICS_JSONL_PATH,), name="metrics-jsonl", daemon=True).start()
@@ -0,0 +1,438 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    GATEWAY_ENABLED,
+    GATEWAY_QUEUE_TIMEOUT,
+    LLM_BREAKER_COOLDOWN,
+    LLM_BREAKER_FAILURES,
+    LLM_HEDGE_DELAY,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_LARGE_MAX_TOKENS,
+    LLM_LARGE_MODEL,
+    LLM_PROVIDERS,
+    LLM_READ_TIMEOUT,
+    LLM_SMALL_MAX_TOKENS,
+    LLM_SMALL_MODEL,
+    LLM_TEMPERATURE,
+)
+from llm_client import get_client, with_retries
+from llm_gateway import GatewayOverloaded, get_gateway
+from metrics import METRICS
+
+logger = logging.getLogger("chatbot.llm")
+
+# Tier name -> (default model, max_tokens); a failing tier falls back to the others in this order
+TIERS = OrderedDict([
+    ("large", (LLM_LARGE_MODEL, LLM_LARGE_MAX_TOKENS)),
+    ("small", (LLM_SMALL_MODEL, LLM_SMALL_MAX_TOKENS)),
+])
+
+# Matched product keywords that make a question open-ended advice
+CONSULTATIVE_KEYWORDS = {"recommend", "suggest", "compare", "best", "gaming"}
+
+# Messages longer than this many words are treated as open-ended
+SIMPLE_MAX_WORDS = 12
+
+_END = object()
+
+
+class NoProviderAvailable(Exception):
+    """Every provider that could serve the request has its circuit open"""
+
+
+def choose_tier(message, intent):
+    """'small' for FAQ, order and lookup questions, 'large' for open-ended product advice"""
+    long_message = len(message.split()) > SIMPLE_MAX_WORDS
+    if intent.product_query:
+        if long_message or CONSULTATIVE_KEYWORDS.intersection(intent.matches):
+            return "large"
+        return "small"
+    if intent.faq_topics or intent.order_status or intent.return_refund:
+        return "small"
+    return "large" if long_message else "small"
+
+
+class CircuitBreaker:
+    """
+    Closed while a provider works. failure_threshold consecutive failures
+    open it and requests skip the provider; after cooldown a single probe
+    is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold=LLM_BREAKER_FAILURES, cooldown=LLM_BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened = 0  # times the circuit has opened
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a request may go to the provider now"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state = "half_open"
+                self._probing = False
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    def release(self):
+        """A request was abandoned without an outcome - let another probe through"""
+        with self._lock:
+            self._probing = False
+
+
+class Provider:
+    """One OpenAI-compatible endpoint with its models per tier and its own circuit breaker"""
+
+    def __init__(self, name, base_url="", api_key=None, models=None, breaker=None):
+        self.name = name
+        self.base_url = base_url
+        self._api_key = api_key
+        self.models = models or {tier: model for tier, (model, _) in TIERS.items()}
+        self.breaker = breaker or CircuitBreaker()
+
+    def api_key(self):
+        # Read per call: Streamlit exports its secrets to the environment on first run
+        env_name = self.name.upper().replace("-", "_") + "_API_KEY"
+        return self._api_key or os.environ.get(env_name) or "no key"
+
+    def stats(self):
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "times_opened": self.breaker.opened,
+        }
+
+
+def parse_providers(spec=LLM_PROVIDERS):
+    """Providers from a comma-separated list of name=base_url entries"""
+    providers = []
+    for entry in spec.split(","):
+        name, _, base_url = entry.strip().partition("=")
+        if name.strip():
+            providers.append(Provider(name.strip(), base_url.strip()))
+    return providers
+
+
+def record_token_usage(usage):
+    """Add the token usage reported by the API to the metrics"""
+    if usage is not None:
+        METRICS.increment("llm_tokens", usage.prompt_tokens, kind="prompt", source="api")
+        METRICS.increment("llm_tokens", usage.completion_tokens, kind="completion", source="api")
+
+
+class _Attempt:
+    """
+    One upstream call, pumped into the shared result queue from its own
+    thread. Cancelling it also cancels a gateway subscription, so a lost
+    hedge or an abandoned call gives its upstream slot back at once.
+    """
+
+    def __init__(self, provider, tier, start, results):
+        self.provider = provider
+        self.tier = tier
+        self.cancelled = False
+        self.started = time.monotonic()
+        self._deltas = None
+        threading.Thread(target=self._pump, args=(start, results), name="llm-attempt", daemon=True).start()
+
+    def _pump(self, start, results):
+        try:
+            deltas = self._deltas = start()
+            if self.cancelled:
+                # Cancelled while the call was being submitted
+                self._cancel_deltas()
+            try:
+                for delta in deltas:
+                    if self.cancelled:
+                        return
+                    results.put((self, delta))
+            finally:
+                close = getattr(deltas, "close", None)
+                if close is not None:
+                    close()
+            results.put((self, _END))
+        except Exception as e:
+            results.put((self, e))
+
+    def cancel(self):
+        self.cancelled = True
+        self._cancel_deltas()
+
+    def _cancel_deltas(self):
+        cancel = getattr(self._deltas, "cancel", None)
+        if cancel is not None:
+            cancel()
+
+
+class ModelRouter:
+    """
+    Sends each request to a model tier on the first healthy provider.
+
+    Providers are tried in registry order and skipped while their circuit
+    is open; a failing attempt falls through to the next provider, then to
+    the other tier. A request still waiting for its first token after the
+    provider's p95 first-token latency (for complete(), its p95 time to the
+    full response) is hedged with a second attempt at the same tier, on
+    another provider when one is healthy, and the first to answer wins.
+    Requests go through the LLM gateway when it is enabled.
+    """
+
+    def __init__(self, providers=()):
+        self.providers = OrderedDict()
+        for provider in providers:
+            self.register(provider)
+
+    def register(self, provider):
+        """Add or replace a provider; new providers are tried after the existing ones"""
+        self.providers[provider.name] = provider
+        return provider
+
+    def plan(self, tier, provider=None):
+        """(provider, tier) pairs in fallback order: the tier on every provider, then the other tiers"""
+        providers = [self.providers[provider]] if provider else list(self.providers.values())
+        tiers = [tier] + [t for t in TIERS if t != tier]
+        return [(p, t) for t in tiers for p in providers if t in p.models]
+
+    def hedge_delay(self, provider, tier, metric="llm_first_token"):
+        """
+        Seconds to wait for an answer before hedging: the observed p95 of the
+        call mode's latency histogram, once there are enough samples
+        """
+        summary = METRICS.histogram(metric, provider=provider.name, tier=tier)
+        if summary and summary["count"] >= LLM_HEDGE_MIN_SAMPLES:
+            return summary["p95"]
+        return LLM_HEDGE_DELAY
+
+    def stream(self, messages, tier="large", session_id=None, provider=None):
+        """
+        Blocking generator of response deltas from the first provider to answer.
+
+        Raises NoProviderAvailable when every candidate's circuit is open, or
+        the last attempt's error when they all failed.
+        """
+        def start(candidate, candidate_tier, attempt):
+            model, max_tokens = candidate.models[candidate_tier], TIERS[candidate_tier][1]
+            if GATEWAY_ENABLED:
+                return get_gateway().stream(
+                    messages, candidate.api_key(), model, LLM_TEMPERATURE, max_tokens,
+                    session_id=session_id, base_url=candidate.base_url, attempt=attempt,
+                )
+            return _direct_stream(candidate, model, max_tokens, messages)
+
+        return self._race(self.plan(tier, provider), start, "llm_first_token")
+
+    def complete(self, messages, tier="large", session_id=None, provider=None):
+        """Blocking call returning the full response text; raises like stream()"""
+        def start(candidate, candidate_tier, attempt):
+            model, max_tokens = candidate.models[candidate_tier], TIERS[candidate_tier][1]
+            if GATEWAY_ENABLED:
+                return get_gateway().submit_complete(
+                    messages, candidate.api_key(), model, LLM_TEMPERATURE, max_tokens,
+                    session_id=session_id, base_url=candidate.base_url, attempt=attempt,
+                )
+            return _direct_complete(candidate, model, max_tokens, messages)
+
+        # A completion arrives whole, so its latency is timed apart from first tokens
+        return "".join(self._race(self.plan(tier, provider), start, "llm_complete"))
+
+    def _race(self, plan, start, metric):
+        """
+        Run the plan's attempts - falling back on errors, hedging on slowness -
+        and yield the winner's deltas; the winner's wait for its first delta
+        is observed in the metric histogram
+        """
+        results = queue.Queue()
+        pending = list(plan)
+        running = []
+        launched = []
+
+        def launch(candidate=None):
+            while candidate is None and pending:
+                candidate = pending.pop(0)
+                if not candidate[0].breaker.allow():
+                    METRICS.increment("llm_circuit_skips", provider=candidate[0].name)
+                    candidate = None
+            if candidate is None:
+                return None
+            provider, tier = candidate
+            number = sum(1 for attempt in launched if attempt.provider is provider)
+            attempt = _Attempt(provider, tier, lambda: start(provider, tier, number), results)
+            running.append(attempt)
+            launched.append(attempt)
+            return attempt
+
+        def hedge_target(first):
+            """
+            The same tier on another healthy provider, else on the slow one
+            again - never another tier, which would quietly swap the answer
+            for a smaller model's; tiers only fall back on errors
+            """
+            for index, candidate in enumerate(pending):
+                if candidate[1] == first.tier and candidate[0].breaker.allow():
+                    return pending.pop(index)
+            if first.provider.breaker.allow():
+                return first.provider, first.tier
+            return None
+
+        if launch() is None:
+            raise NoProviderAvailable("Every language model provider is unavailable")
+        # Bound each wait so a wedged upstream can't block the caller forever
+        wait_limit = LLM_READ_TIMEOUT + GATEWAY_QUEUE_TIMEOUT
+        hedged = not LLM_HEDGE_ENABLED
+        winner = None
+        while winner is None:
+            hedge_at = None
+            if not hedged:
+                first = running[0]
+                hedge_at = first.started + self.hedge_delay(first.provider, first.tier, metric)
+            timeout = wait_limit if hedge_at is None else min(wait_limit, max(0.0, hedge_at - time.monotonic()))
+            try:
+                attempt, item = results.get(timeout=timeout)
+            except queue.Empty:
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedged = True
+                    target = hedge_target(running[0])
+                    if target is not None:
+                        hedge = launch(target)
+                        METRICS.increment("llm_hedges", provider=hedge.provider.name)
+                    continue
+                for attempt in running:
+                    attempt.cancel()
+                    attempt.provider.breaker.record_failure()
+                raise TimeoutError("No language model answered in time")
+            if attempt.cancelled:
+                continue
+            if isinstance(item, BaseException):
+                running.remove(attempt)
+                METRICS.increment("llm_attempt_errors", provider=attempt.provider.name)
+                logger.warning("%s (%s tier) failed: %s", attempt.provider.name, attempt.tier, item)
+                if isinstance(item, GatewayOverloaded):
+                    # Local overload says nothing about the provider's health
+                    attempt.provider.breaker.release()
+                else:
+                    attempt.provider.breaker.record_failure()
+                if not running and launch() is None:
+                    raise item
+                continue
+            winner = attempt
+
+        for attempt in running:
+            if attempt is not winner:
+                attempt.cancel()
+                attempt.provider.breaker.release()
+        METRICS.observe(metric, time.monotonic() - winner.started,
+                        provider=winner.provider.name, tier=winner.tier)
+        METRICS.increment("llm_calls", provider=winner.provider.name, tier=winner.tier)
+
+        def next_delta():
+            # Late output of cancelled attempts is skipped
+            while True:
+                attempt, item = results.get(timeout=wait_limit)
+                if attempt is winner:
+                    return item
+
+        finished = False
+        try:
+            while item is not _END:
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+                try:
+                    item = next_delta()
+                except queue.Empty:
+                    raise TimeoutError("The language model stopped responding")
+            winner.provider.breaker.record_success()
+            finished = True
+        except Exception:
+            winner.provider.breaker.record_failure()
+            finished = True
+            raise
+        finally:
+            if not finished:
+                # The caller stopped reading - drop the call without judging the provider
+                winner.cancel()
+                winner.provider.breaker.release()
+
+    def stats(self):
+        return {name: provider.stats() for name, provider in self.providers.items()}
+
+
+def _direct_stream(provider, model, max_tokens, messages):
+    """Stream deltas straight from the provider's pooled client"""
+    client = get_client(provider.api_key(), provider.base_url)
+    # Only opening the stream is retried - a partly shown answer is not replayed
+    stream = with_retries(lambda: client.chat.completions.create(
+        model=model, messages=messages, temperature=LLM_TEMPERATURE,
+        max_tokens=max_tokens, stream=True,
+    ))
+    try:
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+    finally:
+        stream.close()
+
+
+def _direct_complete(provider, model, max_tokens, messages):
+    """Full response straight from the provider's pooled client, as a single delta"""
+    client = get_client(provider.api_key(), provider.base_url)
+    response = with_retries(lambda: client.chat.completions.create(
+        model=model, messages=messages, temperature=LLM_TEMPERATURE, max_tokens=max_tokens,
+    ))
+    record_token_usage(response.usage)
+    yield response.choices[0].message.content or ""
+
+
+# One router per process so circuit breakers and latency samples are shared
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Return the process-wide router over the configured providers"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter(parse_providers())
+    return _router
+
+
+def set_router(router):
+    """Replace the process-wide router, e.g. with one over local stand-in providers"""
+    global _router
+    with _router_lock:
+        _router = router
@@ -0,0 +1,379 @@
+import bisect
+import math
+import re
+
+import numpy as np
+
+from product_query import COLOR_ALIASES, _normalize, format_product_line
+from retrieval import STOPWORDS
+from review_aspects import strip_aspect_phrases
+
+# Lowest trigram similarity (Jaccard) at which a misspelt word still matches
+MIN_SIMILARITY = 0.5
+
+# Words shorter than this only ever match exactly - their few trigrams
+# make fuzzy matches unreliable
+MIN_FUZZY_LENGTH = 4
+
+# A name stays in the result when it scores at least this share of the best
+# name carrying the same anchor word
+RELATIVE_SCORE = 0.75
+
+# Name words outside the brand/type/color attributes (model names, series)
+# anchor a mention when at most this share of names contain them
+ANCHOR_MAX_SHARE = 0.5
+
+PRICE_PATTERN = re.compile(r"\b(?:price[sd]?|costs?|how much|mrp)\b")
+DETAIL_PATTERN = re.compile(r"\b(?:details?|specs?|specifications?|features?)\b")
+
+
+def trigrams(word):
+    """Character trigrams of a word, padded so its start and end count too"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def name_words(text):
+    """Indexable words of already-normalized text"""
+    words = []
+    for word in re.findall(r"[a-z0-9]+", text):
+        word = COLOR_ALIASES.get(word, word)
+        if len(word) >= 3 and word not in STOPWORDS:
+            words.append(word)
+    return words
+
+
+class NameResolver:
+    """
+    Resolves loose product mentions ("the grey pTron ones", "skulcandy truly
+    wireless") to ranked product ids.
+
+    Distinct product names are split into words; a character-trigram index
+    over that word vocabulary matches misspelt message words, and word ->
+    name postings score names by the IDF-weighted similarity of the words
+    they share with the message. A mention needs an anchor - a brand word,
+    or a rarer name word outside the brand/type/color attributes - so
+    generic questions ("wireless headphones with good bass") resolve to
+    nothing. A lookup touches the trigram postings of the message's words
+    and the name postings of the matched words, not the whole catalog.
+
+    product_ids, names and popularity (rating counts, the tiebreak) are
+    aligned lists; vocabularies are the table's brand/type/color values. A
+    catalog reload patches the index with updated() rather than rebuilding
+    it, and export() flattens it for MappedNameResolver.
+    """
+
+    def __init__(self, product_ids, names, vocabularies, popularity):
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        self.name_ids = {}  # normalized name -> name id
+        self.name_keys = []  # name id -> normalized name, None once no product carries it
+        self.name_products = []  # name id -> ids of the products carrying it
+        self.product_names = {}  # product id -> name id
+        self.popularity = np.zeros(0, dtype=np.int64)  # indexed by product id
+        self.word_ids = {}
+        self.words = []
+        self.word_names = []  # word id -> ids of the names containing it
+        self.word_counts = np.zeros(0, dtype=np.int64)  # word id -> number of those names
+        self.trigram_words = {}  # trigram -> ids of the words containing it
+        self.trigram_counts = np.zeros(0, dtype=np.int32)
+        self.name_count = 0
+        self._set_vocabularies(vocabularies)
+        self._apply(zip(product_ids.tolist(), names, np.asarray(popularity).tolist()), ())
+
+    def _set_vocabularies(self, vocabularies):
+        self.brand_words = {w for value in vocabularies["brand"] for w in name_words(_normalize(value))}
+        self.attribute_words = {
+            w for values in vocabularies.values() for value in values for w in name_words(_normalize(value))
+        }
+
+    def updated(self, added, removed, vocabularies):
+        """
+        New resolver with added (product id, name, popularity) triples indexed
+        and removed product ids dropped; only the names and words they touch
+        are re-tokenized. Name ids of names no product carries any more are
+        not reused until the next full build.
+        """
+        resolver = NameResolver.__new__(NameResolver)
+        resolver.name_ids = dict(self.name_ids)
+        resolver.name_keys = list(self.name_keys)
+        resolver.name_products = list(self.name_products)
+        resolver.product_names = dict(self.product_names)
+        resolver.popularity = self.popularity
+        resolver.word_ids = dict(self.word_ids)
+        resolver.words = list(self.words)
+        resolver.word_names = list(self.word_names)
+        resolver.word_counts = self.word_counts
+        resolver.trigram_words = dict(self.trigram_words)
+        resolver.trigram_counts = self.trigram_counts
+        resolver.name_count = self.name_count
+        resolver._set_vocabularies(vocabularies)
+        resolver._apply(added, removed)
+        return resolver
+
+    def _apply(self, added, removed):
+        """Index added triples and drop removed ids, replacing - never mutating - the shared arrays and tuples"""
+        leaving = {}  # word id -> name ids no longer containing it
+        joining = {}  # word id -> name ids newly containing it
+        for product_id in removed:
+            name_id = self.product_names.pop(product_id)
+            products = tuple(i for i in self.name_products[name_id] if i != product_id)
+            self.name_products[name_id] = products
+            if not products:
+                key = self.name_keys[name_id]
+                del self.name_ids[key]
+                self.name_keys[name_id] = None
+                self.name_count -= 1
+                for word in set(name_words(key)):
+                    leaving.setdefault(self.word_ids[word], []).append(name_id)
+        new_words = len(self.words)
+        ids, popularity = [], []
+        for product_id, name, rating_count in added:
+            key = _normalize(name)
+            name_id = self.name_ids.get(key)
+            if name_id is None:
+                name_id = self.name_ids[key] = len(self.name_keys)
+                self.name_keys.append(key)
+                self.name_products.append(())
+                self.name_count += 1
+                for word in set(name_words(key)):
+                    word_id = self.word_ids.get(word)
+                    if word_id is None:
+                        word_id = self.word_ids[word] = len(self.words)
+                        self.words.append(word)
+                        self.word_names.append(np.zeros(0, dtype=np.int64))
+                    joining.setdefault(word_id, []).append(name_id)
+            self.name_products[name_id] += (product_id,)
+            self.product_names[product_id] = name_id
+            ids.append(product_id)
+            popularity.append(rating_count)
+
+        if ids:
+            size = max(len(self.popularity), max(ids) + 1)
+            self.popularity = np.concatenate([self.popularity, np.zeros(size - len(self.popularity), np.int64)])
+            self.popularity[ids] = popularity
+        self.word_counts = np.concatenate([self.word_counts, np.zeros(len(self.words) - new_words, np.int64)])
+        for word_id in leaving.keys() | joining.keys():
+            names = self.word_names[word_id]
+            if word_id in leaving:
+                names = names[~np.isin(names, leaving[word_id])]
+            if word_id in joining:
+                names = np.concatenate([names, np.array(joining[word_id], dtype=np.int64)])
+            self.word_names[word_id] = names
+            self.word_counts[word_id] = len(names)
+
+        # Words stay in the trigram index once seen; match() skips those left without names
+        trigram_words = {}
+        trigram_counts = []
+        for word_id in range(new_words, len(self.words)):
+            grams = trigrams(self.words[word_id])
+            trigram_counts.append(len(grams))
+            for gram in grams:
+                trigram_words.setdefault(gram, []).append(word_id)
+        for gram, word_ids in trigram_words.items():
+            word_ids = np.array(word_ids, dtype=np.int32)
+            known = self.trigram_words.get(gram)
+            self.trigram_words[gram] = word_ids if known is None else np.concatenate([known, word_ids])
+        self.trigram_counts = np.concatenate([self.trigram_counts, np.array(trigram_counts, dtype=np.int32)])
+
+    def export(self):
+        """
+        The index as flat arrays for MappedNameResolver: words and trigrams
+        sorted, postings as offset-indexed runs, dead names and words left out
+        """
+        live = [name_id for name_id, key in enumerate(self.name_keys) if key is not None]
+        name_map = np.full(len(self.name_keys), -1, dtype=np.int64)
+        name_map[live] = np.arange(len(live))
+        words = sorted(word for word, word_id in self.word_ids.items() if self.word_counts[word_id])
+        word_map = np.full(len(self.words), -1, dtype=np.int64)
+        word_map[[self.word_ids[word] for word in words]] = np.arange(len(words))
+        grams = []
+        gram_words = []
+        for gram in sorted(self.trigram_words):
+            word_ids = word_map[self.trigram_words[gram]]
+            if (word_ids >= 0).any():
+                grams.append(gram)
+                gram_words.append(np.sort(word_ids[word_ids >= 0]))
+        word_offsets, word_names = _runs([np.sort(name_map[self.word_names[self.word_ids[w]]]) for w in words])
+        gram_offsets, gram_words = _runs(gram_words)
+        name_offsets, name_products = _runs([np.array(self.name_products[name_id]) for name_id in live])
+        return {
+            "words": words,
+            "word_offsets": word_offsets,
+            "word_names": word_names.astype(np.int32),
+            "grams": grams,
+            "gram_offsets": gram_offsets,
+            "gram_words": gram_words.astype(np.int32),
+            "trigram_counts": self.trigram_counts[[self.word_ids[word] for word in words]].astype(np.int32),
+            "name_offsets": name_offsets,
+            "name_products": name_products.astype(np.int64),
+        }
+
+    @property
+    def name_slots(self):
+        return len(self.name_keys)
+
+    def _word_id(self, word):
+        return self.word_ids.get(word)
+
+    def _gram_words(self, gram):
+        return self.trigram_words.get(gram)
+
+    def _names_of(self, word_id):
+        return self.word_names[word_id]
+
+    def _products_of(self, name_id):
+        return self.name_products[name_id]
+
+    def _is_anchor(self, word_id):
+        word = self.words[word_id]
+        return word in self.brand_words or (
+            word not in self.attribute_words and self.word_counts[word_id] <= ANCHOR_MAX_SHARE * self.name_count
+        )
+
+    def match(self, word):
+        """(word id, similarity) of the vocabulary word closest to word, or None"""
+        word_id = self._word_id(word)
+        if word_id is not None and self.word_counts[word_id]:
+            return word_id, 1.0
+        if len(word) < MIN_FUZZY_LENGTH:
+            return None
+        grams = trigrams(word)
+        postings = [words for words in map(self._gram_words, grams) if words is not None]
+        if not postings:
+            return None
+        # Shared trigrams per candidate word, counted over the postings at once
+        candidates, overlap = np.unique(np.concatenate(postings), return_counts=True)
+        similarity = overlap / (len(grams) + self.trigram_counts[candidates] - overlap)
+        similarity[self.word_counts[candidates] == 0] = 0.0
+        best = similarity.argmax()
+        if similarity[best] < MIN_SIMILARITY:
+            return None
+        return int(candidates[best]), float(similarity[best])
+
+    def resolve(self, message, limit):
+        """Up to limit product ids the message refers to, best match first; [] when it names none"""
+        text = strip_aspect_phrases(_normalize(message))
+        words = name_words(text)
+        matched = {}
+        # Adjacent words joined too, so "one plus" finds OnePlus
+        for word in set(words) | {a + b for a, b in zip(words, words[1:])}:
+            found = self.match(word)
+            if found is not None:
+                word_id, similarity = found
+                matched[word_id] = max(matched.get(word_id, 0.0), similarity)
+        anchors = [word_id for word_id in matched if self._is_anchor(word_id)]
+        if not anchors:
+            return []
+
+        count = max(self.name_count, 1)
+        scores = np.zeros(self.name_slots)
+        for word_id, similarity in matched.items():
+            idf = math.log(1 + count / self.word_counts[word_id])
+            scores[self._names_of(word_id)] += similarity * idf
+        kept = []
+        for word_id in anchors:
+            names = self._names_of(word_id)
+            kept.append(names[scores[names] >= RELATIVE_SCORE * scores[names].max()])
+        names = np.unique(np.concatenate(kept))
+
+        products = [self._products_of(name) for name in names]
+        ids = np.concatenate(products).astype(np.int64)
+        product_scores = np.repeat(scores[names], [len(found) for found in products])
+        order = np.lexsort((-self.popularity[ids], -product_scores))[:limit]
+        return ids[order].tolist()
+
+
+class MappedNameResolver(NameResolver):
+    """
+    Read-only NameResolver over the flat arrays of export(), e.g.
+    memory-mapped from a columnar catalog file, so opening it indexes
+    nothing.
+
+    words and grams are sorted sequences; the names of words[w] are
+    word_names[word_offsets[w]:word_offsets[w + 1]], the words of grams[g]
+    and the products of name n likewise. popularity is indexed by product
+    id.
+    """
+
+    def __init__(self, words, word_offsets, word_names, grams, gram_offsets, gram_words, trigram_counts,
+                 name_offsets, name_products, vocabularies, popularity):
+        self.words = words
+        self.word_offsets = word_offsets
+        self.word_names = word_names
+        self.word_counts = np.diff(word_offsets.astype(np.int64))
+        self.grams = grams
+        self.gram_offsets = gram_offsets
+        self.gram_words = gram_words
+        self.trigram_counts = trigram_counts
+        self.name_offsets = name_offsets
+        self.name_products = name_products
+        self.name_count = len(name_offsets) - 1
+        self.popularity = popularity
+        self._set_vocabularies(vocabularies)
+
+    def updated(self, added, removed, vocabularies):
+        raise NotImplementedError("a mapped name index is rebuilt with the columnar file")
+
+    @property
+    def name_slots(self):
+        return self.name_count
+
+    def _word_id(self, word):
+        return _find(self.words, word)
+
+    def _gram_words(self, gram):
+        position = _find(self.grams, gram)
+        if position is None:
+            return None
+        return self.gram_words[int(self.gram_offsets[position]):int(self.gram_offsets[position + 1])]
+
+    def _names_of(self, word_id):
+        return self.word_names[int(self.word_offsets[word_id]):int(self.word_offsets[word_id + 1])]
+
+    def _products_of(self, name_id):
+        return self.name_products[int(self.name_offsets[name_id]):int(self.name_offsets[name_id + 1])]
+
+
+def _find(values, value):
+    """Position of value in the sorted sequence values, or None"""
+    position = bisect.bisect_left(values, value)
+    if position < len(values) and values[position] == value:
+        return position
+    return None
+
+
+def _runs(arrays):
+    """(offsets, concatenation) of a list of arrays; array i is flat[offsets[i]:offsets[i + 1]]"""
+    offsets = np.zeros(len(arrays) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(values) for values in arrays])
+    flat = np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int64)
+    return offsets, flat
+
+
+def answer_product_details(message, products):
+    """
+    Price or detail answer about products the message named, or None when
+    it asks something else (reviews, advice, ...) or named no product.
+    """
+    if not products:
+        return None
+    text = _normalize(message)
+    details = bool(DETAIL_PATTERN.search(text))
+    if not details and not PRICE_PATTERN.search(text):
+        return None
+    if len(products) == 1:
+        product = products[0]
+        lines = [
+            f"**{product['product_name']}** costs ₹{product['discounted_price']:,} "
+            f"(was ₹{product['actual_price']:,}, {product['discount_percentage']}% off) and is rated "
+            f"{product['rating']:g}★ by {product['rating_count']:,} customers."
+        ]
+        if details:
+            lines.extend(["", product["about_product"]])
+        return "\n".join(lines)
+    lines = [f"I found {len(products)} products matching that:", ""]
+    for position, product in enumerate(products, 1):
+        lines.append(format_product_line(position, product))
+        if details:
+            lines.append(f"   {product['about_product']}")
+    return "\n".join(lines)
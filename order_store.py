@@ -0,0 +1,230 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import ORDER_STORE_PATH, ORDER_CACHE_SIZE, ORDER_CACHE_TTL
+
+# Optional per-status date fields carried by an order
+DATE_FIELDS = ["eta", "delivery_date", "ship_date"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    customer_id TEXT,
+    status TEXT NOT NULL,
+    eta TEXT,
+    delivery_date TEXT,
+    ship_date TEXT,
+    items TEXT NOT NULL
+) WITHOUT ROWID
+"""
+CUSTOMER_INDEX = "CREATE INDEX IF NOT EXISTS orders_customer ON orders (customer_id)"
+
+# Constant SQL text so sqlite3's statement cache reuses the prepared statements
+SELECT_BY_ID = "SELECT order_id, customer_id, status, eta, delivery_date, ship_date, items FROM orders WHERE order_id = ?"
+SELECT_BY_CUSTOMER = "SELECT order_id, customer_id, status, eta, delivery_date, ship_date, items FROM orders WHERE customer_id = ?"
+INSERT_ORDER = "INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+
+class OrderStore:
+    """Interface for order lookups. Orders are dicts shaped like the ORDERS entries."""
+
+    def get(self, order_id):
+        """Return the order with this ID, or None"""
+        raise NotImplementedError
+
+    def find_by_customer(self, customer_id):
+        """Return (order_id, order) pairs for every order of a customer"""
+        raise NotImplementedError
+
+    def __contains__(self, order_id):
+        return self.get(order_id) is not None
+
+
+class DictOrderStore(OrderStore):
+    """Order store backed by an in-memory dict (the demo ORDERS data)"""
+
+    def __init__(self, orders):
+        self.orders = orders
+        self.by_customer = {}
+        for order_id, order in orders.items():
+            if order.get("customer_id"):
+                self.by_customer.setdefault(order["customer_id"], []).append(order_id)
+
+    def get(self, order_id):
+        return self.orders.get(order_id)
+
+    def find_by_customer(self, customer_id):
+        return [(order_id, self.orders[order_id]) for order_id in self.by_customer.get(customer_id, [])]
+
+
+class LRUCache:
+    """Small thread-safe LRU with a TTL so hot orders skip the database"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+def _row_to_order(row):
+    """Convert a database row into an order dict"""
+    order = {"status": row[2], "items": json.loads(row[6])}
+    # Like the dict backend, orders carry only the optional fields they have
+    for field, value in zip(["customer_id"] + DATE_FIELDS, (row[1],) + row[3:6]):
+        if value is not None:
+            order[field] = value
+    return order
+
+
+class SQLiteOrderStore(OrderStore):
+    """
+    Read-only order store on an SQLite file.
+
+    Every thread gets its own read-only connection (Streamlit runs each
+    session's script on a separate thread), lookups go through the primary
+    key or the customer index, and recently read orders are served from an
+    LRU without touching the database.
+    """
+
+    def __init__(self, path, cache_size=ORDER_CACHE_SIZE, cache_ttl=ORDER_CACHE_TTL):
+        self.path = path
+        self.cache = LRUCache(cache_size, cache_ttl)
+        self._local = threading.local()
+
+    def _connection(self):
+        """This thread's read-only connection, opened on first use"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, cached_statements=64)
+            connection.execute("PRAGMA query_only = ON")
+            self._local.connection = connection
+        return connection
+
+    def get(self, order_id):
+        order = self.cache.get(order_id)
+        if order is not None:
+            return order
+        row = self._connection().execute(SELECT_BY_ID, (order_id,)).fetchone()
+        if row is None:
+            return None
+        order = _row_to_order(row)
+        self.cache.put(order_id, order)
+        return order
+
+    def find_by_customer(self, customer_id):
+        rows = self._connection().execute(SELECT_BY_CUSTOMER, (customer_id,)).fetchall()
+        return [(row[0], _row_to_order(row)) for row in rows]
+
+
+def _order_row(order_id, order):
+    """Flatten an order dict into an orders table row"""
+    return (
+        str(order_id),
+        order.get("customer_id"),
+        order["status"],
+        order.get("eta"),
+        order.get("delivery_date"),
+        order.get("ship_date"),
+        json.dumps(order.get("items", [])),
+    )
+
+
+def bulk_load(path, orders, batch_size=50000):
+    """
+    Load (order_id, order) pairs into an SQLite order database.
+
+    Journaling and syncing are off while loading and the customer index is
+    built once at the end, which is far faster than indexing row by row.
+    Returns the number of rows written.
+    """
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute(SCHEMA)
+        connection.execute("DROP INDEX IF EXISTS orders_customer")
+        count = 0
+        batch = []
+        for order_id, order in orders:
+            batch.append(_order_row(order_id, order))
+            if len(batch) >= batch_size:
+                connection.executemany(INSERT_ORDER, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            connection.executemany(INSERT_ORDER, batch)
+            count += len(batch)
+        connection.commit()
+        connection.execute(CUSTOMER_INDEX)
+        connection.execute("ANALYZE")
+        connection.commit()
+        return count
+    finally:
+        connection.close()
+
+
+# SQLite stores are opened once per process and shared across reruns
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_order_store(default_orders, path=ORDER_STORE_PATH):
+    """The configured order store: SQLite when ORDER_STORE_PATH is set, else the given dict"""
+    if not path:
+        return DictOrderStore(default_orders)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = SQLiteOrderStore(path)
+        return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load orders from JSON lines into an SQLite order store")
+    parser.add_argument("source", help='JSONL file, one {"order_id": ..., "status": ..., ...} object per line')
+    parser.add_argument("database", help="SQLite file to create or extend")
+    args = parser.parse_args()
+
+    def read_orders():
+        with open(args.source, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    order = json.loads(line)
+                    yield order.pop("order_id"), order
+
+    start = time.perf_counter()
+    count = bulk_load(args.database, read_orders())
+    print(f"Loaded {count} orders in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import re
+from collections import namedtuple
+
+from retrieval import STOPWORDS
+from review_aspects import ASPECT_LABELS, query_aspects, strip_aspect_phrases
+
+# A parsed filter/sort question. Fields left as None/empty are unconstrained.
+# aspects are review aspects (battery, comfort, ...) the products must be
+# praised for.
+ProductQuery = namedtuple(
+    "ProductQuery",
+    "sort_by descending limit min_price max_price min_rating min_discount brands types colors aspects",
+)
+
+# Lowest net review score that counts as "praised for" an aspect
+MIN_ASPECT_SCORE = 0.01
+
+DEFAULT_LIMIT = 3
+
+_AMOUNT = r"(?:₹|rs\.?|inr)?\s*(\d[\d,]*(?:\.\d+)?)\s*(k\b)?"
+
+PRICE_RANGE_PATTERN = re.compile(r"\b(?:between|from)\s*" + _AMOUNT + r"\s*(?:and|to|-)\s*" + _AMOUNT)
+MAX_PRICE_PATTERN = re.compile(
+    r"\b(?:under|below|less than|within|up to|upto|max(?:imum)?|cheaper than|no more than|not more than)\s*" + _AMOUNT
+)
+MIN_PRICE_PATTERN = re.compile(r"\b(?:above|over|more than|at least|min(?:imum)?|starting)\s*" + _AMOUNT)
+
+RATING_PATTERNS = [
+    re.compile(r"\b(?:rating|rated|stars?)\s*(?:of\s*)?(?:above|over|at least|more than|>=?)?\s*(\d(?:\.\d+)?)\s*\+?(?:\s*stars?)?"),
+    re.compile(r"\b(\d(?:\.\d+)?)\s*\+?\s*stars?\b(?:\s*(?:and|or)\s*(?:above|up|more))?"),
+]
+DISCOUNT_PATTERN = re.compile(r"(?:\b(?:at least|above|over|more than|min(?:imum)?)\s*)?(\d{1,2})\s*%\s*(?:off|discount)?")
+
+# (pattern, column, descending) - the first match decides the ordering
+SORT_PATTERNS = [
+    (re.compile(r"\b(?:highest|best|top)[- ]rat(?:ed|ing)s?\b|\bbest reviewed\b"), "rating", True),
+    (re.compile(r"\bmost (?:popular|reviewed|rated)\b|\bmost ratings\b|\bbest[- ]selling\b"), "rating_count", True),
+    (re.compile(r"\b(?:most|highest|biggest|largest|maximum|max|best) discount(?:ed|s)?\b|\bbest (?:deals?|offers?)\b"), "discount_percentage", True),
+    (re.compile(r"\b(?:most|highest|biggest|largest) savings?\b|\bsave the most\b"), "savings", True),
+    (re.compile(r"\bcheapest\b|\blowest[- ]price[ds]?\b|\bleast expensive\b|\bmost affordable\b"), "discounted_price", False),
+    (re.compile(r"\bmost expensive\b|\bpriciest\b|\bcostliest\b|\bhighest[- ]price[ds]?\b"), "discounted_price", True),
+    (re.compile(r"\b(?:best|top)\b"), "rating", True),
+]
+
+LIMIT_PATTERN = re.compile(r"\b(?:top|best|first|cheapest)\s+(\d{1,2})\b|\b(\d{1,2})\s+(?:cheapest|best|top|highest|most)\b")
+SINGULAR_PATTERN = re.compile(r"\bwhich (?:one|product|model|headphone|earphone)\b|\b(?:which|what) (?:has|is)\b|\bwhat's the\b|\bwhat is the\b")
+
+# Phrases mapped to the product type words they select
+TYPE_KEYWORDS = [
+    ("truly wireless", "truly wireless"),
+    ("tws", "truly wireless"),
+    ("earbud", "earbuds"),
+    ("wireless", "wireless"),
+    ("bluetooth", "wireless"),
+    ("wired", "wired"),
+    ("in ear", "in ear"),
+    ("over ear", "over ear"),
+]
+
+COLOR_ALIASES = {"gray": "grey"}
+
+# Words that make a question about products rather than about anything
+# else that is "best" or "over ₹5,000" (a brand or type word also counts)
+PRODUCT_NOUNS = frozenset("""
+headphone headphones earphone earphones earbud earbuds buds headset headsets
+iem iems neckband neckbands product products option options one ones
+model models pair pairs
+""".split())
+
+# Words a filter/sort question may use besides the parts the parser reads.
+# Anything else ("for gaming", "way to clean") is a qualifier the catalog
+# columns cannot answer, so the question goes to the model.
+QUERY_WORDS = frozenset("""
+all also available buy currently find get give good great has have just list
+nice now offer only options price priced prices pricing cost costs costing
+budget rs inr rupees range around recommend suggest sell stock sort sorted
+their there today top under which what s who will would could should
+above higher more plus up life quality excellent decent long
+""".split())
+
+SORT_LABELS = {
+    "rating": "highest rated",
+    "rating_count": "most popular",
+    "discount_percentage": "most discounted",
+    "savings": "biggest-saving",
+}
+
+
+def _normalize(text):
+    """Lowercase and turn hyphens into spaces so 'in-ear' and 'in ear' match alike"""
+    return text.lower().replace("-", " ")
+
+
+def _amount(number, thousands):
+    """Parse a matched amount such as '5,000' or '5' + 'k'"""
+    value = float(number.replace(",", ""))
+    return int(value * 1000) if thousands else int(value)
+
+
+def _words(text):
+    """Set of words in already-normalized text"""
+    return set(re.findall(r"[a-z0-9]+", text))
+
+
+def _unparsed_words(text, vocabularies):
+    """
+    Words of normalized text that no pattern, attribute value (vocabularies
+    maps each attribute to its values) or query word accounts for
+    """
+    patterns = [DISCOUNT_PATTERN, *RATING_PATTERNS, PRICE_RANGE_PATTERN, MAX_PRICE_PATTERN, MIN_PRICE_PATTERN, LIMIT_PATTERN]
+    patterns.extend(pattern for pattern, _, _ in SORT_PATTERNS)
+    for pattern in patterns:
+        text = pattern.sub(" ", text)
+    words = _words(strip_aspect_phrases(text))
+    for values in vocabularies.values():
+        for value in values:
+            words -= _words(_normalize(value))
+    for phrase, _ in TYPE_KEYWORDS:
+        words -= _words(phrase)
+    return words - PRODUCT_NOUNS - QUERY_WORDS - STOPWORDS - set(COLOR_ALIASES)
+
+
+def parse_product_query(message, table):
+    """
+    Parse a price/rating/discount question into a ProductQuery.
+
+    Returns None unless the message is about products, asks for an
+    ordering or a numeric constraint, and says nothing the parser cannot
+    read, so open-ended questions keep going to the model.
+    """
+    text = _normalize(message)
+    if _unparsed_words(text, table.vocabularies):
+        return None
+
+    min_discount = None
+    match = DISCOUNT_PATTERN.search(text)
+    if match:
+        min_discount = int(match.group(1))
+        text = text[:match.start()] + " " + text[match.end():]
+
+    min_rating = None
+    for pattern in RATING_PATTERNS:
+        match = pattern.search(text)
+        if match and float(match.group(1)) <= 5:
+            min_rating = float(match.group(1))
+            # Blank the clause out so "rated above 4" is not read as a price
+            text = text[:match.start()] + " " + text[match.end():]
+            break
+
+    min_price = max_price = None
+    match = PRICE_RANGE_PATTERN.search(text)
+    if match:
+        low, high = _amount(*match.group(1, 2)), _amount(*match.group(3, 4))
+        min_price, max_price = min(low, high), max(low, high)
+    else:
+        match = MAX_PRICE_PATTERN.search(text)
+        if match:
+            max_price = _amount(*match.group(1, 2))
+        match = MIN_PRICE_PATTERN.search(text)
+        if match:
+            min_price = _amount(*match.group(1, 2))
+
+    sort_by, descending = None, True
+    for pattern, column, column_descending in SORT_PATTERNS:
+        if pattern.search(text):
+            sort_by, descending = column, column_descending
+            break
+
+    aspects = query_aspects(text)
+    constrained = any(v is not None for v in (min_price, max_price, min_rating, min_discount)) or bool(aspects)
+    if sort_by is None and not constrained:
+        return None
+    if sort_by is None or (aspects and sort_by == "rating" and not SORT_PATTERNS[0][0].search(text)):
+        # "best"/"good" next to an aspect ranks by that aspect's reviews
+        sort_by = f"{aspects[0]}_score" if aspects else "rating"
+
+    match = LIMIT_PATTERN.search(text)
+    if match:
+        limit = int(match.group(1) or match.group(2))
+    elif SINGULAR_PATTERN.search(text):
+        limit = 1
+    else:
+        limit = DEFAULT_LIMIT
+
+    if aspects:
+        text = strip_aspect_phrases(text)
+    words = _words(text)
+    brands = {b for b in table.vocabularies["brand"] if b.lower() in words}
+    colors = {
+        c for c in table.vocabularies["color"]
+        if c.lower() in words or any(COLOR_ALIASES.get(w) == c.lower() for w in words)
+    }
+    types = set()
+    padded = " " + " ".join(re.findall(r"[a-z0-9]+", text)) + " "
+    for phrase, type_word in TYPE_KEYWORDS:
+        if " " + phrase in padded:
+            types.update(
+                t for t in table.vocabularies["type"]
+                if (" " + type_word) in " " + _normalize(t)
+            )
+            # "truly wireless" should not also widen to every wireless type
+            padded = padded.replace(" " + phrase, " ")
+    if not (brands or types or words & PRODUCT_NOUNS):
+        return None
+
+    return ProductQuery(
+        sort_by, descending, max(1, limit), min_price, max_price,
+        min_rating, min_discount, brands, types, colors, aspects,
+    )
+
+
+def run_product_query(table, query):
+    """Evaluate a ProductQuery against the table and return matching products"""
+    mask = table.all_rows()
+    mask = table.between(mask, "discounted_price", query.min_price, query.max_price)
+    if query.min_rating is not None:
+        mask = table.between(mask, "rating", low=query.min_rating)
+    if query.min_discount is not None:
+        mask = table.between(mask, "discount_percentage", low=query.min_discount)
+    if query.brands:
+        mask = table.one_of(mask, "brand", query.brands)
+    if query.types:
+        mask = table.one_of(mask, "type", query.types)
+    if query.colors:
+        mask = table.one_of(mask, "color", query.colors)
+    for aspect in query.aspects:
+        mask = table.between(mask, f"{aspect}_score", low=MIN_ASPECT_SCORE)
+    return table.rows(table.top_k(mask, query.sort_by, query.limit, query.descending))
+
+
+def describe_constraints(query):
+    """Human-readable summary of the filters, e.g. ' from Sony under ₹5,000'"""
+    parts = []
+    if query.colors:
+        parts.append("in " + "/".join(sorted(query.colors)))
+    if query.brands:
+        parts.append("from " + " or ".join(sorted(query.brands)))
+    if query.min_price is not None and query.max_price is not None:
+        parts.append(f"between ₹{query.min_price:,} and ₹{query.max_price:,}")
+    elif query.max_price is not None:
+        parts.append(f"under ₹{query.max_price:,}")
+    elif query.min_price is not None:
+        parts.append(f"above ₹{query.min_price:,}")
+    if query.min_rating is not None:
+        parts.append(f"rated {query.min_rating:g}★ or higher")
+    if query.min_discount is not None:
+        parts.append(f"with at least {query.min_discount}% off")
+    praised = [ASPECT_LABELS[a] for a in query.aspects if f"{a}_score" != query.sort_by]
+    if praised:
+        parts.append("with well-reviewed " + " and ".join(praised))
+    return (" " + ", ".join(parts)) if parts else ""
+
+
+def format_product_line(position, product):
+    """One ranked result line with the numbers a shopper compares"""
+    return (
+        f"{position}. **{product['product_name']}** — ₹{product['discounted_price']:,} "
+        f"(was ₹{product['actual_price']:,}, {product['discount_percentage']}% off), "
+        f"rated {product['rating']:g}★ by {product['rating_count']:,} customers"
+    )
+
+
+def describe_subject(query):
+    """What is being ranked, e.g. 'wireless headphones' or just 'options'"""
+    if query.types:
+        return " / ".join(sorted(t.lower() for t in query.types))
+    return "options"
+
+
+def format_query_answer(query, products):
+    """Phrase the computed results as a chat response"""
+    subject = describe_subject(query)
+    constraints = describe_constraints(query)
+    if not products:
+        subject = "products" if subject == "options" else subject
+        return (
+            f"I couldn't find any {subject}{constraints}. "
+            "Would you like me to widen the budget or look at other options?"
+        )
+    if query.sort_by == "discounted_price":
+        label = "most expensive" if query.descending else "cheapest"
+    elif query.sort_by.endswith("_score"):
+        aspect = ASPECT_LABELS[query.sort_by[:-len("_score")]]
+        subject = "products" if subject == "options" else subject
+        if len(products) == 1:
+            among = "" if subject == "products" else f" among {subject}"
+            header = f"Here's the pick{among}{constraints} that reviewers rate best for {aspect}:"
+        else:
+            header = f"Here are the {len(products)} {subject}{constraints} reviewers rate best for {aspect}:"
+        lines = [header, ""]
+        lines.extend(format_product_line(i, p) for i, p in enumerate(products, 1))
+        lines.append("")
+        lines.append("Would you like a summary of what reviewers say about them, or a side-by-side comparison?")
+        return "\n".join(lines)
+    else:
+        label = SORT_LABELS[query.sort_by]
+    if len(products) == 1:
+        if subject == "options":
+            header = f"Here's the {label} option{constraints}:"
+        else:
+            header = f"Here's the {label} pick among {subject}{constraints}:"
+        footer = "Would you like more details on it, or a few alternatives to compare?"
+    else:
+        header = f"Here are the {len(products)} {label} {subject}{constraints}:"
+        footer = "Would you like me to compare these, or narrow it down by brand, type or color?"
+    lines = [header, ""]
+    lines.extend(format_product_line(i, p) for i, p in enumerate(products, 1))
+    lines.append("")
+    lines.append(footer)
+    return "\n".join(lines)
+
+
+def answer_product_query(message, table):
+    """Answer a filter/sort question locally, or return None if it isn't one"""
+    query = parse_product_query(message, table)
+    if query is None:
+        return None
+    return format_query_answer(query, run_product_query(table, query))
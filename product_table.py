@@ -0,0 +1,95 @@
+import numpy as np
+
+from review_aspects import ASPECTS, aspect_counts, aspect_scores
+
+# Numeric catalog columns and their array dtypes
+NUMERIC_COLUMNS = {
+    "discounted_price": np.int64,
+    "actual_price": np.int64,
+    "discount_percentage": np.int64,
+    "rating": np.float64,
+    "rating_count": np.int64,
+}
+
+# Text attributes stored as integer codes into a per-column vocabulary
+CATEGORICAL_COLUMNS = ["brand", "type", "color"]
+
+
+class ProductTable:
+    """
+    Column-oriented, array-backed view of the catalog for filter/sort queries.
+
+    The columns are computed from the products, or passed in ready-made
+    (columns, codes and vocabularies, e.g. memory-mapped arrays of a
+    columnar catalog file) and used without copying.
+    """
+
+    def __init__(self, products, columns=None, codes=None, vocabularies=None):
+        self.products = products
+        self.size = len(products)
+        if columns is not None:
+            self.columns = columns
+            self.codes = codes
+            self.vocabularies = vocabularies
+            return
+        self.columns = {
+            name: np.fromiter((p[name] for p in products), dtype=dtype, count=self.size)
+            for name, dtype in NUMERIC_COLUMNS.items()
+        }
+        # Derived column - rupees saved against the listed price
+        self.columns["savings"] = self.columns["actual_price"] - self.columns["discounted_price"]
+        # Review sentiment per aspect: "<aspect>_score" in [-1, 1] (float32) and
+        # "<aspect>_mentions", the number of reviews that talk about it
+        positive, negative = aspect_counts(products)
+        scores = aspect_scores(positive, negative)
+        for column, aspect in enumerate(ASPECTS):
+            self.columns[f"{aspect}_score"] = scores[:, column]
+            self.columns[f"{aspect}_mentions"] = positive[:, column] + negative[:, column]
+        self.codes = {}
+        self.vocabularies = {}
+        for name in CATEGORICAL_COLUMNS:
+            vocabulary = sorted({p[name] for p in products})
+            lookup = {value: code for code, value in enumerate(vocabulary)}
+            self.vocabularies[name] = vocabulary
+            self.codes[name] = np.fromiter((lookup[p[name]] for p in products), dtype=np.int32, count=self.size)
+
+    def all_rows(self):
+        """Mask selecting every product"""
+        return np.ones(self.size, dtype=bool)
+
+    def between(self, mask, column, low=None, high=None):
+        """Narrow mask to rows whose column value lies within [low, high]"""
+        values = self.columns[column]
+        if low is not None:
+            mask = mask & (values >= low)
+        if high is not None:
+            mask = mask & (values <= high)
+        return mask
+
+    def one_of(self, mask, column, values):
+        """Narrow mask to rows whose categorical column is one of values"""
+        vocabulary = self.vocabularies[column]
+        codes = [code for code, value in enumerate(vocabulary) if value in values]
+        return mask & np.isin(self.codes[column], codes)
+
+    def top_k(self, mask, column, k, descending=True):
+        """Row indices of the k best rows in mask, ordered by column"""
+        rows = np.flatnonzero(mask)
+        if rows.size == 0:
+            return rows
+        values = self.columns[column][rows]
+        # Ties are broken by popularity so the ranking is deterministic
+        tiebreak = -self.columns["rating_count"][rows]
+        primary = -values if descending else values
+        if rows.size > k:
+            # Partial selection first so large catalogs don't pay for a full sort
+            candidates = np.argpartition(primary, k - 1)[:k]
+            kth = primary[candidates].max()
+            candidates = np.flatnonzero(primary <= kth)
+            rows, primary, tiebreak = rows[candidates], primary[candidates], tiebreak[candidates]
+        order = np.lexsort((tiebreak, primary))[:k]
+        return rows[order]
+
+    def rows(self, indices):
+        """Product dicts for the given row indices"""
+        return [self.products[i] for i in indices]
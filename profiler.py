@@ -0,0 +1,324 @@
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import types
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from config import (
+    PROFILE_SAMPLE_RATE,
+    PROFILE_SAMPLE_INTERVAL,
+    PROFILE_SLOW_TURN_SECONDS,
+    PROFILE_DIR,
+    PROFILE_RECENT_TURNS,
+)
+from history import estimate_tokens
+from metrics import METRICS
+
+logger = logging.getLogger("chatbot.profiler")
+
+# Prompt size fields kept from ConversationHistory.last_metrics - counts only,
+# never message text
+PROMPT_FIELDS = ("prompt_tokens", "system_tokens", "history_tokens", "verbatim_messages", "summarized_messages")
+
+
+class TurnProfile:
+    """
+    Timings of one chat turn: wall and CPU time, named spans (inclusive, so
+    "llm" can sit inside "process_message") and, when sampled, a count of
+    every call stack the sampler caught the turn in.
+    """
+
+    def __init__(self, session_id, sampled, prompt_metrics=None):
+        self.session_id = session_id
+        self.sampled = sampled
+        self.stacks = Counter()
+        self.spans = {}
+        self.response = ""
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.cpu = 0.0
+        self.thread_id = None
+        self._cpu_start = 0.0
+        self._prompt_before = prompt_metrics
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def folded(self):
+        """Collapsed stacks, one "frame;frame;frame count" line each"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class Sampler:
+    """
+    Background thread reading the stacks of profiled threads every interval
+    seconds with sys._current_frames(). The profiled code runs untouched -
+    no tracing hooks - and the thread sleeps while nothing is profiled.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._targets = {}  # thread id -> TurnProfile
+        self._labels = {}  # code object -> frame label
+        self._thread = None
+
+    def add(self, thread_id, profile):
+        with self._lock:
+            self._targets[thread_id] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="turn-profiler", daemon=True)
+                self._thread.start()
+            self._wakeup.notify()
+
+    def remove(self, thread_id):
+        # Taking the lock waits out a sample in progress, so the profile's
+        # stacks are final once this returns
+        with self._lock:
+            self._targets.pop(thread_id, None)
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+        return label
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._targets:
+                    self._wakeup.wait()
+                frames = sys._current_frames()
+                for thread_id, profile in self._targets.items():
+                    frame = frames.get(thread_id)
+                    stack = []
+                    while frame is not None:
+                        stack.append(self._label(frame.f_code))
+                        frame = frame.f_back
+                    if stack:
+                        profile.stacks[";".join(reversed(stack))] += 1
+                del frames
+            time.sleep(self.interval)
+
+
+class TurnProfiler:
+    """
+    Profiling hook around chat turns.
+
+    Every turn gets a TurnProfile with its wall and CPU time and spans;
+    turns of sessions with profiling switched on, and a sample_rate share of
+    the others, are also sampled for call stacks. Finished turns are kept in
+    a bounded list of recent turns, and turns slower than slow_seconds are
+    written to directory as <name>.json (timings, prompt size and token
+    counts) - sampled or not, so slow turns are on disk with the default
+    sample rate of 0 - plus <name>.folded (flamegraph.pl / speedscope input)
+    when sampled.
+    """
+
+    def __init__(self, sample_rate=PROFILE_SAMPLE_RATE, interval=PROFILE_SAMPLE_INTERVAL,
+                 slow_seconds=PROFILE_SLOW_TURN_SECONDS, directory=PROFILE_DIR, recent=PROFILE_RECENT_TURNS):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.directory = directory
+        self.sampler = Sampler(interval)
+        self.recent = deque(maxlen=recent)
+        self._lock = threading.Lock()
+        self._active = {}  # thread id -> TurnProfile running on it
+        self._waiting = {}  # thread id -> TurnProfile whose suspended generator it consumes
+
+    def current(self):
+        """The profile of the turn running on this thread, or None"""
+        return self._active.get(threading.get_ident())
+
+    def waiting(self):
+        """The profile of the suspended turn this thread is consuming the output of, or None"""
+        return self._waiting.get(threading.get_ident())
+
+    def attach(self, profile):
+        """Run profile on the calling thread: count its CPU time and sample it"""
+        thread_id = threading.get_ident()
+        profile.thread_id = thread_id
+        profile._cpu_start = time.thread_time()
+        with self._lock:
+            self._active[thread_id] = profile
+        if profile.sampled:
+            self.sampler.add(thread_id, profile)
+
+    def detach(self, profile):
+        thread_id = profile.thread_id
+        if thread_id is None:
+            return
+        profile.cpu += time.thread_time() - profile._cpu_start
+        profile.thread_id = None
+        with self._lock:
+            self._active.pop(thread_id, None)
+        if profile.sampled:
+            self.sampler.remove(thread_id)
+
+    @contextmanager
+    def turn(self, session):
+        """Profile the enclosed turn of session; set .response on the yielded profile"""
+        running = self.current()
+        if running is not None:
+            # Already inside a profiled turn on this thread
+            yield running
+            return
+        sampled = getattr(session, "profiling", False) or random.random() < self.sample_rate
+        profile = TurnProfile(session.session_id, sampled, session.history.last_metrics)
+        self.attach(profile)
+        try:
+            yield profile
+        finally:
+            self.detach(profile)
+            self.finish(profile, session)
+
+    @contextmanager
+    def suspended(self, profile):
+        """
+        Pause profile while its turn's generator is suspended at a yield - a
+        streamed turn can resume on another thread (the HTTP server pulls
+        each delta from its executor)
+        """
+        thread_id = profile.thread_id
+        self.detach(profile)
+        with self._lock:
+            self._waiting[thread_id] = profile
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._waiting.pop(thread_id, None)
+            self.attach(profile)
+
+    def finish(self, profile, session):
+        wall = time.perf_counter() - profile.start
+        prompt_metrics = session.history.last_metrics
+        # Only a prompt built during this turn describes it
+        if prompt_metrics is profile._prompt_before:
+            prompt_metrics = None
+        record = {
+            "time": profile.started_at,
+            "session_id": profile.session_id,
+            "wall_s": round(wall, 4),
+            "cpu_s": round(profile.cpu, 4),
+            "spans": {name: round(seconds, 4) for name, seconds in profile.spans.items()},
+            "sampled": profile.sampled,
+            "samples": sum(profile.stacks.values()),
+            "prompt": {field: prompt_metrics[field] for field in PROMPT_FIELDS} if prompt_metrics else None,
+            "completion_tokens": estimate_tokens(profile.response) if profile.response else 0,
+            "artifact": None,
+        }
+        folded = profile.folded() if profile.stacks else None
+        if wall >= self.slow_seconds:
+            METRICS.increment("slow_turns")
+            if self.directory:
+                record["artifact"] = self.save(record, folded)
+        with self._lock:
+            self.recent.append((record, folded))
+
+    def save(self, record, folded):
+        """Write a slow turn's summary and collapsed stacks, if any; returns the file name stem"""
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(record["time"]))
+        name = f"{stamp}-{record['session_id'][:8]}-{int(record['wall_s'] * 1000)}ms"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if folded:
+                with open(os.path.join(self.directory, name + ".folded"), "w", encoding="utf-8") as f:
+                    f.write(folded + "\n")
+            with open(os.path.join(self.directory, name + ".json"), "w", encoding="utf-8") as f:
+                json.dump(dict(record, artifact=name), f, indent=2)
+        except OSError:
+            logger.exception("Could not write the profile of a slow turn to %s", self.directory)
+            return None
+        return name
+
+    def slowest(self, limit):
+        """(record, collapsed stacks or None) of the slowest recent turns, slowest first"""
+        with self._lock:
+            turns = list(self.recent)
+        return sorted(turns, key=lambda turn: turn[0]["wall_s"], reverse=True)[:limit]
+
+
+# One profiler (and sampler thread) per process
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    """The process-wide turn profiler"""
+    global _profiler
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = TurnProfiler()
+    return _profiler
+
+
+def record_span(name, seconds):
+    """
+    Add seconds to a span of the turn running on this thread, or of the
+    suspended turn whose output it is handling (rendering a streamed
+    delta), if any
+    """
+    profiler = get_profiler()
+    profile = profiler.current() or profiler.waiting()
+    if profile is not None:
+        profile.add_span(name, seconds)
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block as a span of the current turn"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def timed_items(name, items):
+    """
+    Yield from items, adding the time spent producing each one to a span of
+    the current turn - not the consumer's time between them
+    """
+    iterator = iter(items)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                record_span(name, time.perf_counter() - start)
+            yield item
+    finally:
+        # Closing the stream early closes the one it reads from
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+def profiled(name):
+    """
+    Decorator timing every call of the function as a span of the current
+    turn; a returned generator (a streamed response) is timed as it is
+    consumed
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                result = function(*args, **kwargs)
+            if isinstance(result, types.GeneratorType):
+                return timed_items(name, result)
+            return result
+        return wrapper
+    return decorate
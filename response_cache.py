@@ -0,0 +1,169 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_PATH,
+)
+
+# Messages that lean on earlier turns ("compare them", "is it waterproof?")
+# can't be answered from the message alone, so history joins their cache key
+FOLLOWUP_PATTERN = re.compile(
+    r"\b(it|its|that|this|these|those|them|they|one|ones|first|second|third|last|"
+    r"above|previous|same|instead|other|others|else|which one)\b"
+)
+
+# References to a specific order are never cached
+ORDER_REFERENCE_PATTERN = re.compile(r"#\s*\d+|\border\b\D{0,12}\d+")
+
+# Seconds between writes of a persistent cache to disk
+SAVE_INTERVAL = 5.0
+
+
+def normalize_message(message):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    text = re.sub(r"[^\w₹]+", " ", message.lower())
+    return " ".join(text.split())
+
+
+def is_followup(message):
+    """True when the message only makes sense together with the conversation so far"""
+    normalized = normalize_message(message)
+    return len(normalized.split()) < 3 or FOLLOWUP_PATTERN.search(normalized) is not None
+
+
+def references_order(message):
+    """True when the message mentions a specific order"""
+    return ORDER_REFERENCE_PATTERN.search(message.lower()) is not None
+
+
+def cache_key(message, catalog_version, prompt_version, history=None, fallback_query=None):
+    """
+    Build the cache key for a user message.
+
+    history (a list of chat messages) is only folded in when the message is a
+    follow-up, so standalone questions share one entry across all sessions.
+    fallback_query is the earlier message that topped up the retrieval for
+    this one, when it did - the prompt then depends on it too.
+    """
+    parts = [normalize_message(message), catalog_version, prompt_version]
+    if history and is_followup(message):
+        parts.append([(m["role"], m["content"]) for m in history])
+    if fallback_query:
+        parts.append(normalize_message(fallback_query))
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of responses with per-entry TTL expiry"""
+
+    def __init__(self, max_entries, ttl, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, response)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        if path:
+            self._load()
+            atexit.register(self.save)
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                # Expired - drop it now rather than waiting for LRU eviction
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, response):
+        """Store a response, evicting the least recently used entries when full"""
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+            save_due = self.path and time.monotonic() - self._last_save >= SAVE_INTERVAL
+        if save_due:
+            self.save()
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self._dirty = True
+
+    def stats(self):
+        """Entry count and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def save(self):
+        """Write unexpired entries to the persistence file, if one is configured"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            snapshot = [[k, exp, resp] for k, (exp, resp) in self._entries.items() if exp > now]
+            self._dirty = False
+            self._last_save = time.monotonic()
+        # Write to a temp file and rename so readers never see a partial file
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _load(self):
+        """Populate the cache from the persistence file, skipping expired entries"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, expires_at, response in snapshot[-self.max_entries:]:
+            if expires_at > now:
+                self._entries[key] = (expires_at, response)
+        self._last_save = time.monotonic()
+
+
+# One cache per process, shared by every Streamlit session and rerun
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide response cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PATH or None)
+    return _cache
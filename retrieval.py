@@ -0,0 +1,251 @@
+import heapq
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from have i in is it its me my
+of on or show so some tell than that the them these this those to very was
+what which with you your want need looking any please about
+""".split())
+
+# Term weights per field - attributes the customer names directly count more
+# than words that happen to appear in descriptions or reviews
+FIELD_WEIGHTS = {
+    "product_name": 1,
+    "brand": 3,
+    "type": 2,
+    "color": 3,
+    "about_product": 1,
+    "reviews": 1,
+}
+
+
+def tokenize(text):
+    """Lowercase, split into alphanumeric terms and drop stopwords"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        # Cheap plural folding so "earphones" matches "earphone"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def product_terms(product):
+    """Weighted term frequencies for a product across all indexed fields"""
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(str(product.get(field, ""))):
+            terms[token] += weight
+    return terms
+
+
+class BM25Index:
+    """
+    In-process inverted index with Okapi BM25 ranking.
+
+    updated() derives a new index with some documents added or removed
+    while this one stays untouched, so readers holding the old index keep a
+    consistent view. Only the posting lists of the changed documents' terms
+    are copied; IDF is computed per query term, so a changed document count
+    does not invalidate anything.
+    """
+
+    def __init__(self, documents, k1=1.2, b=0.75):
+        # documents: mapping of doc id -> term frequencies, or an iterable of
+        # term frequencies whose positions are the doc ids
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_terms = {}
+        items = documents.items() if hasattr(documents, "items") else enumerate(documents)
+        for doc_id, terms in items:
+            self.doc_terms[doc_id] = terms
+            for term, freq in terms.items():
+                self.postings.setdefault(term, []).append((doc_id, freq))
+        self.doc_lengths = {doc_id: sum(terms.values()) for doc_id, terms in self.doc_terms.items()}
+        self.total_length = sum(self.doc_lengths.values())
+
+    @property
+    def doc_count(self):
+        return len(self.doc_lengths)
+
+    @property
+    def avg_length(self):
+        return (self.total_length / self.doc_count) if self.doc_count else 0.0
+
+    def idf(self, term):
+        docs = self.postings.get(term)
+        if not docs:
+            return 0.0
+        return math.log(1 + (self.doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+
+    def updated(self, added=None, removed=()):
+        """New index with added (doc id -> terms) indexed and removed doc ids dropped"""
+        added = added or {}
+        removed = set(removed)
+        index = BM25Index.__new__(BM25Index)
+        index.k1 = self.k1
+        index.b = self.b
+        index.postings = dict(self.postings)
+        index.doc_terms = dict(self.doc_terms)
+        index.doc_lengths = dict(self.doc_lengths)
+        index.total_length = self.total_length
+        copied = set()
+        for doc_id in removed:
+            for term in index.doc_terms.pop(doc_id, ()):
+                if term not in copied:
+                    docs = [posting for posting in index.postings[term] if posting[0] not in removed]
+                    if docs:
+                        index.postings[term] = docs
+                    else:
+                        del index.postings[term]
+                    copied.add(term)
+            index.total_length -= index.doc_lengths.pop(doc_id, 0)
+        for doc_id, terms in added.items():
+            index.doc_terms[doc_id] = terms
+            for term, freq in terms.items():
+                if term not in copied:
+                    index.postings[term] = list(index.postings.get(term, ()))
+                    copied.add(term)
+                index.postings[term].append((doc_id, freq))
+            index.doc_lengths[doc_id] = sum(terms.values())
+            index.total_length += index.doc_lengths[doc_id]
+        return index
+
+    def search(self, query, k):
+        """Return up to k (doc_id, score) pairs for the query, best first"""
+        scores = {}
+        avg_length = self.avg_length
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf(term)
+            for doc_id, freq in docs:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def popular(self, k, products):
+        """The k most-rated doc ids, for queries that match nothing"""
+        return heapq.nlargest(k, self.doc_lengths, key=lambda i: products[i]["rating_count"])
+
+
+class MappedBM25Index:
+    """
+    Read-only BM25 index over postings stored as flat arrays, e.g.
+    memory-mapped from a columnar catalog file.
+
+    terms is a sorted sequence of terms; the postings of terms[t] are
+    docs/freqs[offsets[t]:offsets[t + 1]]. Doc ids are row numbers, and
+    popularity (rating counts) ranks the fallback for unmatched queries.
+    Scores match BM25Index; queries are scored with vectorized array
+    operations instead of per-posting Python loops.
+    """
+
+    def __init__(self, terms, offsets, docs, freqs, doc_lengths, total_length, popularity, k1=1.2, b=0.75):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.freqs = freqs
+        self.doc_lengths = doc_lengths
+        self.total_length = total_length
+        self.popularity = popularity
+        self.k1 = k1
+        self.b = b
+
+    @property
+    def doc_count(self):
+        return len(self.doc_lengths)
+
+    @property
+    def avg_length(self):
+        return (self.total_length / self.doc_count) if self.doc_count else 0.0
+
+    def _postings(self, term):
+        """(docs, freqs) array views for a term, or None"""
+        low, high = 0, len(self.terms)
+        while low < high:
+            middle = (low + high) // 2
+            if self.terms[middle] < term:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(self.terms) or self.terms[low] != term:
+            return None
+        start, end = int(self.offsets[low]), int(self.offsets[low + 1])
+        return self.docs[start:end], self.freqs[start:end]
+
+    def idf(self, term):
+        postings = self._postings(term)
+        if postings is None:
+            return 0.0
+        count = len(postings[0])
+        return math.log(1 + (self.doc_count - count + 0.5) / (count + 0.5))
+
+    def search(self, query, k):
+        """Return up to k (doc_id, score) pairs for the query, best first"""
+        matched_docs = []
+        matched_scores = []
+        avg_length = self.avg_length
+        for term in set(tokenize(query)):
+            postings = self._postings(term)
+            if postings is None:
+                continue
+            docs, freqs = postings
+            idf = math.log(1 + (self.doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            freqs = freqs.astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / avg_length)
+            matched_docs.append(docs)
+            matched_scores.append(idf * freqs * (self.k1 + 1) / (freqs + norm))
+        if not matched_docs:
+            return []
+        docs, inverse = np.unique(np.concatenate(matched_docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(matched_scores))
+        if docs.size > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[best], scores[best]
+        order = np.lexsort((docs, -scores))
+        return [(int(docs[i]), float(scores[i])) for i in order]
+
+    def popular(self, k, products=None):
+        """The k most-rated doc ids, for queries that match nothing"""
+        k = min(k, len(self.popularity))
+        if not k:
+            return []
+        best = np.argpartition(-self.popularity, k - 1)[:k]
+        return best[np.lexsort((best, -self.popularity[best]))].tolist()
+
+
+def build_product_index(products):
+    """Build a BM25 index whose doc ids are the product ids"""
+    return BM25Index({p["product_id"]: product_terms(p) for p in products})
+
+
+def retrieve_products(index, products, query, k, fallback_query=None):
+    """
+    Pick the k products most relevant to the query.
+
+    products maps the index's doc ids (product ids) to products. Results are
+    topped up from fallback_query (typically the previous user turn) so
+    follow-ups like "what about the blue one?" keep their context, and
+    finally from the most-rated products when nothing matches at all.
+    """
+    selected = [doc_id for doc_id, _ in index.search(query, k)]
+    if len(selected) < k and fallback_query:
+        for doc_id, _ in index.search(fallback_query, k):
+            if doc_id not in selected:
+                selected.append(doc_id)
+                if len(selected) == k:
+                    break
+    if not selected:
+        selected = index.popular(k, products)
+    return [products[i] for i in selected]
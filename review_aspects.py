@@ -0,0 +1,117 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from catalog import REVIEW_SEPARATOR
+
+# Aspects reviews are scored on, in column order
+ASPECTS = ["battery", "comfort", "sound", "build", "connectivity", "noise_cancellation"]
+
+# How each aspect is named in answers
+ASPECT_LABELS = {
+    "battery": "battery life",
+    "comfort": "comfort",
+    "sound": "sound quality",
+    "build": "build quality",
+    "connectivity": "connectivity",
+    "noise_cancellation": "noise cancellation",
+}
+
+# Review wording that mentions an aspect
+REVIEW_ASPECT_PATTERNS = {
+    "battery": re.compile(r"\bbattery\b|\bcharg(?:e|es|ing)\b|\bplayback\b|\bplaytime\b"),
+    "comfort": re.compile(r"\b(?:un)?comfort(?:able|ably)?\b|\bfit\b|\bear ?pain\b|\bheavy\b|\blightweight\b"),
+    "sound": re.compile(r"\bsound\b|\baudio\b|\bbass\b|\btreble\b|\bvocals?\b|\bmusic\b|\bclarity\b"),
+    "build": re.compile(r"\bbuild\b|\bbuilt\b|\bsturdy\b|\bdurab(?:le|ility)\b|\bbroke\b|\bflimsy\b|\bpremium feel\b"),
+    "connectivity": re.compile(r"\bconnect(?:ion|ivity|s)?\b|\bbluetooth\b|\bpair(?:ing|s)?\b|\blag\b|\bdisconnect"),
+    "noise_cancellation": re.compile(r"\bnoise[- ]cancel(?:l?ation|ling|ing)?\b|\banc\b"),
+}
+
+# One alternation over every aspect, so a clause is scanned once rather than per aspect
+REVIEW_ASPECT_SCAN = re.compile(
+    "|".join(f"(?P<{aspect}>{pattern.pattern})" for aspect, pattern in REVIEW_ASPECT_PATTERNS.items())
+)
+ASPECT_COLUMNS = {aspect: column for column, aspect in enumerate(ASPECTS)}
+
+NEGATIVE_CUES = re.compile(
+    r"\b(?:not|no|never|poor|bad|worst|terrible|flat|weak|drains?|dies|broke|broken|flimsy|dropping|drops|"
+    r"disappointing|frustrating|uncomfortable|hurts?|pain|lag|issues?|problems?|cheap)\b"
+)
+
+# Clauses are scored separately so "great sound but the battery drains" counts both ways
+CLAUSE_SPLIT = re.compile(r",|;|\bbut\b|\bhowever\b|\bwhile\b")
+
+# Customer wording that asks about an aspect
+QUERY_ASPECT_PATTERNS = {
+    "battery": re.compile(r"\bbattery\b|\bbackup\b|\blong[- ]lasting\b|\bplay ?time\b"),
+    "comfort": re.compile(r"\bcomfort(?:able)?\b|\blong (?:use|hours|sessions)\b|\bfit\b"),
+    "sound": re.compile(r"\bsound\b|\baudio\b|\bbass\b|\bmusic quality\b"),
+    "build": re.compile(r"\bbuild\b|\bsturdy\b|\bdurable\b|\bdurability\b|\blast long\b"),
+    "connectivity": re.compile(r"\bconnect(?:ion|ivity)\b|\bpairing\b|\bstable bluetooth\b"),
+    "noise_cancellation": re.compile(r"\bnoise[- ]cancel(?:l?ation|ling|ing)?\b|\banc\b"),
+}
+
+# Messages about a product the customer already owns are support cases, not searches
+OWNED_PRODUCT_PATTERN = re.compile(
+    r"\b(?:my|mine|i bought|i received|return|refund|replace(?:ment)?|warranty|repair|defective|stopped|not working)\b"
+)
+
+
+@lru_cache(maxsize=65536)
+def classify_snippet(text):
+    """(aspect column, +1/-1) pairs for one review snippet; snippets repeat, so this is cached"""
+    found = {}
+    for clause in CLAUSE_SPLIT.split(text.lower()):
+        mentioned = {ASPECT_COLUMNS[match.lastgroup] for match in REVIEW_ASPECT_SCAN.finditer(clause)}
+        if not mentioned:
+            continue
+        polarity = -1 if NEGATIVE_CUES.search(clause) else 1
+        for column in mentioned:
+            found[column] = min(found.get(column, 1), polarity)
+    return tuple(sorted(found.items()))
+
+
+def aspect_counts(products):
+    """
+    Positive and negative review mentions per product and aspect.
+
+    Returns two uint16 arrays of shape (products, aspects), rows in the
+    order of products.
+    """
+    width = len(ASPECTS)
+    # Flat Python lists first - per-cell numpy indexing is far slower
+    positive = [0] * (len(products) * width)
+    negative = [0] * (len(products) * width)
+    for row, product in enumerate(products):
+        base = row * width
+        for snippet in product["reviews"].split(REVIEW_SEPARATOR):
+            for column, polarity in classify_snippet(snippet.strip()):
+                if polarity > 0:
+                    positive[base + column] += 1
+                else:
+                    negative[base + column] += 1
+    shape = (len(products), width)
+    return (np.array(positive, dtype=np.uint16).reshape(shape),
+            np.array(negative, dtype=np.uint16).reshape(shape))
+
+
+def aspect_scores(positive, negative):
+    """Net sentiment per aspect in [-1, 1]; 0 where no review mentions it"""
+    mentions = positive.astype(np.float32) + negative
+    net = positive.astype(np.float32) - negative
+    return np.divide(net, mentions, out=np.zeros_like(net), where=mentions > 0)
+
+
+def query_aspects(text):
+    """Aspects a (normalized) customer message asks about, in column order"""
+    if OWNED_PRODUCT_PATTERN.search(text):
+        return ()
+    return tuple(aspect for aspect in ASPECTS if QUERY_ASPECT_PATTERNS[aspect].search(text))
+
+
+def strip_aspect_phrases(text):
+    """Blank out aspect wording so e.g. "noise cancelling" is not read as the brand Noise"""
+    for pattern in QUERY_ASPECT_PATTERNS.values():
+        text = pattern.sub(" ", text)
+    return text
@@ -0,0 +1,202 @@
+"""
+Headless HTTP API for the support bot.
+
+    python server.py --port 8000 --workers 4
+
+POST /v1/chat             {"message": "...", "session_id": optional, "stream": optional}
+                          JSON {"session_id", "response"}, or server-sent events
+                          ({"delta": ...} per chunk, then {"done": true, "session_id"})
+                          when "stream" is true
+POST /v1/sessions         create an empty session
+GET  /v1/sessions/<id>    the session's messages
+DELETE /v1/sessions/<id>
+GET  /healthz             liveness and the circuit state of each model provider
+GET  /metrics             this worker's metrics in Prometheus text format
+
+Sessions live in the configured session store, so with more than one worker
+process SESSION_STORE_PATH must point to a shared SQLite file. Metrics are
+per worker process; scrape each worker or run one worker per container.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.httpserver
+import tornado.ioloop
+import tornado.iostream
+import tornado.netutil
+import tornado.process
+import tornado.web
+
+from config import SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_THREADS, SESSION_STORE_PATH
+from engine import Session, stream_turn
+from llm_client import prewarm
+from metrics import METRICS
+from model_router import get_router
+from session_store import open_session_store
+
+logger = logging.getLogger("chatbot.server")
+
+SESSION_ID_PATTERN = re.compile(r"^[0-9A-Za-z_-]{1,64}$")
+
+_END = object()
+
+
+class SessionLocks:
+    """Per-session asyncio locks so one session's turns run in order within a worker"""
+
+    def __init__(self):
+        self._locks = {}  # session_id -> [lock, holders]
+
+    async def __call__(self, session_id):
+        entry = self._locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        await entry[0].acquire()
+        return entry
+
+    def release(self, session_id, entry):
+        entry[0].release()
+        entry[1] -= 1
+        if not entry[1]:
+            del self._locks[session_id]
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, store, executor, locks):
+        self.store = store
+        self.executor = executor
+        self.locks = locks
+
+    def run_blocking(self, function, *args):
+        """Run engine and store calls off the event loop"""
+        return asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def write_error(self, status_code, **kwargs):
+        self.finish({"error": self._reason})
+
+
+class ChatHandler(BaseHandler):
+    async def post(self):
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="Request body must be JSON")
+        message = body.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise tornado.web.HTTPError(400, reason="message is required")
+
+        session_id = body.get("session_id") or Session().session_id
+        if not isinstance(session_id, str) or not SESSION_ID_PATTERN.match(session_id):
+            raise tornado.web.HTTPError(400, reason="Invalid session_id")
+
+        lock = await self.locks(session_id)
+        try:
+            session = await self.run_blocking(self.store.load, session_id) or Session(session_id)
+            deltas = stream_turn(message, session)
+            if body.get("stream"):
+                await self._stream(deltas, session)
+            else:
+                response = await self.run_blocking("".join, deltas)
+                await self.run_blocking(self.store.save, session)
+                self.finish({"session_id": session.session_id, "response": response})
+        finally:
+            self.locks.release(session_id, lock)
+
+    async def _stream(self, deltas, session):
+        self.set_header("Content-Type", "text/event-stream")
+        self.set_header("Cache-Control", "no-cache")
+        try:
+            while True:
+                delta = await self.run_blocking(next, deltas, _END)
+                if delta is _END:
+                    break
+                self.write(f"data: {json.dumps({'delta': delta})}\n\n")
+                await self.flush()
+        except tornado.iostream.StreamClosedError:
+            # The client went away - finish the turn so the session stays consistent
+            await self.run_blocking(lambda: [None for _ in deltas])
+            await self.run_blocking(self.store.save, session)
+            return
+        await self.run_blocking(self.store.save, session)
+        self.finish(f"data: {json.dumps({'done': True, 'session_id': session.session_id})}\n\n")
+
+
+class SessionsHandler(BaseHandler):
+    async def post(self):
+        session = Session()
+        await self.run_blocking(self.store.save, session)
+        self.set_status(201)
+        self.finish({"session_id": session.session_id})
+
+
+class SessionHandler(BaseHandler):
+    async def get(self, session_id):
+        session = await self.run_blocking(self.store.load, session_id)
+        if session is None:
+            raise tornado.web.HTTPError(404, reason="Unknown session")
+        self.finish({"session_id": session.session_id, "messages": session.messages.to_list()})
+
+    async def delete(self, session_id):
+        await self.run_blocking(self.store.delete, session_id)
+        self.set_status(204)
+        self.finish()
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.finish({"status": "ok", "providers": get_router().stats()})
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.finish(METRICS.prometheus_text())
+
+
+def make_app(store=None, threads=SERVER_THREADS):
+    """Tornado application around the engine; store defaults to the configured session store"""
+    settings = {
+        "store": store or open_session_store(),
+        "executor": ThreadPoolExecutor(max_workers=threads, thread_name_prefix="engine"),
+        "locks": SessionLocks(),
+    }
+    return tornado.web.Application([
+        (r"/v1/chat", ChatHandler, settings),
+        (r"/v1/sessions", SessionsHandler, settings),
+        (r"/v1/sessions/([0-9A-Za-z_-]+)", SessionHandler, settings),
+        (r"/healthz", HealthHandler),
+        (r"/metrics", MetricsHandler),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the support bot over HTTP")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="worker processes sharing the port")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(levelname)s %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.workers > 1 and not SESSION_STORE_PATH:
+        parser.error("more than one worker needs a shared session store - set SESSION_STORE_PATH")
+
+    # Bind before forking so every worker accepts on the same socket. The
+    # catalog and indexes were loaded at import, so workers share those pages;
+    # background threads (LLM gateway, client pools) start lazily in each worker.
+    sockets = tornado.netutil.bind_sockets(args.port, args.host)
+    if args.workers > 1:
+        tornado.process.fork_processes(args.workers)
+
+    prewarm()
+    server = tornado.httpserver.HTTPServer(make_app())
+    server.add_sockets(sockets)
+    logger.info("Serving on http://%s:%d", args.host, args.port)
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main()
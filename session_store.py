@@ -0,0 +1,222 @@
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    SESSION_STORE_PATH,
+    SESSION_TTL,
+    SESSION_MEMORY_MAX,
+    SESSION_MEMORY_BYTES,
+    SESSION_IDLE_TTL,
+    SESSION_SPILL_PATH,
+)
+from engine import Session
+
+SESSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+UPDATED_INDEX = "CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)"
+
+SELECT_SESSION = "SELECT data, updated_at FROM sessions WHERE session_id = ?"
+UPSERT_SESSION = "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)"
+DELETE_SESSION = "DELETE FROM sessions WHERE session_id = ?"
+DELETE_EXPIRED = "DELETE FROM sessions WHERE updated_at < ?"
+
+# Expired sessions are purged at most this often (seconds)
+PURGE_INTERVAL = 300
+
+
+class SessionStore:
+    """Interface for loading and saving engine sessions by ID"""
+
+    def load(self, session_id):
+        """Return the session with this ID, or None if it is unknown or expired"""
+        raise NotImplementedError
+
+    def save(self, session):
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions held in this process, bounded by count and approximate bytes.
+
+    The least recently used sessions are evicted once either ceiling is
+    exceeded, and sessions idle for longer than idle_ttl leave memory on the
+    next access. With a spill store, evicted sessions are written there and
+    loaded back on demand, so a conversation can be resumed; without one they
+    are dropped. Sessions are not visible to other worker processes, so this
+    store is only suitable for a single worker.
+    """
+
+    def __init__(self, max_sessions=SESSION_MEMORY_MAX, max_bytes=SESSION_MEMORY_BYTES,
+                 idle_ttl=SESSION_IDLE_TTL, spill=None):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.spill = spill
+        self.total_bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # session_id -> [session, last_used, size]
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        """Pop idle and over-ceiling sessions, least recently used first (lock held)"""
+        evicted = []
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            over = len(self._entries) > self.max_sessions or self.total_bytes > self.max_bytes
+            if not over and entry[1] > now - self.idle_ttl:
+                break
+            del self._entries[session_id]
+            self.total_bytes -= entry[2]
+            self.evictions += 1
+            evicted.append(entry[0])
+        return evicted
+
+    def _spill(self, sessions):
+        # Written outside the lock so a slow disk doesn't stall other sessions
+        if self.spill is not None:
+            for session in sessions:
+                self.spill.save(session)
+
+    def load(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            evicted = self._evict(now)
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry[1] = now
+                self._entries.move_to_end(session_id)
+        self._spill(evicted)
+        if entry is not None:
+            return entry[0]
+        if self.spill is None:
+            return None
+        session = self.spill.load(session_id)
+        if session is not None:
+            self.save(session)
+        return session
+
+    def save(self, session):
+        now = time.monotonic()
+        size = session.size()
+        with self._lock:
+            entry = self._entries.pop(session.session_id, None)
+            if entry is not None:
+                self.total_bytes -= entry[2]
+            self._entries[session.session_id] = [session, now, size]
+            self.total_bytes += size
+            evicted = self._evict(now)
+        self._spill(evicted)
+
+    def delete(self, session_id):
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            if entry is not None:
+                self.total_bytes -= entry[2]
+        if self.spill is not None:
+            self.spill.delete(session_id)
+
+    def flush(self):
+        """Write every in-memory session to the spill store, e.g. at shutdown"""
+        with self._lock:
+            sessions = [entry[0] for entry in self._entries.values()]
+        self._spill(sessions)
+
+    def stats(self):
+        with self._lock:
+            sessions = len(self._entries)
+            return {
+                "sessions": sessions,
+                "bytes": self.total_bytes,
+                "bytes_per_session": round(self.total_bytes / sessions) if sessions else 0,
+                "evictions": self.evictions,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions stored as JSON in an SQLite file, shared by every worker process.
+
+    The database runs in WAL mode so readers in other processes are not
+    blocked by a writer, and each thread keeps its own connection.
+    """
+
+    def __init__(self, path, ttl=SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._last_purge = 0.0
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute(SESSION_SCHEMA)
+        connection.execute(UPDATED_INDEX)
+        connection.commit()
+
+    def _connection(self):
+        """This thread's connection, opened on first use"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, cached_statements=64)
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def load(self, session_id):
+        row = self._connection().execute(SELECT_SESSION, (session_id,)).fetchone()
+        if row is None or row[1] < time.time() - self.ttl:
+            return None
+        return Session.from_dict(json.loads(row[0]))
+
+    def save(self, session):
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute(UPSERT_SESSION, (session.session_id, json.dumps(session.to_dict()), now))
+            if now - self._last_purge > PURGE_INTERVAL:
+                self._last_purge = now
+                connection.execute(DELETE_EXPIRED, (now - self.ttl,))
+
+    def delete(self, session_id):
+        connection = self._connection()
+        with connection:
+            connection.execute(DELETE_SESSION, (session_id,))
+
+
+# One store per process, shared by every Streamlit session and rerun
+_store = None
+_store_lock = threading.Lock()
+
+
+def open_session_store(path=SESSION_STORE_PATH, spill_path=SESSION_SPILL_PATH):
+    """
+    The configured session store: SQLite when SESSION_STORE_PATH is set,
+    else memory, spilling evicted sessions to SESSION_SPILL_PATH if set.
+    """
+    if path:
+        return SQLiteSessionStore(path)
+    store = MemorySessionStore(spill=SQLiteSessionStore(spill_path) if spill_path else None)
+    if spill_path:
+        atexit.register(store.flush)
+    return store
+
+
+def get_session_store():
+    """The process-wide session store, opened on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = open_session_store()
+    return _store
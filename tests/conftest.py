@@ -0,0 +1,24 @@
+import os
+import sys
+
+# The modules live at the repository root and read their settings at import
+# time: keep the tests offline (no reachable model, no watcher threads, no
+# shared cache or profile files) before anything imports config
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.update(
+    LLM_BASE_URL="http://127.0.0.1:1/v1",
+    LLM_MAX_RETRIES="0",
+    LLM_HEDGE_ENABLED="0",
+    CATALOG_POLL_INTERVAL="0",
+    STREAM_RESPONSES="0",
+    RESPONSE_CACHE_ENABLED="0",
+    RESPONSE_CACHE_PATH="",
+    ORDER_STORE_PATH="",
+    SESSION_STORE_PATH="",
+    SESSION_SPILL_PATH="",
+    METRICS_PORT="0",
+    METRICS_JSONL_PATH="",
+    PROFILE_DIR="",
+)
@@ -0,0 +1,83 @@
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from catalog_store import get_catalog
+from config import CHAT_HISTORY_PAGE, CHAT_HISTORY_WINDOW
+from conftest import ROOT
+from engine import Session
+from profiler import get_profiler
+from session_store import get_session_store
+
+
+@pytest.fixture
+def app():
+    return AppTest.from_file(f"{ROOT}/app.py", default_timeout=30).run()
+
+
+def ask(app, prompt):
+    app.chat_input[0].set_value(prompt).run()
+    assert not app.exception
+    return get_session_store().load(app.session_state.session_id)
+
+
+def test_turn_is_rendered_and_recorded_once(app):
+    session = ask(app, "Where is my order 12345?")
+    assert [m["role"] for m in session.messages] == ["user", "assistant"]
+    assert [m.name for m in app.chat_message] == ["user", "assistant"]
+    assert app.chat_message[1].markdown[0].value == session.messages[-1]["content"]
+    record, _ = get_profiler().recent[-1]
+    assert record["session_id"] == session.session_id
+    assert "render" in record["spans"]
+
+    session = ask(app, "How long does shipping take?")
+    assert [m["content"] for m in session.messages][::2] == ["Where is my order 12345?", "How long does shipping take?"]
+
+
+def test_sidebar_shows_the_catalog_and_stage_latencies(app):
+    ask(app, "Where is my order 123?")
+    sidebar = " ".join(element.value for element in app.sidebar.markdown)
+    assert "| Whole turn |" in sidebar and "| Order lookup |" in sidebar
+    assert f"Products: {len(get_catalog())}," in sidebar
+
+
+def long_session(turns):
+    session = Session()
+    for turn in range(turns):
+        session.messages.append({"role": "user", "content": f"Question {turn}"})
+        session.messages.append({"role": "assistant", "content": f"Answer {turn}"})
+    get_session_store().save(session)
+    return session
+
+
+def resume(session):
+    app = AppTest.from_file(f"{ROOT}/app.py", default_timeout=30)
+    app.session_state["session_id"] = session.session_id
+    return app.run()
+
+
+def drawn(app):
+    return [message.markdown[0].value for message in app.chat_message]
+
+
+def test_history_shows_the_latest_window():
+    app = resume(long_session(25))
+    assert drawn(app) == [f"{kind} {turn}" for turn in range(15, 25) for kind in ("Question", "Answer")]
+    assert app.button(key="load_earlier").label == "Load earlier messages (30 more)"
+    assert len(app.session_state["rendered_messages"]) == CHAT_HISTORY_WINDOW
+
+
+def test_load_earlier_pages_back_to_the_start():
+    app = resume(long_session(25))
+    app.button(key="load_earlier").click().run()
+    assert len(drawn(app)) == CHAT_HISTORY_WINDOW + CHAT_HISTORY_PAGE
+    assert drawn(app)[0] == "Question 5"
+    assert app.button(key="load_earlier").label == "Load earlier messages (10 more)"
+    app.button(key="load_earlier").click().run()
+    assert drawn(app)[0] == "Question 0" and len(drawn(app)) == 50
+    assert not [button for button in app.button if button.key == "load_earlier"]
+
+
+def test_short_history_has_no_load_earlier_button():
+    app = resume(long_session(3))
+    assert len(drawn(app)) == 6
+    assert not [button for button in app.button if button.key == "load_earlier"]
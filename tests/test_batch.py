@@ -0,0 +1,117 @@
+import io
+import json
+import threading
+import time
+
+from batch import BatchRunner, read_checkpoint, read_conversations
+
+
+class FakeEngine:
+    """Answers "echo: <message>" and tracks how many turns run at once"""
+
+    Session = dict
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def run_turn(self, message, session):
+        with self._lock:
+            self.calls.append(message)
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(self.delay)
+            if message == "boom":
+                raise RuntimeError("model exploded")
+            return f"echo: {message}"
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def is_degraded_response(self, response):
+        return False
+
+
+def conversations(*turn_lists):
+    return [(index, f"c{index}", turns) for index, turns in enumerate(turn_lists)]
+
+
+def records(output):
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_every_conversation_gets_one_result_line():
+    engine = FakeEngine()
+    output = io.StringIO()
+    runner = BatchRunner(engine, output, concurrency=2)
+    runner.run(conversations(["hi", "more"], ["other"]))
+    by_id = {record["id"]: record for record in records(output)}
+    assert by_id["c0"]["turns"] == [{"user": "hi", "assistant": "echo: hi"}, {"user": "more", "assistant": "echo: more"}]
+    assert by_id["c1"]["index"] == 1 and not by_id["c1"]["error"]
+    assert runner.stats["conversations"] == 2 and runner.stats["turns"] == 3
+
+
+def test_identical_conversations_run_once():
+    engine = FakeEngine(delay=0.01)
+    output = io.StringIO()
+    runner = BatchRunner(engine, output, concurrency=2)
+    runner.run(conversations(["same"], ["same"], ["different"], ["same"]))
+    assert sorted(engine.calls) == ["different", "same"]
+    duplicates = [record for record in records(output) if "duplicate_of" in record]
+    assert sorted(record["id"] for record in duplicates) == ["c1", "c3"]
+    assert all(record["duplicate_of"] == "c0" and record["turns"][0]["assistant"] == "echo: same" for record in duplicates)
+    assert runner.stats["duplicates"] == 2 and runner.stats["llm_conversations"] == 2
+
+
+def test_concurrency_is_bounded():
+    engine = FakeEngine(delay=0.02)
+    runner = BatchRunner(engine, io.StringIO(), concurrency=3)
+    runner.run(conversations(*[[f"q{i}"] for i in range(20)]))
+    assert len(engine.calls) == 20
+    assert engine.peak <= 3
+
+
+def test_failed_turn_is_recorded_as_an_error():
+    output = io.StringIO()
+    runner = BatchRunner(FakeEngine(), output, concurrency=1)
+    runner.run(conversations(["fine", "boom", "never"]))
+    (record,) = records(output)
+    assert record["error"] is True
+    assert record["turns"][-1] == {"user": "boom", "exception": "RuntimeError: model exploded"}
+    assert runner.stats["errors"] == 1
+
+
+def test_checkpoint_resumes_after_an_interrupted_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text(
+        json.dumps({"id": "c0", "error": False}) + "\n"
+        + json.dumps({"id": "c1", "error": True}) + "\n"
+        + '{"id": "c2", "tur',
+        encoding="utf-8",
+    )
+    assert read_checkpoint(str(path)) == {"c0", "c1"}
+    # The cut-off line is gone, so new results start on a clean line
+    assert path.read_text(encoding="utf-8").endswith("}\n")
+    assert read_checkpoint(str(path), retry_errors=True) == {"c0"}
+    assert read_checkpoint(str(tmp_path / "missing.jsonl")) == set()
+
+    engine = FakeEngine()
+    with open(path, "a", encoding="utf-8") as output:
+        runner = BatchRunner(engine, output, concurrency=2)
+        runner.run(conversations(["a"], ["b"], ["c"]), done={"c0", "c1"})
+    assert engine.calls == ["c"] and runner.stats["skipped"] == 2
+    assert [json.loads(line)["id"] for line in path.read_text(encoding="utf-8").splitlines()] == ["c0", "c1", "c2"]
+
+
+def test_read_conversations(tmp_path):
+    path = tmp_path / "tickets.jsonl"
+    path.write_text("\n".join([
+        json.dumps({"id": 7, "turns": ["hi"]}),
+        "",
+        json.dumps({"messages": [{"role": "user", "content": "q"}, {"role": "assistant", "content": "a"}]}),
+    ]), encoding="utf-8")
+    assert list(read_conversations(str(path))) == [(0, "7", ["hi"]), (2, "2", ["q"])]
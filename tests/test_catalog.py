@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+import engine
+from catalog import (
+    SnippetLegend,
+    format_compact_context,
+    format_compact_row,
+    format_product_context,
+    load_products,
+    parse_product_name,
+    product_from_row,
+)
+from catalog_store import get_catalog
+from history import estimate_tokens
+
+
+@pytest.fixture(scope="module")
+def products():
+    return load_products()
+
+
+def test_parse_product_name():
+    assert parse_product_name("JBL Wireless Headphones - Red Edition") == ("JBL", "Wireless Headphones", "Red")
+    assert parse_product_name("Acme Buds") == ("Acme", "Buds", "")
+
+
+def test_numeric_cells_are_numbers():
+    product = product_from_row({
+        "Product Name": " Sony Earbuds - Black Edition ", "Discounted Price": "1,299", "Actual Price": "2,599",
+        "Discount Percentage": "50", "Rating": "4.3", "Rating Count": "n/a", "About Product": "Good.", "Reviews": "Nice",
+    }, 7)
+    assert product["discounted_price"] == 1299 and product["actual_price"] == 2599
+    assert product["rating"] == 4.3 and product["rating_count"] == 0
+    assert product["product_name"] == "Sony Earbuds - Black Edition" and product["color"] == "Black"
+
+
+def test_legend_codes_shared_snippets_in_a_fixed_order(products):
+    legend = SnippetLegend(products)
+    shuffled = list(products)
+    random.Random(3).shuffle(shuffled)
+    assert SnippetLegend(shuffled).format() == legend.format()
+    codes = list(legend.codes.values())
+    assert codes == [f"S{i}" for i in range(1, len(codes) + 1)]
+    # A snippet only one product uses stays inline
+    assert "Only this product says so" not in legend.codes
+    assert legend.encode(["Only this product says so"]) == "Only this product says so"
+
+
+def test_compact_row_uses_bare_numbers_and_legend_codes(products):
+    legend = SnippetLegend(products)
+    product = products[0]
+    row = format_compact_row(product, legend)
+    cells = row.split(" | ")
+    assert cells[0] == product["product_name"]
+    assert cells[1:6] == [str(product[field]) for field in
+                          ("discounted_price", "actual_price", "discount_percentage", "rating", "rating_count")]
+    assert '"' not in row
+    assert any(code in cells[-1] for code in legend.codes.values())
+    # The about sentence that only restates the name is left out
+    assert f"{product['brand']} {product['type']} in {product['color']}" not in row
+
+
+def test_compact_table_is_byte_stable(products):
+    legend = SnippetLegend(products)
+    picked = products[3:9]
+    table = format_compact_context(picked, legend)
+    assert format_compact_context(list(reversed(picked)), legend) == table
+    rows = {}
+    assert format_compact_context(picked, legend, rows) == table
+    assert format_compact_context(picked, legend, rows) == table
+    assert set(rows) == {p["product_id"] for p in picked}
+
+
+def test_compact_table_is_smaller_than_json(products):
+    legend = SnippetLegend(products)
+    compact = legend.format() + "\n" + format_compact_context(products, legend)
+    assert estimate_tokens(compact) < 0.6 * estimate_tokens(format_product_context(products))
+
+
+def test_system_prompt_prefix_is_shared_across_messages():
+    catalog = get_catalog()
+    prefix, version = engine.catalog_prompt_prefix(catalog)
+    assert "SNIPPETS:" in prefix and catalog.legend.format() in prefix
+    prompts = [engine.build_system_prompt(message, engine.Session(), catalog)
+               for message in ("Show me JBL earbuds", "Is COD available?", "Sony headphones under 3000")]
+    assert all(prompt.startswith(prefix) for prompt in prompts)
+    assert len({prompt.split("PRODUCT_DATA:")[1] for prompt in prompts}) > 1
+    assert engine.catalog_prompt_prefix(catalog) == (prefix, version)
+    # The version follows the legend
+    assert engine.system_prompt_prefix("S1: Something else.")[1] != version
@@ -0,0 +1,160 @@
+import csv
+import shutil
+import threading
+import time
+
+import pytest
+
+from catalog import format_compact_context
+from catalog_store import FULL_REBUILD_FRACTION, CatalogStore, build_snapshot, diff_snapshot
+from config import CATALOG_PATH
+from retrieval import BM25Index
+
+
+@pytest.fixture
+def catalog_path(tmp_path):
+    path = tmp_path / "products.csv"
+    shutil.copy(CATALOG_PATH, path)
+    return str(path)
+
+
+def test_concurrent_readers_start_one_watcher(catalog_path, monkeypatch):
+    watchers = []
+    started = threading.Event()
+
+    def watch(store):
+        watchers.append(store)
+        started.set()
+    monkeypatch.setattr(CatalogStore, "_watch", watch)
+    store = CatalogStore(catalog_path, poll_interval=60)
+    barrier = threading.Barrier(8)
+
+    def read():
+        barrier.wait()
+        store.current()
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert started.wait(2)
+    time.sleep(0.05)  # any second watcher has started by now
+    assert watchers == [store]
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def edit_rows(rows):
+    """Drop rows 2 and 5, reprice row 7 and append a new product"""
+    edited = [dict(row) for i, row in enumerate(rows) if i not in (2, 5)]
+    edited[5]["Discounted Price"] = "999"
+    edited.append(dict(rows[0], **{"Product Name": "Acme Wireless Earbuds - Teal Edition", "Reviews": "Loud and clear."}))
+    return edited
+
+
+def assert_same_catalog(snapshot, fresh):
+    """snapshot answers like a snapshot built from scratch, product ids aside"""
+    names = lambda products: [p["product_name"] for p in products]
+    assert names(snapshot.products) == names(fresh.products)
+    assert snapshot.snippet_counts == fresh.snippet_counts
+    assert snapshot.legend.codes == fresh.legend.codes
+    assert snapshot.brands == fresh.brands
+    for query in ["acme teal earbuds", "sony wireless", "jbl red headphones", "battery life"]:
+        # Every match, as ties are ordered by product id
+        ours = sorted((round(score, 9), snapshot.by_id[i]["product_name"]) for i, score in snapshot.index.search(query, 100))
+        theirs = sorted((round(score, 9), fresh.by_id[i]["product_name"]) for i, score in fresh.index.search(query, 100))
+        assert ours == theirs, query
+    for brand in fresh.facets.values("brand"):
+        assert snapshot.facets.aggregate(brand={brand}) == pytest.approx(fresh.facets.aggregate(brand={brand}))
+    name = "Acme Wireless Earbuds - Teal Edition"
+    assert [snapshot.by_id[i]["product_name"] for i in snapshot.names.resolve(name, 1)] == [name]
+
+
+def test_diff_snapshot_applies_row_changes(catalog_path):
+    old = build_snapshot(catalog_path)
+    rows = read_csv(catalog_path)
+    write_csv(catalog_path, edit_rows(rows))
+
+    snapshot, added, removed = diff_snapshot(old, catalog_path)
+    assert sorted(removed) == [2, 5, 7]
+    assert sorted(added) == [old.next_id, old.next_id + 1]
+    assert snapshot.version != old.version
+    # Unchanged rows are the very same products, ids included
+    assert snapshot.by_id[0] is old.by_id[0] and snapshot.by_id[29] is old.by_id[29]
+    assert not set(removed) & set(snapshot.by_id)
+    assert_same_catalog(snapshot, build_snapshot(catalog_path))
+    # The old snapshot is untouched for turns still reading it
+    assert len(old) == 30 and [i for i, _ in old.index.search("acme", 5)] == []
+
+
+def test_rendered_rows_survive_while_the_legend_holds(catalog_path):
+    old = build_snapshot(catalog_path)
+    format_compact_context(old.products, old.legend, old.rows)
+    rows = read_csv(catalog_path)
+    rows[4]["Discounted Price"] = "1"
+    write_csv(catalog_path, rows)
+    snapshot, added, removed = diff_snapshot(old, catalog_path)
+    assert snapshot.legend.codes == old.legend.codes
+    assert set(snapshot.rows) == set(old.rows) - {4}
+    assert format_compact_context(snapshot.products, snapshot.legend, snapshot.rows) == \
+        format_compact_context(snapshot.products, snapshot.legend)
+
+
+def test_unchanged_rows_give_no_snapshot(catalog_path):
+    old = build_snapshot(catalog_path)
+    rows = read_csv(catalog_path)
+    write_csv(catalog_path, rows)
+    assert diff_snapshot(old, catalog_path) == (None, {}, [])
+
+
+def test_large_changes_rebuild_from_scratch(catalog_path, monkeypatch):
+    old = build_snapshot(catalog_path)
+    rows = read_csv(catalog_path)
+    updates = []
+    real_updated = BM25Index.updated
+    monkeypatch.setattr(BM25Index, "updated", lambda index, *args: updates.append(args) or real_updated(index, *args))
+
+    write_csv(catalog_path, edit_rows(rows))
+    diff_snapshot(old, catalog_path)
+    assert len(updates) == 1
+
+    # Repricing two thirds of the rows crosses FULL_REBUILD_FRACTION
+    repriced = [dict(row, **{"Discounted Price": "1"}) if i % 3 else row for i, row in enumerate(rows)]
+    write_csv(catalog_path, repriced)
+    snapshot, added, removed = diff_snapshot(old, catalog_path)
+    assert len(added) + len(removed) > FULL_REBUILD_FRACTION * len(snapshot)
+    assert len(updates) == 1
+    assert [p["product_name"] for p in snapshot.products] == [row["Product Name"].strip() for row in repriced]
+
+
+def test_store_swaps_in_the_new_snapshot(catalog_path):
+    store = CatalogStore(catalog_path, poll_interval=0)
+    before = store.current()
+    assert not store.check()
+    rows = read_csv(catalog_path)
+    write_csv(catalog_path, edit_rows(rows))
+    assert store.check()
+    assert store.current() is not before and len(store.current()) == len(before) - 1
+    assert len(before) == len(rows)
+
+
+def test_broken_file_keeps_the_live_snapshot(catalog_path):
+    store = CatalogStore(catalog_path, poll_interval=0)
+    live = store.current()
+    with open(catalog_path, "w", encoding="utf-8") as f:
+        f.write("Product Name,Rating\nhalf a row")
+    with pytest.raises(Exception):
+        store.check()
+    assert store.current() is live
+    # Reported once, not on every poll
+    assert not store.check()
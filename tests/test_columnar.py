@@ -0,0 +1,81 @@
+import shutil
+
+import pytest
+
+import engine
+from catalog import format_compact_context
+from catalog_store import CatalogStore, build_snapshot
+from columnar_catalog import ColumnarSnapshot, build_columnar, is_columnar
+from config import CATALOG_PATH
+from facets import FACETS
+from product_query import answer_product_query
+
+QUERIES = ["sony wireless headphones", "jbl red", "battery life for calls", "bluetooth speaker"]
+
+
+@pytest.fixture(scope="module")
+def snapshots(tmp_path_factory):
+    """(CSV snapshot, columnar snapshot) of the same catalog"""
+    path = str(tmp_path_factory.mktemp("columnar") / "catalog.col")
+    assert build_columnar(CATALOG_PATH, path) == 30
+    return build_snapshot(CATALOG_PATH), ColumnarSnapshot(path)
+
+
+def test_is_columnar(snapshots):
+    assert is_columnar(snapshots[1].catalog.path)
+    assert not is_columnar(CATALOG_PATH)
+
+
+def test_products_round_trip(snapshots):
+    csv_snapshot, columnar = snapshots
+    assert len(columnar) == len(csv_snapshot)
+    assert [dict(view) for view in columnar.products] == csv_snapshot.products
+    assert dict(columnar.by_id[7]) == csv_snapshot.by_id[7]
+    assert columnar.version == csv_snapshot.version
+    assert columnar.brands == csv_snapshot.brands
+
+
+def test_indexes_answer_alike(snapshots):
+    csv_snapshot, columnar = snapshots
+    for query in QUERIES:
+        # Ties may come back in another order, so compare every match
+        expected = sorted((doc_id, round(score, 9)) for doc_id, score in csv_snapshot.index.search(query, 100))
+        assert sorted((doc_id, round(score, 9)) for doc_id, score in columnar.index.search(query, 100)) == expected
+    assert columnar.index.popular(5) == csv_snapshot.index.popular(5, csv_snapshot.by_id)
+    for name in ["JBL Wireless Headphones - Red Edition", "the grey ptron ones", "sony earbuds"]:
+        assert columnar.names.resolve(name, 6) == csv_snapshot.names.resolve(name, 6)
+    for facet in FACETS:
+        assert columnar.facets.values(facet) == csv_snapshot.facets.values(facet)
+        for value in csv_snapshot.facets.values(facet):
+            assert columnar.facets.aggregate(**{facet: {value}}) == pytest.approx(
+                csv_snapshot.facets.aggregate(**{facet: {value}}))
+
+
+def test_prompt_and_answers_match(snapshots):
+    csv_snapshot, columnar = snapshots
+    assert columnar.legend.codes == csv_snapshot.legend.codes
+    assert format_compact_context(columnar.products, columnar.legend) == \
+        format_compact_context(csv_snapshot.products, csv_snapshot.legend)
+    for message in ["Show me JBL wireless earbuds", "Is COD available?"]:
+        assert engine.build_system_prompt(message, engine.Session(), columnar) == \
+            engine.build_system_prompt(message, engine.Session(), csv_snapshot)
+    for question in ["cheapest wired earphones", "highest rated Sony headphones", "headphones under 2000"]:
+        assert answer_product_query(question, columnar.table) == answer_product_query(question, csv_snapshot.table)
+
+
+def test_store_reopens_a_rebuilt_file(tmp_path):
+    source = tmp_path / "catalog.csv"
+    shutil.copy(CATALOG_PATH, source)
+    path = str(tmp_path / "catalog.col")
+    build_columnar(str(source), path)
+    store = CatalogStore(path, poll_interval=0)
+    live = store.current()
+    assert isinstance(live, ColumnarSnapshot)
+
+    with open(source, "a", encoding="utf-8") as f:
+        f.write('Acme Wireless Earbuds - Teal Edition,999,1999,50,4.1,12,Loud.,Clear sound.\n')
+    build_columnar(str(source), path)
+    assert store.check()
+    assert len(store.current()) == 31 and len(live) == 30
+    # The old mapping stays readable for turns still using it
+    assert dict(live.products[29])["product_id"] == 29
@@ -0,0 +1,69 @@
+import pytest
+
+import engine
+from metrics import METRICS
+from response_cache import ResponseCache
+
+ROUTES = ["escalation", "order", "faq", "structured_query", "name_resolution", "cache", "llm"]
+
+
+def route(message, session=None):
+    """The route process_message took for message, and its response text"""
+    before = {name: METRICS.counter("turns", route=name) for name in ROUTES}
+    response = engine.process_message(message, session or engine.Session())
+    taken = [name for name in ROUTES if METRICS.counter("turns", route=name) != before[name]]
+    assert len(taken) == 1, taken
+    return taken[0], response
+
+
+@pytest.mark.parametrize("message, expected", [
+    # Escalation is checked before anything else, even a known order
+    ("I want to speak to a human about order 123", "escalation"),
+    # Known orders are answered before the knowledge base
+    ("Where is my order 123 and how long does shipping take?", "order"),
+    ("I want to return order 456", "order"),
+    ("Do you have cash on delivery?", "faq"),
+    ("Compare Sony and JBL earphones", "structured_query"),
+    ("How much is the JBL Wireless Headphones?", "name_resolution"),
+    # Unknown orders and policy questions about an order go to the model
+    ("Where is my order 999?", "llm"),
+    ("Is COD available for order 123?", "llm"),
+    # Questions about a product the customer owns are not shopping queries
+    ("I paid more than 5000 for my Sony headphones, which is better Sony or JBL?", "llm"),
+])
+def test_routing_order(message, expected):
+    assert route(message)[0] == expected
+
+
+def test_order_answers_come_from_the_store():
+    assert route("Where is my order 123?")[1].startswith("Your order #123 has been shipped")
+    assert "initiated a return for order #456" in route("I want to return order 456")[1]
+
+
+def test_repeated_confusion_escalates():
+    session = engine.Session()
+    session.failed_attempts = 2
+    assert route("Which headphones are good for travel?", session)[0] == "escalation"
+    assert session.failed_attempts == 0
+
+
+def test_cache_is_checked_before_the_model(monkeypatch):
+    cache = ResponseCache(max_entries=10, ttl=60)
+    monkeypatch.setattr(engine, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(engine, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(engine, "get_llm_response", lambda *args, **kwargs: "Try the Sony WH-1000.")
+    question = "Which headphones are good for travel and long flights?"
+    assert route(question) == ("llm", "Try the Sony WH-1000.")
+    assert route(question) == ("cache", "Try the Sony WH-1000.")
+    # Order questions are never served from the cache
+    assert route("Where is my order 999?")[0] == "llm"
+    assert route("Where is my order 999?")[0] == "llm"
+
+
+def test_run_turn_records_both_messages():
+    session = engine.Session()
+    response = engine.run_turn("Where is my order 123?", session)
+    assert session.messages.to_list() == [
+        {"role": "user", "content": "Where is my order 123?"},
+        {"role": "assistant", "content": response},
+    ]
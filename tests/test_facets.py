@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+import engine
+from catalog import load_products
+from catalog_store import get_catalog
+from facets import FACETS, FacetIndex, group_records, parse_comparison, summarize
+from metrics import METRICS
+from product_table import ProductTable
+
+
+@pytest.fixture(scope="module")
+def products():
+    return load_products()
+
+
+def brute_force(products, **selection):
+    """The aggregate() summary computed by scanning every product"""
+    matching = [p for p in products if all(p[facet] in values for facet, values in selection.items())]
+    if not matching:
+        return None
+    return {
+        "count": len(matching),
+        "min_price": min(p["discounted_price"] for p in matching),
+        "max_price": max(p["discounted_price"] for p in matching),
+        "avg_price": sum(p["discounted_price"] for p in matching) / len(matching),
+        "avg_rating": sum(p["rating"] for p in matching) / len(matching),
+        "rating_count": sum(p["rating_count"] for p in matching),
+        "best_discount": max(p["discount_percentage"] for p in matching),
+    }
+
+
+def selections(products):
+    brands = sorted({p["brand"] for p in products})
+    types = sorted({p["type"] for p in products})
+    colors = sorted({p["color"] for p in products})
+    return [
+        {"brand": {brands[0]}},
+        {"brand": set(brands[:3])},
+        {"type": {types[0]}, "color": set(colors[:2])},
+        {"brand": set(brands[1:4]), "type": set(types), "color": {colors[-1]}},
+        {"brand": {"No Such Brand"}},
+    ]
+
+
+def assert_same(summary, expected):
+    if expected is None:
+        assert summary is None
+        return
+    assert summary == pytest.approx(expected)
+
+
+def test_aggregate_matches_a_scan(products):
+    index = FacetIndex(products)
+    for selection in selections(products):
+        assert_same(index.aggregate(**selection), brute_force(products, **selection))
+    assert index.aggregate() is None
+    assert index.values("brand") == {p["brand"] for p in products}
+
+
+def test_precomputed_records_match(products):
+    index = FacetIndex.from_records(group_records(ProductTable(products)))
+    for selection in selections(products):
+        assert_same(index.aggregate(**selection), brute_force(products, **selection))
+
+
+def test_updated_matches_a_rebuild(products):
+    rng = random.Random(5)
+    old = FacetIndex(products)
+    removed = rng.sample(products, 8)
+    added = [dict(p, product_id=1000 + i, discounted_price=p["discounted_price"] + 1) for i, p in enumerate(removed[:3])]
+    current = [p for p in products if p not in removed] + added
+    index = old.updated(added, removed)
+    fresh = FacetIndex(current)
+    assert index.groups.keys() == fresh.groups.keys()
+    for key, stats in fresh.groups.items():
+        assert summarize([index.groups[key]]) == pytest.approx(summarize([stats]))
+    # The old index is left untouched for readers of the previous snapshot
+    for selection in selections(products):
+        assert_same(old.aggregate(**selection), brute_force(products, **selection))
+
+
+def catalog_values():
+    facets = get_catalog().facets
+    return {facet: facets.values(facet) for facet in FACETS}
+
+
+@pytest.mark.parametrize("message, facet, labels", [
+    ("Compare Sony and JBL earphones", "brand", ["Sony", "JBL"]),
+    ("Which is better, Sony or JBL?", "brand", ["Sony", "JBL"]),
+    ("How do Sony and JBL compare?", "brand", ["Sony", "JBL"]),
+    ("compare wired vs wireless earphones", "type", ["Wired Earphones", "Wireless"]),
+])
+def test_parse_comparison(message, facet, labels):
+    parsed = parse_comparison(message, catalog_values())
+    assert parsed is not None
+    assert parsed[0] == facet
+    assert [label for label, _ in parsed[1]] == labels
+
+
+QUALIFIED = [
+    "Which is better for calls, Sony or JBL?",
+    "Compare Sony and JBL for gaming",
+    "is the sony or jbl better for running",
+]
+
+
+@pytest.mark.parametrize("message", QUALIFIED)
+def test_comparison_by_a_criterion_is_not_parsed(message):
+    assert parse_comparison(message, catalog_values()) is None
+
+
+@pytest.mark.parametrize("message", QUALIFIED)
+def test_engine_sends_qualified_comparisons_to_the_model(message):
+    before = METRICS.counter("turns", route="structured_query")
+    response = engine.process_message(message, engine.Session())
+    assert METRICS.counter("turns", route="structured_query") == before
+    assert not response.startswith("Here's how")
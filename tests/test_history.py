@@ -0,0 +1,68 @@
+from history import ConversationHistory, message_tokens
+
+
+def conversation(turns, words=20):
+    messages = []
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"Question {turn}. " + "word " * words})
+        messages.append({"role": "assistant", "content": f"Answer {turn}. " + "word " * words})
+    return messages
+
+
+def test_short_history_is_sent_verbatim():
+    history = ConversationHistory(token_budget=1000, keep_turns=4, summary_budget=200)
+    messages = history.build("system", conversation(2), "next")
+    assert [m["role"] for m in messages] == ["system", "user", "assistant", "user", "assistant", "user"]
+    assert history.last_metrics["summarized_messages"] == 0
+
+
+def test_older_turns_are_summarized_once():
+    history = ConversationHistory(token_budget=1000, keep_turns=2, summary_budget=200)
+    past = conversation(5)
+    messages = history.build("system", past, "next")
+    assert messages[1]["role"] == "system" and messages[1]["content"].startswith("Summary")
+    assert "- Customer: Question 0." in messages[1]["content"]
+    assert messages[2:-1] == past[-4:]
+    assert history.summarized_count == 6
+    # The next turn only folds the two messages that left the window
+    lines = len(history.summary_lines)
+    history.build("system", past + conversation(1), "next")
+    assert len(history.summary_lines) == lines + 2
+
+
+def test_token_budget_shrinks_the_window():
+    history = ConversationHistory(token_budget=120, keep_turns=4, summary_budget=40)
+    past = conversation(4, words=40)
+    messages = history.build("system", past, "next")
+    metrics = history.last_metrics
+    assert metrics["history_tokens"] <= 120
+    assert metrics["verbatim_messages"] < len(past)
+    assert sum(message_tokens(m) for m in messages[2:-1]) == metrics["history_tokens"] - message_tokens(messages[1])
+    assert metrics["saved_tokens"] == metrics["full_history_tokens"] - metrics["history_tokens"]
+
+
+def test_summary_budget_drops_the_oldest_lines():
+    history = ConversationHistory(token_budget=2000, keep_turns=1, summary_budget=30)
+    history.build("system", conversation(10), "next")
+    assert history.summary_tokens <= 30
+    assert history.dropped_lines > 0
+    assert "(oldest parts omitted)" in history.summary_message()["content"]
+
+
+def test_offset_rebases_after_the_ring_buffer_drops_messages():
+    history = ConversationHistory(token_budget=1000, keep_turns=2, summary_budget=500)
+    past = conversation(5)
+    history.build("system", past, "next")
+    summarized = history.summarized_count
+    # The session dropped its two oldest messages, both already summarized
+    history.build("system", past[2:] + conversation(1), "next", offset=2)
+    assert history.summarized_count == summarized
+    assert history.dropped_lines == 0
+
+
+def test_state_round_trip():
+    history = ConversationHistory(token_budget=1000, keep_turns=2, summary_budget=200)
+    history.build("system", conversation(4), "next")
+    restored = ConversationHistory(token_budget=1000, keep_turns=2, summary_budget=200)
+    restored.load_dict(history.to_dict())
+    assert restored.to_dict() == history.to_dict()
@@ -0,0 +1,52 @@
+import re
+
+import pytest
+
+from engine import INTENT_ROUTER
+from intent_router import IntentRouter, _trie_pattern
+
+
+@pytest.mark.parametrize("message, intents", [
+    ("Where is my order 12345?", {"order_status"}),
+    ("I want to return my earphones", {"return_refund", "faq:returns", "product"}),
+    ("Do you have cash on delivery?", {"faq:payment"}),
+    ("How long does shipping take?", {"faq:shipping"}),
+    ("Can I cancel my order?", {"faq:cancellation"}),
+    ("Is there a warranty on Sony headphones?", {"faq:warranty", "product"}),
+    ("I want to speak to a human", {"escalation"}),
+    ("Show me noise cancelling headphones", {"product"}),
+    ("Hello there", set()),
+])
+def test_route(message, intents):
+    assert INTENT_ROUTER.route(message).intents == intents
+
+
+def test_order_ids_and_matches_in_message_order():
+    result = INTENT_ROUTER.route("Track   ORDER 42 and refund order 7")
+    assert result.order_ids == ("42", "7")
+    assert result.matches == ("track", "refund")
+    assert result.order_status and result.return_refund
+    assert result.faq_topics == {"order", "returns"}
+
+
+def test_keywords_match_as_word_prefixes():
+    router = IntentRouter({"a": ["return"], "b": ["ship"]})
+    assert router.route("Returned items").intents == {"a"}
+    assert router.route("Free shipping?").intents == {"b"}
+    # Only at the start of a word
+    assert router.route("relationship").intents == frozenset()
+
+
+def test_longer_keyword_fires_the_prefix_owners_too():
+    router = IntentRouter({"short": ["track"], "long": ["tracking number"]})
+    result = router.route("what is my tracking number")
+    assert result.matches == ("tracking number",)
+    assert result.intents == {"short", "long"}
+
+
+def test_trie_pattern_matches_like_an_alternation():
+    words = ["pay", "payment", "paypal", "card", "cash on delivery", "cod", "c"]
+    trie = re.compile(r"\b(?:" + _trie_pattern(words) + ")")
+    longest_first = re.compile(r"\b(?:" + "|".join(sorted(map(re.escape, words), key=len, reverse=True)) + ")")
+    for text in ["paypal or payment", "cod cash on delivery", "a card", "pa", "c d"]:
+        assert trie.findall(text) == longest_first.findall(text), text
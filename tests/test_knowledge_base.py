@@ -0,0 +1,71 @@
+import ast
+import os
+
+import pytest
+
+from conftest import ROOT
+from engine import INTENT_ROUTER
+from knowledge_base import get_knowledge_base
+
+# Expected entry of each order question in the app's sidebar examples; None
+# when no entry answers it and the question goes to the LLM
+ORDER_EXAMPLES = {
+    "I didn’t get my order confirmation SMS. What should I do?": None,
+    "What happens if my headphones arrive broken?": "return-eligibility",
+    "How long will my refund take?": "faq-refund-time",
+    "My payment failed but money was deducted. What happens now?": "faq-payment-deducted",
+}
+
+
+def example_queries():
+    """(section, question) pairs of app.EXAMPLE_QUERIES, read without running the app"""
+    with open(os.path.join(ROOT, "app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    text = next(
+        node.value.value for node in tree.body
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "EXAMPLE_QUERIES" for t in node.targets)
+    )
+    section = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#"):
+            section = line.strip("# :")
+        elif line.startswith("-"):
+            yield section, line.lstrip("- ")
+
+
+def answered_by(question):
+    kb = get_knowledge_base()
+    text = kb.answer(question)
+    return next(entry["id"] for entry in kb.entries if entry["text"] == text) if text else None
+
+
+@pytest.mark.parametrize("section, question", list(example_queries()))
+def test_example_queries(section, question):
+    if section == "Order Related":
+        assert question in ORDER_EXAMPLES, "add the expected entry of the new example"
+        assert answered_by(question) == ORDER_EXAMPLES[question]
+    else:
+        # The engine only asks the knowledge base about policy topics
+        assert not INTENT_ROUTER.route(question).faq_topics or answered_by(question) is None
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("Is COD available for orders above 5000?", "faq-cod"),
+    ("Is COD available for orders above ₹5,000?", "faq-cod"),
+    ("Can I pay on delivery?", "faq-cod"),
+    ("My headphones are not working, what should I do?", "faq-not-working"),
+    ("My order is late, what should I do?", "faq-package-delayed"),
+    ("How do I know my order is confirmed?", "order-confirmation"),
+    # Unknown terms, or two entries scoring alike, go to the LLM
+    ("Can I pay with bitcoin?", None),
+    ("Can I cancel my order?", None),
+    ("When will I get my refund?", None),
+])
+def test_answer(question, expected):
+    assert answered_by(question) == expected
+
+
+def test_example_sections_found():
+    sections = {section for section, _ in example_queries()}
+    assert sections == {"Product Related", "Order Related"}
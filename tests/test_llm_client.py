@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+import httpx
+import openai
+import pytest
+
+import llm_client
+from config import LLM_CONNECT_TIMEOUT, LLM_POOL_TIMEOUT, LLM_READ_TIMEOUT
+from llm_client import backoff_delay, get_client, with_retries, with_retries_async
+
+
+def connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "http://127.0.0.1:1/v1/chat/completions"))
+
+
+@pytest.fixture
+def retries(monkeypatch):
+    delays = []
+    monkeypatch.setattr(llm_client, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(llm_client.time, "sleep", delays.append)
+    return delays
+
+
+def flaky(failures, error=connection_error):
+    """A call that raises error() failures times before answering"""
+    calls = []
+
+    def call():
+        calls.append(True)
+        if len(calls) <= failures:
+            raise error()
+        return "answer"
+    return call, calls
+
+
+def test_one_client_per_provider_across_threads():
+    clients = []
+    barrier = threading.Barrier(8)
+
+    def build():
+        barrier.wait()
+        clients.append(get_client("sk-shared", "http://127.0.0.1:1/v1"))
+    threads = [threading.Thread(target=build) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(client) for client in clients}) == 1
+    assert get_client("sk-other", "http://127.0.0.1:1/v1") is not clients[0]
+
+
+def test_client_has_timeouts_and_no_retries_of_its_own():
+    client = get_client("sk-timeouts", "http://127.0.0.1:1/v1")
+    assert client.timeout == httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT, pool=LLM_POOL_TIMEOUT)
+    assert client.max_retries == 0
+
+
+def test_transient_errors_are_retried(retries):
+    call, calls = flaky(2)
+    assert with_retries(call) == "answer"
+    assert len(calls) == 3 and len(retries) == 2
+
+
+def test_retries_are_bounded(retries):
+    call, calls = flaky(5)
+    with pytest.raises(openai.APIConnectionError):
+        with_retries(call)
+    assert len(calls) == 3
+
+
+def test_other_errors_fail_fast(retries):
+    call, calls = flaky(1, ValueError)
+    with pytest.raises(ValueError):
+        with_retries(call)
+    assert len(calls) == 1 and not retries
+
+
+def test_async_retries(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_MAX_RETRIES", 1)
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt: 0)
+    call, calls = flaky(1)
+
+    async def acall():
+        return call()
+    assert asyncio.run(with_retries_async(acall)) == "answer"
+    assert len(calls) == 2
+
+
+def test_backoff_is_jittered_and_capped(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_RETRY_BASE_DELAY", 0.5)
+    monkeypatch.setattr(llm_client, "LLM_RETRY_MAX_DELAY", 3.0)
+    for attempt, ceiling in [(0, 0.5), (1, 1.0), (2, 2.0), (6, 3.0)]:
+        delays = [backoff_delay(attempt) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        assert len(set(delays)) > 1
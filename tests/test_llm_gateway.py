@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from llm_gateway import FairLimiter, GatewayOverloaded, LLMGateway, request_key
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+def slow_call(started, cancelled):
+    async def call():
+        started.set()
+        try:
+            yield "first"
+            await asyncio.sleep(30)
+            yield "never"
+        finally:
+            cancelled.set()
+    return call
+
+
+async def quick_call():
+    yield "quick"
+
+
+@pytest.fixture
+def gateway():
+    return LLMGateway(max_concurrency=1, max_queue=4, queue_timeout=5)
+
+
+def test_cancelled_call_frees_its_slot_and_stops_upstream(gateway):
+    started, cancelled = threading.Event(), threading.Event()
+    slow = gateway._subscribe("slow", "s1", slow_call(started, cancelled))
+    deltas = iter(slow)
+    assert next(deltas) == "first"
+    slow.cancel()
+    assert list(deltas) == []
+    assert cancelled.wait(2)
+    assert list(gateway._subscribe("quick", "s2", quick_call)) == ["quick"]
+    wait_until(lambda: gateway.limiter.active == 0)
+    assert gateway.abandoned == 1
+
+
+def test_cancelled_waiter_leaves_the_queue(gateway):
+    started, cancelled = threading.Event(), threading.Event()
+    slow = gateway._subscribe("slow", "s1", slow_call(started, cancelled))
+    assert started.wait(2)
+    queued_started = threading.Event()
+    queued = gateway._subscribe("queued", "s2", slow_call(queued_started, threading.Event()))
+    wait_until(lambda: gateway.limiter.queued == 1)
+    queued.cancel()
+    wait_until(lambda: gateway.limiter.queued == 0)
+    slow.cancel()
+    wait_until(lambda: gateway.limiter.active == 0)
+    assert not queued_started.is_set()
+
+
+def test_coalesced_call_runs_on_while_a_subscriber_is_left(gateway):
+    release = threading.Event()
+
+    async def call():
+        yield "a"
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        yield "b"
+
+    first = gateway._subscribe("same", "s1", call)
+    second = gateway._subscribe("same", "s2", call)
+    first.cancel()
+    release.set()
+    assert list(second) == ["a", "b"]
+    assert gateway.coalesced == 1
+    assert gateway.abandoned == 0
+
+
+def test_losing_hedge_gives_its_slot_back(gateway):
+    # A cancelled subscription before its call even started
+    started, cancelled = threading.Event(), threading.Event()
+    subscription = gateway._subscribe("hedge", "s1", slow_call(started, cancelled))
+    subscription.cancel()
+    wait_until(lambda: gateway.limiter.active == 0 and not gateway._flights)
+    assert list(gateway._subscribe("quick", "s2", quick_call)) == ["quick"]
+
+
+def test_fair_limiter_rejects_beyond_the_queue_bound():
+    async def scenario():
+        limiter = FairLimiter(max_concurrency=1, max_queue=1)
+        await limiter.acquire("a", 1)
+        waiting = asyncio.ensure_future(limiter.acquire("b", 1))
+        await asyncio.sleep(0)
+        with pytest.raises(GatewayOverloaded):
+            await limiter.acquire("c", 1)
+        limiter.release()
+        await waiting
+        assert (limiter.active, limiter.queued) == (1, 0)
+
+    asyncio.run(scenario())
+
+
+def test_fair_limiter_rotates_between_sessions():
+    async def scenario():
+        limiter = FairLimiter(max_concurrency=1, max_queue=10)
+        await limiter.acquire("busy", 1)
+        order = []
+
+        async def request(session_id, name):
+            await limiter.acquire(session_id, 1)
+            order.append(name)
+            limiter.release()
+
+        tasks = [asyncio.ensure_future(request(s, n)) for s, n in
+                 [("busy", "busy-1"), ("busy", "busy-2"), ("other", "other-1")]]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        assert order == ["busy-1", "other-1", "busy-2"]
+
+    asyncio.run(scenario())
+
+
+def test_requests_coalesce_per_client():
+    messages = [{"role": "user", "content": "Is COD available?"}]
+    key = request_key(messages, "m", 0.2, 100, True, "https://a/v1", "sk-one")
+    assert request_key(messages, "m", 0.2, 100, True, "https://a/v1", "sk-one") == key
+    assert request_key(messages, "m", 0.2, 100, True, "https://a/v1", "sk-two") != key
+    assert request_key(messages, "m", 0.2, 100, True, "https://b/v1", "sk-one") != key
+    assert request_key(messages, "m", 0.2, 100, True, "https://a/v1", "sk-one", attempt=1) != key
@@ -0,0 +1,86 @@
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import engine
+from metrics import METRICS, Histogram, MetricsRegistry, _PrometheusHandler
+from model_router import record_token_usage
+
+
+def test_histogram_percentiles_stay_inside_their_bucket():
+    histogram = Histogram(bounds=(0.01, 0.1, 1.0))
+    for value in [0.005] * 50 + [0.05] * 45 + [0.5] * 5:
+        histogram.observe(value)
+    summary = histogram.summary()
+    assert summary["count"] == 100
+    assert summary["mean"] == pytest.approx((0.25 + 2.25 + 2.5) / 100)
+    assert 0.0 < summary["p50"] <= 0.01
+    assert 0.01 < summary["p95"] <= 0.1
+    assert 0.1 < summary["p99"] <= 1.0
+    assert Histogram().percentile(0.5) == 0.0
+
+
+def test_registry_keys_by_name_and_labels():
+    registry = MetricsRegistry()
+    registry.increment("turns", route="faq")
+    registry.increment("turns", 2, route="llm")
+    with registry.timer("stage", stage="order_lookup"):
+        pass
+    assert registry.counter("turns", route="faq") == 1
+    assert registry.counter("turns", route="llm") == 2
+    assert registry.counter("turns") == 0
+    assert registry.histogram("stage", stage="order_lookup")["count"] == 1
+    assert registry.histogram("stage", stage="render") is None
+    snapshot = registry.snapshot()
+    assert [c["labels"] for c in snapshot["counters"]] == [{"route": "faq"}, {"route": "llm"}]
+
+
+def test_prometheus_text():
+    registry = MetricsRegistry()
+    registry.increment("llm_tokens", 12, kind="prompt", source="api")
+    registry.observe("stage", 0.003, stage="render")
+    registry.observe("stage", 0.2, stage="render")
+    lines = registry.prometheus_text().splitlines()
+    assert "# TYPE chatbot_llm_tokens_total counter" in lines
+    assert 'chatbot_llm_tokens_total{kind="prompt",source="api"} 12' in lines
+    assert "# TYPE chatbot_stage_seconds histogram" in lines
+    assert 'chatbot_stage_seconds_bucket{stage="render",le="0.005"} 1' in lines
+    assert 'chatbot_stage_seconds_bucket{stage="render",le="0.25"} 2' in lines
+    assert 'chatbot_stage_seconds_bucket{stage="render",le="+Inf"} 2' in lines
+    assert 'chatbot_stage_seconds_count{stage="render"} 2' in lines
+
+
+def test_prometheus_endpoint_serves_the_registry():
+    METRICS.increment("exporter_probe")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PrometheusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            body = response.read().decode("utf-8")
+        assert "chatbot_exporter_probe_total 1" in body.splitlines()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_process_message_times_each_stage():
+    before = {stage: (METRICS.histogram("stage", stage=stage) or {"count": 0})["count"]
+              for stage in ("escalation_check", "order_lookup")}
+    turns = METRICS.counter("turns", route="order")
+    assert "#123" in engine.process_message("Where is my order 123?", engine.Session())
+    for stage, count in before.items():
+        assert METRICS.histogram("stage", stage=stage)["count"] == count + 1
+    assert METRICS.counter("turns", route="order") == turns + 1
+
+
+def test_api_usage_is_counted():
+    class Usage:
+        prompt_tokens = 120
+        completion_tokens = 30
+    before = [METRICS.counter("llm_tokens", kind=kind, source="api") for kind in ("prompt", "completion")]
+    record_token_usage(Usage())
+    record_token_usage(None)
+    after = [METRICS.counter("llm_tokens", kind=kind, source="api") for kind in ("prompt", "completion")]
+    assert after == [before[0] + 120, before[1] + 30]
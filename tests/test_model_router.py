@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+import model_router
+from model_router import CircuitBreaker, ModelRouter, NoProviderAvailable, Provider, choose_tier
+from intent_router import build_intent_router
+
+ROUTER = build_intent_router(["agent"])
+
+
+@pytest.fixture
+def hedging(monkeypatch):
+    monkeypatch.setattr(model_router, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(model_router, "LLM_HEDGE_DELAY", 0.05)
+
+
+def recording_start(slow):
+    """start() for _race answering "<provider>/<tier>/<attempt>", sleeping first for the slow (provider, tier)s"""
+    calls = []
+    lock = threading.Lock()
+
+    def start(provider, tier, attempt):
+        with lock:
+            calls.append((provider.name, tier))
+        if (provider.name, tier) in slow and attempt == 0:
+            time.sleep(0.5)
+        return iter([f"{provider.name}/{tier}/{attempt}"])
+    return start, calls
+
+
+def test_hedge_with_one_provider_repeats_the_same_tier(hedging):
+    router = ModelRouter([Provider("only")])
+    start, calls = recording_start({("only", "large")})
+    assert "".join(router._race(router.plan("large"), start, "llm_first_token")) == "only/large/1"
+    assert calls == [("only", "large"), ("only", "large")]
+
+
+def test_hedge_prefers_another_provider_at_the_same_tier(hedging):
+    router = ModelRouter([Provider("a"), Provider("b")])
+    start, calls = recording_start({("a", "large")})
+    assert "".join(router._race(router.plan("large"), start, "llm_first_token")) == "b/large/0"
+    assert calls == [("a", "large"), ("b", "large")]
+
+
+def test_errors_fall_back_to_the_other_tier():
+    router = ModelRouter([Provider("only")])
+
+    def start(provider, tier, attempt):
+        if tier == "large":
+            raise ConnectionError("down")
+        return iter(["small answer"])
+    assert "".join(router._race(router.plan("large"), start, "llm_first_token")) == "small answer"
+
+
+def test_open_circuit_skips_the_provider():
+    broken = Provider("broken", breaker=CircuitBreaker(failure_threshold=1, cooldown=60))
+    broken.breaker.record_failure()
+    router = ModelRouter([broken, Provider("spare")])
+    start, calls = recording_start(set())
+    assert "".join(router._race(router.plan("small"), start, "llm_first_token")) == "spare/small/0"
+    assert calls == [("spare", "small")]
+    with pytest.raises(NoProviderAvailable):
+        list(router._race(router.plan("small", provider="broken"), start, "llm_first_token"))
+
+
+def test_completions_are_timed_apart_from_first_tokens(monkeypatch):
+    monkeypatch.setattr(model_router, "LLM_HEDGE_MIN_SAMPLES", 1)
+    router = ModelRouter([Provider("timed")])
+    default = router.hedge_delay(router.providers["timed"], "small")
+
+    def start(provider, tier, attempt):
+        time.sleep(0.2)
+        return iter(["whole answer"])
+    assert "".join(router._race(router.plan("small"), start, "llm_complete")) == "whole answer"
+    assert model_router.METRICS.histogram("llm_first_token", provider="timed", tier="small") is None
+    # A slow completion pushes out only the hedge delay of later completions
+    assert router.hedge_delay(router.providers["timed"], "small") == default
+    assert router.hedge_delay(router.providers["timed"], "small", "llm_complete") >= 0.2
+
+
+def test_breaker_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.0)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+@pytest.mark.parametrize("message, tier", [
+    ("Is COD available?", "small"),
+    ("Where is my order 123?", "small"),
+    ("cheap wired earphones", "small"),
+    ("Can you recommend headphones for gaming?", "large"),
+    ("Compare Sony and JBL earphones", "large"),
+])
+def test_choose_tier(message, tier):
+    assert choose_tier(message, ROUTER.route(message)) == tier
@@ -0,0 +1,73 @@
+import csv
+import random
+
+import pytest
+
+import catalog_store
+from catalog import load_products
+from catalog_store import build_snapshot, diff_snapshot
+from columnar_catalog import ColumnarSnapshot, build_columnar
+from config import CATALOG_PATH
+
+MENTIONS = [
+    "how much is the boat rockerz",
+    "skulcandy truly wireless price",
+    "tell me about the grey ptron ones",
+    "specs of the jbl tune",
+    "sony wh headphones price",
+    "oneplus bullets details",
+    "wireless headphones with good bass",
+]
+
+
+@pytest.fixture(scope="module")
+def rows():
+    with open(CATALOG_PATH, encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames, list(reader)
+
+
+def write_catalog(path, fieldnames, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def names_of(snapshot, message):
+    return [snapshot.by_id[i]["product_name"] for i in snapshot.names.resolve(message, 5)]
+
+
+def test_reload_patches_names_like_a_fresh_build(tmp_path, rows, monkeypatch):
+    monkeypatch.setattr(catalog_store, "FULL_REBUILD_FRACTION", 1.0)
+    fieldnames, rows = rows
+    rng = random.Random(3)
+    path = tmp_path / "catalog.csv"
+    write_catalog(path, fieldnames, rows)
+    old = build_snapshot(str(path))
+
+    changed = [dict(row) for row in rows]
+    for row in rng.sample(changed, 20):
+        row["Product Name"] = "Zorblax Quietbuds " + row["Product Name"]
+    changed = [row for row in changed if rng.random() > 0.1]
+    write_catalog(path, fieldnames, changed)
+    patched, added, removed = diff_snapshot(old, str(path))
+    assert added and removed
+    assert patched.names is not old.names
+    fresh = build_snapshot(str(path))
+
+    for message in MENTIONS + ["zorblax quietbuds price", "zorblux quiet buds"]:
+        assert names_of(patched, message) == names_of(fresh, message), message
+    assert names_of(patched, "zorblax quietbuds price")
+    # The old snapshot's resolver is left as it was
+    assert not old.names.resolve("zorblax quietbuds price", 5)
+
+
+def test_columnar_file_carries_the_name_index(tmp_path):
+    destination = tmp_path / "catalog.cols"
+    build_columnar(CATALOG_PATH, str(destination))
+    mapped = ColumnarSnapshot(str(destination))
+    fresh = build_snapshot(CATALOG_PATH)
+    assert len(mapped) == len(load_products())
+    for message in MENTIONS + ["skullcandyy jib", "bot airdopes"]:
+        assert names_of(mapped, message) == names_of(fresh, message), message
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+import engine
+from order_store import DictOrderStore, SQLiteOrderStore, bulk_load
+
+ORDERS = {
+    "1001": {"customer_id": "c1", "status": "shipped", "eta": "May 03", "items": ["Wireless Earbuds"]},
+    "1002": {"customer_id": "c1", "status": "delivered", "delivery_date": "April 20", "items": ["Phone Case", "Cable"]},
+    "1003": {"customer_id": "c2", "status": "processing", "ship_date": "May 01", "items": ["Speaker"]},
+    "1004": {"status": "processing", "items": []},
+}
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "orders.db")
+    assert bulk_load(path, ORDERS.items(), batch_size=3) == len(ORDERS)
+    return path
+
+
+@pytest.fixture(params=["dict", "sqlite"])
+def store(request, database):
+    if request.param == "dict":
+        return DictOrderStore(ORDERS)
+    return SQLiteOrderStore(database)
+
+
+def test_lookup_by_id(store):
+    for order_id, order in ORDERS.items():
+        assert store.get(order_id) == order
+        assert order_id in store
+    assert store.get("9999") is None
+    assert "9999" not in store
+
+
+def test_lookup_by_customer(store):
+    assert sorted(store.find_by_customer("c1")) == [("1001", ORDERS["1001"]), ("1002", ORDERS["1002"])]
+    assert store.find_by_customer("c2") == [("1003", ORDERS["1003"])]
+    assert store.find_by_customer("nobody") == []
+
+
+def test_hot_orders_skip_the_database(database):
+    store = SQLiteOrderStore(database, cache_size=2, cache_ttl=60)
+    assert store.get("1001") == ORDERS["1001"]
+    store._local.connection.close()
+    # Served from the LRU: the closed connection is never touched
+    assert store.get("1001") == ORDERS["1001"]
+
+
+def test_every_thread_gets_its_own_read_only_connection(database):
+    store = SQLiteOrderStore(database, cache_size=0)
+    connections = []
+
+    def read():
+        assert store.get("1003") == ORDERS["1003"]
+        connections.append(store._connection())
+    threads = [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(connection) for connection in connections}) == 3
+    with pytest.raises(Exception):
+        connections[0].execute("DELETE FROM orders")
+
+
+def test_engine_answers_from_the_store(monkeypatch, database):
+    monkeypatch.setattr(engine, "ORDER_STORE", SQLiteOrderStore(database))
+    assert "1002" in engine.handle_order_status("1002")
+    assert engine.handle_order_status("123") is None
+    assert "initiated a return for order #1003" in engine.handle_return_refund("1003")
@@ -0,0 +1,80 @@
+import pytest
+
+import engine
+from catalog_store import get_catalog
+from metrics import METRICS
+from product_query import answer_product_query, parse_product_query, run_product_query
+
+
+@pytest.fixture(scope="module")
+def table():
+    return get_catalog().table
+
+
+@pytest.mark.parametrize("message", [
+    "Is COD available for orders above 5000?",
+    "I paid more than 5000 for headphones and they stopped working after 2 days, what can I do?",
+    "What's the best way to clean my headphones?",
+    "I need the best headphones for gaming",
+    "What's the best way to reach you?",
+    "Which is better over 5000 for travel?",
+])
+def test_non_shopping_questions_are_not_parsed(table, message):
+    assert parse_product_query(message, table) is None
+
+
+@pytest.mark.parametrize("message", [
+    "Is COD available for orders above 5000?",
+    "I paid more than 5000 for headphones and they stopped working after 2 days, what can I do?",
+    "What's the best way to clean my headphones?",
+    "I need the best headphones for gaming",
+    "Can I return headphones over 2000 if I don't like them?",
+])
+def test_engine_skips_structured_answers(message):
+    before = METRICS.counter("turns", route="structured_query")
+    response = engine.process_message(message, engine.Session())
+    assert METRICS.counter("turns", route="structured_query") == before
+    assert not response.startswith("Here")
+
+
+def test_price_ceiling_and_sort(table):
+    query = parse_product_query("What are the best headphones under ₹5000?", table)
+    assert query.max_price == 5000
+    assert query.min_price is None
+    assert query.sort_by == "rating"
+    products = run_product_query(table, query)
+    assert len(products) == 3
+    assert all(p["discounted_price"] <= 5000 for p in products)
+    assert [p["rating"] for p in products] == sorted((p["rating"] for p in products), reverse=True)
+    assert answer_product_query("What are the best headphones under ₹5000?", table).startswith("Here are the 3 highest rated")
+
+
+def test_price_range_rating_and_limit(table):
+    query = parse_product_query("top 5 earbuds between 1k and 3,000 rated 4 stars and above", table)
+    assert (query.min_price, query.max_price) == (1000, 3000)
+    assert query.min_rating == 4
+    assert query.limit == 5
+
+
+def test_singular_question_limits_to_one(table):
+    query = parse_product_query("What's the most discounted headphone available?", table)
+    assert query.sort_by == "discount_percentage"
+    assert query.limit == 1
+
+
+def test_brand_and_type_filters(table):
+    query = parse_product_query("cheapest sony wireless earphones", table)
+    assert query.sort_by == "discounted_price" and not query.descending
+    assert {b.lower() for b in query.brands} == {"sony"}
+    assert all("wireless" in t.lower() for t in query.types)
+
+
+def test_aspect_question_ranks_by_reviews(table):
+    query = parse_product_query("Show me wireless earbuds with good battery life", table)
+    assert query.aspects == ("battery",)
+    assert query.sort_by == "battery_score"
+
+
+def test_open_question_without_constraint_is_not_parsed(table):
+    assert parse_product_query("Tell me about Sony earphones", table) is None
+    assert parse_product_query("best", table) is None
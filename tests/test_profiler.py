@@ -0,0 +1,88 @@
+import json
+import time
+
+import pytest
+
+from engine import Session
+from profiler import TurnProfiler, get_profiler, profiled, record_span
+
+
+@pytest.fixture
+def session():
+    return Session()
+
+
+def test_slow_unsampled_turn_is_written(tmp_path, session):
+    profiler = TurnProfiler(sample_rate=0.0, slow_seconds=0.0, directory=str(tmp_path))
+    with profiler.turn(session) as profile:
+        profile.response = "Delivery takes 2-7 business days."
+    record, folded = profiler.recent[-1]
+    assert not record["sampled"] and folded is None
+    assert record["artifact"]
+    assert not (tmp_path / f"{record['artifact']}.folded").exists()
+    saved = json.loads((tmp_path / f"{record['artifact']}.json").read_text(encoding="utf-8"))
+    assert saved["session_id"] == session.session_id
+    assert saved["completion_tokens"] > 0
+
+
+def test_sampled_turn_writes_stacks(tmp_path, session):
+    session.profiling = True
+    profiler = TurnProfiler(interval=0.001, slow_seconds=0.0, directory=str(tmp_path))
+    with profiler.turn(session):
+        time.sleep(0.05)
+    record, folded = profiler.recent[-1]
+    assert folded
+    assert (tmp_path / f"{record['artifact']}.folded").read_text(encoding="utf-8").strip() == folded
+
+
+def test_fast_turn_is_not_written(tmp_path, session):
+    profiler = TurnProfiler(slow_seconds=60.0, directory=str(tmp_path))
+    with profiler.turn(session):
+        pass
+    assert profiler.recent[-1][0]["artifact"] is None
+    assert not list(tmp_path.iterdir())
+
+
+@profiled("stream")
+def slow_stream(items, delay):
+    for item in items:
+        time.sleep(delay)
+        yield item
+
+
+def test_profiled_generator_times_its_consumption(session):
+    profiler = get_profiler()
+    with profiler.turn(session) as profile:
+        for _ in slow_stream(range(3), 0.02):
+            # The consumer's time between items is not the stream's
+            with profiler.suspended(profile):
+                time.sleep(0.05)
+    assert 0.06 <= profile.spans["stream"] < 0.12
+
+
+def test_consumer_spans_land_in_the_suspended_turn(session):
+    profiler = get_profiler()
+    with profiler.turn(session) as profile:
+        with profiler.suspended(profile):
+            assert profiler.current() is None
+            record_span("render", 0.25)
+    record_span("render", 1.0)
+    assert profile.spans["render"] == 0.25
+
+
+def test_profiled_generator_closes_the_stream(session):
+    closed = []
+
+    @profiled("stream")
+    def stream():
+        try:
+            yield "a"
+            yield "b"
+        finally:
+            closed.append(True)
+
+    with get_profiler().turn(session):
+        deltas = stream()
+        next(deltas)
+        deltas.close()
+    assert closed == [True]
@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+
+import openai
+import pytest
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from mock_llm_server import start_server  # noqa: E402
+from replay import load_conversations, percentiles  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "Which earbuds have the best battery?"}]
+
+
+@pytest.fixture
+def server():
+    server = start_server(latency=0.0, tokens_per_second=0, completion_tokens=5)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client(server):
+    return openai.OpenAI(api_key="sk-mock", base_url=server.url, max_retries=0)
+
+
+def test_mock_server_completes_and_streams(server):
+    response = client(server).chat.completions.create(model="mock", messages=MESSAGES, max_tokens=3)
+    text = response.choices[0].message.content
+    assert len(text.split()) == 3
+    assert response.usage.completion_tokens == 3 and response.usage.prompt_tokens > 0
+
+    stream = client(server).chat.completions.create(model="mock", messages=MESSAGES, stream=True)
+    deltas = [chunk.choices[0].delta.content for chunk in stream if chunk.choices and chunk.choices[0].delta.content]
+    assert len(deltas) == 5
+    assert "".join(deltas).startswith(text)
+    assert server.stats() == {"requests": 2, "errors": 0, "streamed": 1, "prompt_tokens": 2 * response.usage.prompt_tokens,
+                              "completion_tokens": 8}
+
+
+def test_mock_server_injects_errors():
+    server = start_server(latency=0.0, error_rate=1.0, error_status=503)
+    try:
+        with pytest.raises(openai.APIStatusError) as raised:
+            client(server).chat.completions.create(model="mock", messages=MESSAGES)
+        assert raised.value.status_code == 503
+        assert server.stats()["errors"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_load_conversations_reads_both_formats(tmp_path):
+    path = tmp_path / "conversations.jsonl"
+    path.write_text("\n".join([
+        json.dumps({"id": "a", "turns": ["hi", "more"]}),
+        "",
+        json.dumps({"messages": [{"role": "user", "content": "q1"}, {"role": "assistant", "content": "a1"},
+                                 {"role": "user", "content": "q2"}]}),
+        json.dumps({"id": "empty", "turns": []}),
+    ]), encoding="utf-8")
+    assert load_conversations(str(path)) == [("a", ["hi", "more"]), ("3", ["q1", "q2"])]
+
+
+def test_percentiles_in_milliseconds():
+    summary = percentiles([i / 1000 for i in range(1, 101)])
+    assert summary["p50"] == 51.0 and summary["p95"] == 96.0 and summary["p99"] == 100.0
+    assert summary["max"] == 100.0 and summary["mean"] == 50.5
+    assert percentiles([]) == {}
+
+
+def test_replay_reports_every_turn(tmp_path):
+    output = tmp_path / "run.json"
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "replay.py"), "--concurrency", "2",
+         "--latency", "0", "--tokens-per-second", "0", "--output", str(output)],
+        check=True, capture_output=True, timeout=120,
+    )
+    report = json.loads(output.read_text(encoding="utf-8"))
+    turns = sum(len(turns) for _, turns in load_conversations(os.path.join(ROOT, "benchmarks", "conversations.jsonl")))
+    assert report["turns"] == turns and report["errors"] == 0
+    assert {"p50", "p95", "p99"} <= report["latency_ms"].keys()
+    assert report["llm"]["requests"] > 0 and report["llm"]["completion_tokens_per_turn"] > 0
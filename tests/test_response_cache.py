@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+import engine
+import response_cache
+from response_cache import ResponseCache, cache_key, is_followup, references_order
+
+HISTORY = [
+    {"role": "user", "content": "Show me Sony headphones"},
+    {"role": "assistant", "content": "Here are 3 Sony headphones..."},
+]
+
+
+def test_standalone_question_shares_a_key_across_sessions():
+    key = cache_key("What is the return window?", "v1", "p1")
+    assert cache_key("what is the RETURN window", "v1", "p1", HISTORY) == key
+    assert cache_key("What is the return window?", "v2", "p1") != key
+    assert cache_key("What is the return window?", "v1", "p2") != key
+
+
+def test_followup_keys_include_the_history():
+    key = cache_key("Compare them on battery life", "v1", "p1", HISTORY)
+    assert key != cache_key("Compare them on battery life", "v1", "p1", HISTORY[:1])
+    assert key != cache_key("Compare them on battery life", "v1", "p1")
+
+
+def test_fallback_query_is_part_of_the_key():
+    key = cache_key("What colors are available?", "v1", "p1")
+    assert cache_key("What colors are available?", "v1", "p1", fallback_query="Show me JBL earbuds") != key
+    assert cache_key("What colors are available?", "v1", "p1", fallback_query=None) == key
+
+
+def session_after(previous, message):
+    session = engine.Session()
+    session.messages.append({"role": "user", "content": previous})
+    session.messages.append({"role": "assistant", "content": "Here you go."})
+    session.messages.append({"role": "user", "content": message})
+    return session
+
+
+def test_engine_keys_answers_by_the_turn_that_fed_retrieval(monkeypatch):
+    answers = iter(f"answer {n}" for n in range(10))
+    cache = ResponseCache(max_entries=10, ttl=60)
+    monkeypatch.setattr(engine, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(engine, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(engine, "get_llm_response", lambda *args, **kwargs: next(answers))
+
+    # "What colors are available?" is no follow-up, but its prompt lists the earlier brand's products
+    colors = "What colors are available?"
+    jbl = engine.process_message(colors, session_after("Show me JBL earbuds", colors))
+    sony = engine.process_message(colors, session_after("Show me Sony headphones", colors))
+    assert (jbl, sony) == ("answer 0", "answer 1")
+    assert engine.process_message(colors, session_after("Show me JBL earbuds", colors)) == jbl
+
+    # Retrieval that needs no top-up is shared across sessions
+    travel = "Which headphones are good for travel and long flights?"
+    first = engine.process_message(travel, session_after("Show me JBL earbuds", travel))
+    assert engine.process_message(travel, session_after("Show me Sony headphones", travel)) == first
+
+
+@pytest.mark.parametrize("message, followup", [
+    ("is it waterproof?", True),
+    ("cheaper", True),
+    ("Which one has the best bass?", True),
+    ("What is the return window?", False),
+    ("Show me wireless earbuds under 2000", False),
+])
+def test_is_followup(message, followup):
+    assert is_followup(message) == followup
+
+
+@pytest.mark.parametrize("message, order", [
+    ("Where is my order #1234?", True),
+    ("status of order 98765", True),
+    ("How do I track my order?", False),
+])
+def test_references_order(message, order):
+    assert references_order(message) == order
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")  # evicts b, the least recently used
+    assert cache.get("b") is None
+    now[0] += 61
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_persistence_round_trip(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = ResponseCache(max_entries=10, ttl=60, path=path)
+    cache.put("key", "Delivery takes 2–7 business days.")
+    cache.save()
+    assert json.loads(open(path, encoding="utf-8").read())[0][0] == "key"
+    assert ResponseCache(max_entries=10, ttl=60, path=path).get("key") == "Delivery takes 2–7 business days."
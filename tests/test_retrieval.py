@@ -0,0 +1,84 @@
+from collections import Counter
+
+import engine
+from catalog import format_compact_context
+from catalog_store import get_catalog
+from retrieval import BM25Index, product_terms, retrieve_products, tokenize
+
+DOCS = {
+    0: Counter(tokenize("sony wireless headphones black")),
+    1: Counter(tokenize("jbl wired earphones blue")),
+    2: Counter(tokenize("sony wired earphones white")),
+    3: Counter(tokenize("boat wireless earbuds black")),
+}
+PRODUCTS = {doc_id: {"product_id": doc_id, "rating_count": 10 * (doc_id + 1)} for doc_id in DOCS}
+
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert tokenize("Show me the Sony Earphones, please!") == ["sony", "earphone"]
+    assert tokenize("glass cases") == ["glass", "case"]
+
+
+def test_product_terms_weight_the_fields():
+    terms = product_terms({"product_name": "Sony WH", "brand": "Sony", "color": "Blue", "reviews": "blue is nice"})
+    assert terms["sony"] == 1 + 3
+    assert terms["blue"] == 3 + 1
+
+
+def test_search_ranks_by_matched_terms():
+    index = BM25Index(DOCS)
+    ranked = [doc_id for doc_id, _ in index.search("sony wired earphones", 4)]
+    assert ranked[0] == 2
+    assert set(ranked) == {0, 1, 2}
+    scores = [score for _, score in index.search("sony wired earphones", 4)]
+    assert scores == sorted(scores, reverse=True)
+    assert len(index.search("sony wired earphones", 2)) == 2
+    assert index.search("bluetooth speaker", 4) == []
+
+
+def test_rare_terms_weigh_more():
+    index = BM25Index(DOCS)
+    assert index.idf("jbl") > index.idf("sony") > index.idf("nothing")
+    assert index.search("jbl black", 1)[0][0] == 1
+
+
+def test_retrieve_tops_up_from_the_fallback_query():
+    index = BM25Index(DOCS)
+    assert [p["product_id"] for p in retrieve_products(index, PRODUCTS, "jbl", 2)] == [1]
+    topped_up = retrieve_products(index, PRODUCTS, "jbl", 2, fallback_query="boat earbuds")
+    assert [p["product_id"] for p in topped_up] == [1, 3]
+
+
+def test_unmatched_query_gets_the_most_rated_products():
+    index = BM25Index(DOCS)
+    assert [p["product_id"] for p in retrieve_products(index, PRODUCTS, "bluetooth speaker", 2)] == [3, 2]
+
+
+def prompt_data(prompt):
+    return prompt.split("PRODUCT_DATA:\n", 1)[1].rstrip("\n")
+
+
+def test_prompt_carries_only_the_retrieved_rows():
+    catalog = get_catalog()
+    assert len(catalog) > engine.FULL_CATALOG_THRESHOLD
+    message = "Show me JBL wireless earbuds"
+    prompt = engine.build_system_prompt(message, engine.Session(), catalog)
+    retrieved = retrieve_products(catalog.index, catalog.by_id, message, engine.RETRIEVAL_TOP_K)
+    assert len(retrieved) == engine.RETRIEVAL_TOP_K
+    assert prompt_data(prompt) == format_compact_context(retrieved, catalog.legend)
+    assert (retrieved[0]["brand"], retrieved[0]["type"]) == ("JBL", "Wireless Headphones")
+    assert {p["product_id"] for p in catalog.products if p["brand"] == "JBL"} <= {p["product_id"] for p in retrieved}
+
+
+def test_small_catalog_is_sent_whole(monkeypatch):
+    catalog = get_catalog()
+    monkeypatch.setattr(engine, "FULL_CATALOG_THRESHOLD", len(catalog))
+    prompt = engine.build_system_prompt("Show me JBL wireless earbuds", engine.Session(), catalog)
+    assert prompt_data(prompt) == format_compact_context(catalog.products, catalog.legend)
+
+
+def test_named_products_replace_retrieval():
+    catalog = get_catalog()
+    named = catalog.products[:2]
+    prompt = engine.build_system_prompt("How much are these?", engine.Session(), catalog, named)
+    assert prompt_data(prompt) == format_compact_context(named, catalog.legend)
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+import tornado.httpserver
+import tornado.netutil
+
+import engine
+from server import make_app
+from session_store import MemorySessionStore
+
+
+@pytest.fixture
+def api():
+    """Base URL of the HTTP API served from a background event loop"""
+    started = threading.Event()
+    state = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = tornado.httpserver.HTTPServer(make_app(MemorySessionStore(), threads=2))
+        sockets = tornado.netutil.bind_sockets(0, "127.0.0.1")
+        server.add_sockets(sockets)
+        state.update(loop=loop, port=sockets[0].getsockname()[1])
+        started.set()
+        loop.run_forever()
+        server.stop()
+        loop.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    assert started.wait(5)
+    yield f"http://127.0.0.1:{state['port']}"
+    state["loop"].call_soon_threadsafe(state["loop"].stop)
+    thread.join(5)
+
+
+def call(url, method="GET", body=None):
+    """(status, body text) of one request"""
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, response.read().decode("utf-8")
+    except urllib.error.HTTPError as error:
+        return error.code, error.read().decode("utf-8")
+
+
+def test_chat_keeps_the_conversation(api):
+    status, body = call(f"{api}/v1/chat", "POST", {"message": "Where is my order 123?"})
+    assert status == 200
+    reply = json.loads(body)
+    assert reply["response"].startswith("Your order #123")
+
+    status, body = call(f"{api}/v1/chat", "POST", {"message": "I want to return order 456", "session_id": reply["session_id"]})
+    assert status == 200
+    status, body = call(f"{api}/v1/sessions/{reply['session_id']}")
+    messages = json.loads(body)["messages"]
+    assert [m["role"] for m in messages] == ["user", "assistant", "user", "assistant"]
+    assert messages[1]["content"] == reply["response"]
+
+
+def test_chat_streams_server_sent_events(api, monkeypatch):
+    monkeypatch.setattr(engine, "STREAM_RESPONSES", True)
+    monkeypatch.setattr(engine, "stream_llm_response", lambda *args, **kwargs: iter(["Try ", "the ", "Sony."]))
+    status, body = call(f"{api}/v1/chat", "POST", {"message": "Which headphones are good for travel?", "stream": True})
+    assert status == 200
+    events = [json.loads(line[len("data: "):]) for line in body.split("\n\n") if line.startswith("data: ")]
+    assert [event["delta"] for event in events[:-1]] == ["Try ", "the ", "Sony."]
+    assert events[-1]["done"] is True
+    status, body = call(f"{api}/v1/sessions/{events[-1]['session_id']}")
+    assert json.loads(body)["messages"][-1]["content"] == "Try the Sony."
+
+
+@pytest.mark.parametrize("body", [{}, {"message": "  "}, {"message": "hi", "session_id": "../etc"}])
+def test_chat_rejects_bad_requests(api, body):
+    assert call(f"{api}/v1/chat", "POST", body)[0] == 400
+
+
+def test_session_lifecycle(api):
+    status, body = call(f"{api}/v1/sessions", "POST", {})
+    assert status == 201
+    session_id = json.loads(body)["session_id"]
+    assert json.loads(call(f"{api}/v1/sessions/{session_id}")[1])["messages"] == []
+    assert call(f"{api}/v1/sessions/{session_id}", "DELETE")[0] == 204
+    assert call(f"{api}/v1/sessions/{session_id}")[0] == 404
+
+
+def test_health_and_metrics(api):
+    status, body = call(f"{api}/healthz")
+    assert status == 200 and json.loads(body)["status"] == "ok"
+    status, body = call(f"{api}/metrics")
+    assert status == 200 and "# TYPE" in body
@@ -0,0 +1,91 @@
+import pytest
+
+import session_store
+from engine import Session
+from message_log import MessageLog
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+
+def chat_session(turns=3):
+    session = Session()
+    for turn in range(turns):
+        session.messages.append({"role": "user", "content": f"Question {turn}"})
+        session.messages.append({"role": "assistant", "content": f"Answer {turn} " + "detail " * 80})
+    session.failed_attempts = 1
+    return session
+
+
+def test_session_round_trip():
+    session = chat_session()
+    session.history.build("system", session.messages[:-1], "next")
+    restored = Session.from_dict(session.to_dict())
+    assert restored.to_dict() == session.to_dict()
+
+
+def test_message_log_ring_buffer_and_compression():
+    log = MessageLog(max_messages=4, plain_messages=1, compress_min_chars=50)
+    texts = [f"message {i} " + "x" * 100 for i in range(6)]
+    for i, text in enumerate(texts):
+        log.append({"role": "user" if i % 2 == 0 else "assistant", "content": text})
+    assert len(log) == 4 and log.dropped == 2
+    assert [m["content"] for m in log] == texts[2:]
+    assert isinstance(log.records[0]._text, bytes)
+    assert isinstance(log.records[-1]._text, str)
+    assert log.to_list()[0] == {"role": "user", "content": texts[2]}
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(max_sessions=2, max_bytes=10 ** 9, idle_ttl=3600)
+    first, second, third = chat_session(), chat_session(), chat_session()
+    store.save(first)
+    store.save(second)
+    store.load(first.session_id)
+    store.save(third)
+    assert store.load(second.session_id) is None
+    assert store.load(first.session_id) is first
+    assert store.stats()["evictions"] == 1
+
+
+def test_memory_store_byte_ceiling():
+    session = chat_session()
+    store = MemorySessionStore(max_sessions=100, max_bytes=session.size() + 1, idle_ttl=3600)
+    store.save(session)
+    store.save(chat_session())
+    assert store.stats()["sessions"] == 1
+    assert store.stats()["bytes"] <= session.size() + 1
+
+
+def test_evicted_sessions_spill_and_come_back(tmp_path):
+    spill = SQLiteSessionStore(str(tmp_path / "spill.db"))
+    store = MemorySessionStore(max_sessions=1, max_bytes=10 ** 9, idle_ttl=3600, spill=spill)
+    first, second = chat_session(), chat_session()
+    store.save(first)
+    store.save(second)
+    restored = store.load(first.session_id)
+    assert restored is not first
+    assert restored.to_dict() == first.to_dict()
+
+
+def test_sqlite_store_expires_and_deletes(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=60)
+    session = chat_session()
+    store.save(session)
+    assert store.load(session.session_id).to_dict() == session.to_dict()
+    store.delete(session.session_id)
+    assert store.load(session.session_id) is None
+
+    store.save(session)
+    real_time = session_store.time.time
+    monkeypatch.setattr(session_store.time, "time", lambda: real_time() + 61)
+    assert store.load(session.session_id) is None
+
+
+@pytest.mark.parametrize("max_messages", [0, 3])
+def test_dropped_count_survives_a_round_trip(max_messages):
+    log = MessageLog(max_messages=max_messages)
+    for i in range(5):
+        log.append({"role": "user", "content": str(i)})
+    session = Session(messages=log)
+    restored = Session.from_dict(session.to_dict())
+    assert restored.messages.dropped == log.dropped
+    assert [m["content"] for m in restored.messages] == [m["content"] for m in log]
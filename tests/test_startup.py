@@ -0,0 +1,53 @@
+import json
+import subprocess
+import sys
+
+from streamlit.testing.v1 import AppTest
+
+import catalog_store
+import engine
+from conftest import ROOT
+
+HEAVY_MODULES = ["openai", "httpx"]
+
+IMPORTED = """
+import json, sys, time
+import engine
+loaded = [name for name in {modules!r} if name in sys.modules]
+import llm_client
+llm_client.prewarm()
+deadline = time.monotonic() + 30
+while not all(name in sys.modules for name in {modules!r}) and time.monotonic() < deadline:
+    time.sleep(0.01)
+print(json.dumps([loaded, [name for name in {modules!r} if name in sys.modules]]))
+"""
+
+
+def test_engine_imports_the_http_libraries_lazily():
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORTED.format(modules=HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True, timeout=60,
+    )
+    at_import, after_prewarm = json.loads(result.stdout.strip().splitlines()[-1])
+    assert at_import == []
+    assert after_prewarm == HEAVY_MODULES
+
+
+def test_reruns_reuse_the_process_wide_catalog_and_prompt(monkeypatch):
+    app = AppTest.from_file(f"{ROOT}/app.py", default_timeout=30).run()
+    app.chat_input[0].set_value("Which headphones are good for travel?").run()
+    assert not app.exception
+    catalog = catalog_store.get_catalog()
+
+    def rebuilt(*args, **kwargs):
+        raise AssertionError("the catalog was loaded again")
+    monkeypatch.setattr(catalog_store, "build_snapshot", rebuilt)
+    monkeypatch.setattr(catalog_store, "open_snapshot", rebuilt)
+    prefix = engine.system_prompt_prefix.cache_info()
+    for _ in range(3):
+        app.chat_input[0].set_value("Which headphones are good for travel?").run()
+        assert not app.exception
+    assert catalog_store.get_catalog() is catalog
+    # The prompt prefix was formatted once, not per rerun or turn
+    assert engine.system_prompt_prefix.cache_info().misses == prefix.misses
+    assert engine.system_prompt_prefix.cache_info().hits > prefix.hits
@@ -0,0 +1,81 @@
+import types
+
+import pytest
+
+import engine
+from response_cache import ResponseCache
+
+QUESTION = "Which headphones are good for travel and long flights?"
+
+
+class FakeRouter:
+    """Streams the given deltas, raising error after them if one is given"""
+
+    def __init__(self, deltas, error=None):
+        self.deltas = deltas
+        self.error = error
+        self.calls = []
+
+    def stream(self, messages, tier, session_id=None, provider=None):
+        self.calls.append(messages)
+        yield from self.deltas
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    monkeypatch.setattr(engine, "STREAM_RESPONSES", True)
+
+    def use(router):
+        monkeypatch.setattr(engine, "get_router", lambda: router)
+        return router
+    return use
+
+
+def test_process_message_streams_deltas(streaming):
+    router = streaming(FakeRouter(["The ", "Sony ", "ones."]))
+    session = engine.Session()
+    session.messages.append({"role": "user", "content": QUESTION})
+    response = engine.process_message(QUESTION, session)
+    assert isinstance(response, types.GeneratorType)
+    assert not router.calls  # nothing is sent before the caller starts reading
+    assert list(response) == ["The ", "Sony ", "ones."]
+    assert router.calls[0][-1] == {"role": "user", "content": QUESTION}
+
+
+def test_stream_turn_records_the_assembled_text(streaming):
+    streaming(FakeRouter(["I'm not sure ", "I understand", " the question."]))
+    session = engine.Session()
+    session.failed_attempts = 1
+    assert list(engine.stream_turn(QUESTION, session)) == ["I'm not sure ", "I understand", " the question."]
+    assert session.messages.to_list()[-1] == {"role": "assistant", "content": "I'm not sure I understand the question."}
+    # The generic-response check sees the whole text, not single deltas
+    assert session.failed_attempts == 2
+
+
+def test_finished_stream_is_cached(streaming, monkeypatch):
+    cache = ResponseCache(max_entries=10, ttl=60)
+    monkeypatch.setattr(engine, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(engine, "get_response_cache", lambda: cache)
+    streaming(FakeRouter(["Try the ", "Sony WH."]))
+    assert engine.run_turn(QUESTION, engine.Session()) == "Try the Sony WH."
+    # A second session is served from the cache as plain text
+    assert engine.process_message(QUESTION, engine.Session()) == "Try the Sony WH."
+
+
+def test_broken_stream_ends_with_a_notice_and_is_not_cached(streaming, monkeypatch):
+    cache = ResponseCache(max_entries=10, ttl=60)
+    monkeypatch.setattr(engine, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(engine, "get_response_cache", lambda: cache)
+    streaming(FakeRouter(["Try the "], ConnectionError("reset")))
+    response = engine.run_turn(QUESTION, engine.Session())
+    assert response == "Try the " + engine.INTERRUPTED_NOTICE
+    assert cache.stats()["entries"] == 0
+
+
+def test_unreachable_model_streams_the_local_answer(streaming):
+    streaming(FakeRouter([], ConnectionError("down")))
+    response = engine.run_turn("Show me JBL earphones", engine.Session())
+    assert response.startswith(engine.DEGRADED_NOTICE)
+    assert "JBL" in response